@@ -6,6 +6,8 @@
 use App\Http\Requests\Register;
 use App\Http\Requests\UpdateProfile;
 use Illuminate\Http\Request;
+use Illuminate\Support\Facades\Http;
+use Illuminate\Support\Facades\Log;
 use App\Models\User;
 use App\Models\Course;
 use App\Models\RecentActivity;
@@ -48,6 +50,13 @@ public function deleteUserAccount(User $user)
         try {
             $user->delete();
 
+            // Drop the user's face embeddings from the ML service's resident index
+            try {
+                Http::delete("http://localhost:8001/embeddings/{$user->id}");
+            } catch (\Exception $e) {
+                Log::warning('Failed to remove face embeddings for user_id: ' . $user->id . ': ' . $e->getMessage());
+            }
+
             return response()->json([
                 'message' => 'Account deleted successfully',
             ], 200);
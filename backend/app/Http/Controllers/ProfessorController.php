@@ -16,6 +16,7 @@
 use App\Models\CheatingScore;
 use App\Models\Question;
 use App\Models\StudentAnswer;
+use App\Services\EvidenceLinkService;
 use App\Services\NotificationService;
 use Illuminate\Http\Request;
 use Illuminate\Support\Facades\DB;
@@ -422,6 +423,7 @@ public function getCheatingLogs($quizId, $studentId)
                         'student_email' => $log->student->email ?? 'N/A',
                         'suspicious_behavior' => $log->SuspiciousBehavior,
                         'image_path' => $log->image_path,
+                        'evidence_url' => EvidenceLinkService::signedUrl($log->evidence_ref),
                         'detected_at' => $log->DetectedAt,
                         'is_reviewed' => $log->IsReviewed,
                     ];
@@ -13,10 +13,13 @@
 use App\Models\StudentAnswer;
 use App\Models\StudentQuiz;
 use App\Models\User;
+use App\Services\EvidenceLinkService;
 use App\Services\NotificationService;
 use Carbon\Carbon;
+use Illuminate\Contracts\Cache\LockTimeoutException;
 use Illuminate\Http\Request;
 use Illuminate\Support\Facades\Auth;
+use Illuminate\Support\Facades\Cache;
 use Illuminate\Support\Facades\Http;
 use Illuminate\Support\Facades\Log;
 use Illuminate\Support\Facades\Storage;
@@ -300,6 +303,34 @@ public function startQuiz($id, Request $request)
     }
 
     public function updateCheatingScore(Request $request)
+    {
+        // The ML service retries deliveries, so a repeated Idempotency-Key replays the first result
+        $idempotencyKey = $request->header('Idempotency-Key');
+        if (!$idempotencyKey) {
+            return $this->applyCheatingScoreUpdate($request);
+        }
+
+        // Deliveries sharing a key run one at a time, so a concurrent retry cannot apply twice
+        $cacheKey = 'cheating-score:' . $idempotencyKey;
+        try {
+            return Cache::lock($cacheKey . ':lock', 30)->block(10, function () use ($request, $cacheKey) {
+                if (Cache::has($cacheKey)) {
+                    return response()->json(Cache::get($cacheKey));
+                }
+
+                $response = $this->applyCheatingScoreUpdate($request);
+                if ($response->getStatusCode() === 200) {
+                    Cache::put($cacheKey, $response->getData(true), now()->addDay());
+                }
+                return $response;
+            });
+        } catch (LockTimeoutException $e) {
+            // The first delivery is still running; 429 makes the ML service retry later
+            return response()->json(['message' => 'Report with this Idempotency-Key is in progress'], 429);
+        }
+    }
+
+    private function applyCheatingScoreUpdate(Request $request)
     {
 
         try {
@@ -308,6 +339,8 @@ public function updateCheatingScore(Request $request)
             $scoreIncrement = $request->input('score_increment');
             $suspiciousBehaviors = $request->input('alerts', []);
             $imageB64 = $request->input('image_b64');
+            // Only the ref is kept; links to the full frame are minted on demand since they expire
+            $evidenceRef = $request->input('evidence_ref');
             $answers = $request->input('answers', []);
 
             // Validate inputs
@@ -319,6 +352,10 @@ public function updateCheatingScore(Request $request)
                 return response()->json(['message' => 'Invalid image format'], 400);
             }
 
+            if ($evidenceRef !== null && !EvidenceLinkService::isValidRef($evidenceRef)) {
+                return response()->json(['message' => 'Invalid evidence reference'], 400);
+            }
+
             // Update cheating score
             $cheatingScore = CheatingScore::where('student_id', $studentId)
                 ->where('quiz_id', $quizId)
@@ -335,10 +372,13 @@ public function updateCheatingScore(Request $request)
             $imagePath = null;
             if ($imageB64) {
                 $imageData = base64_decode(preg_replace('#^data:image/\w+;base64,#i', '', $imageB64));
-                if ($imageData === false || empty($imageData)) {
+                // The ML service sends JPEG or WebP thumbnails depending on EVIDENCE_FORMAT
+                preg_match('#^data:image/(\w+);base64,#i', $imageB64, $mime);
+                $extension = ['jpeg' => 'jpg', 'jpg' => 'jpg', 'webp' => 'webp', 'png' => 'png'][strtolower($mime[1] ?? '')] ?? null;
+                if ($imageData === false || empty($imageData) || $extension === null) {
                     Log::warning('Failed to decode image data for student_id: ' . $studentId . ', quiz_id: ' . $quizId);
                 } else {
-                    $filename = 'cheating_' . time() . '_' . uniqid() . '.jpg';
+                    $filename = 'cheating_' . time() . '_' . uniqid() . '.' . $extension;
                     $directory = 'cheating_images';
                     if (!Storage::disk('public')->exists($directory)) {
                         Storage::disk('public')->makeDirectory($directory);
@@ -357,7 +397,8 @@ public function updateCheatingScore(Request $request)
                     'StudentID' => $studentId,
                     'QuizID' => $quizId,
                     'DetectedAt' => now(),
-                    'image_path' => $imagePath
+                    'image_path' => $imagePath,
+                    'evidence_ref' => $evidenceRef,
                 ]);
             }
 
@@ -18,6 +18,7 @@ class CheatingLog extends Model
         'QuizID',
         'DetectedAt',
         'image_path',
+        'evidence_ref',
     ];
 
     public function student()
@@ -0,0 +1,34 @@
+<?php
+
+namespace App\Services;
+
+class EvidenceLinkService
+{
+    // Evidence file names issued by the ML service: sha256 hex plus extension
+    const REF_PATTERN = '/^[0-9a-f]{64}\.(jpg|webp)$/';
+
+    public static function isValidRef($ref)
+    {
+        return is_string($ref) && preg_match(self::REF_PATTERN, $ref) === 1;
+    }
+
+    /**
+     * Mint an expiring link to a full evidence frame on the ML service.
+     * The signature matches the ML service's: HMAC-SHA256 of "<ref>:<expires>"
+     * under the shared EVIDENCE_SIGNING_KEY. Returns null when signing is not
+     * configured or the ref is not one the ML service issues.
+     */
+    public static function signedUrl($ref)
+    {
+        $key = config('services.ml_evidence.signing_key');
+        if (!$key || !self::isValidRef($ref)) {
+            return null;
+        }
+
+        $expires = time() + (int) config('services.ml_evidence.ttl');
+        $signature = hash_hmac('sha256', $ref . ':' . $expires, $key);
+
+        return rtrim(config('services.ml_evidence.url'), '/') . '/evidence/' . $ref
+            . '?' . http_build_query(['expires' => $expires, 'signature' => $signature]);
+    }
+}
@@ -31,4 +31,12 @@
         'region' => env('AWS_DEFAULT_REGION', 'us-east-1'),
     ],
 
+    // Full evidence frames stay on the ML service; links to them are signed
+    // with the key the ML service verifies (its EVIDENCE_SIGNING_KEY)
+    'ml_evidence' => [
+        'url' => env('ML_EVIDENCE_URL', 'http://localhost:8001'),
+        'signing_key' => env('EVIDENCE_SIGNING_KEY'),
+        'ttl' => env('EVIDENCE_URL_TTL', 3600),
+    ],
+
 ];
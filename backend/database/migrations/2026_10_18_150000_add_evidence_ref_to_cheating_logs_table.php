@@ -0,0 +1,29 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration
+{
+    /**
+     * Run the migrations.
+     */
+    public function up(): void
+    {
+        Schema::table('cheating_logs', function (Blueprint $table) {
+            // Name of the full evidence frame kept by the ML service
+            $table->string('evidence_ref')->nullable()->after('image_path');
+        });
+    }
+
+    /**
+     * Reverse the migrations.
+     */
+    public function down(): void
+    {
+        Schema::table('cheating_logs', function (Blueprint $table) {
+            $table->dropColumn('evidence_ref');
+        });
+    }
+};
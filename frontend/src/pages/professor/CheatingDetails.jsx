@@ -72,14 +72,16 @@ const CheatingDetails = () => {
                 </TableCell>
                 <TableCell>{log.is_reviewed ? "Yes" : "No"}</TableCell>
                 <TableCell>
-                  {log.image_path ? (
+                  {log.image_path || log.evidence_url ? (
                     <button
                       onClick={() =>
+                        // Prefer the full evidence frame over the stored thumbnail
                         setSelectedImage(
-                          log.image_path.replace(
-                            "http://localhost",
-                            "http://127.0.0.1:8000"
-                          )
+                          log.evidence_url ||
+                            log.image_path.replace(
+                              "http://localhost",
+                              "http://127.0.0.1:8000"
+                            )
                         )
                       }
                       className="text-indigo-600 hover:text-indigo-800"
@@ -19,6 +19,18 @@ import QuestionCard from "../../components/quiz interface/QuestionCard";
 import VerifyFace from "../../components/VerifyFace";
 import QuizInstructions from "./QuizInstructions";
 
+// Capture delay used until the ML service suggests one (next_capture_ms)
+const DEFAULT_CAPTURE_MS = 10000;
+
+// Binary frame layout for the ML WebSocket:
+// 4-byte big-endian header length, JSON header, JPEG bytes
+const encodeFrameMessage = (header, jpegBlob) => {
+  const headerBytes = new TextEncoder().encode(JSON.stringify(header));
+  const length = new Uint8Array(4);
+  new DataView(length.buffer).setUint32(0, headerBytes.length);
+  return new Blob([length, headerBytes, jpegBlob]);
+};
+
 const QuizInterface = () => {
   const { quizId } = useParams();
   const navigate = useNavigate();
@@ -41,6 +53,7 @@ const QuizInterface = () => {
   const videoRef = useRef(null);
   const canvasRef = useRef(null);
   const wsRef = useRef(null);
+  const frameSeqRef = useRef(0);
   const [studentId, setStudentId] = useState(null);
   const [isVideoReady, setIsVideoReady] = useState(false);
   const [authToken, setAuthToken] = useState(null);
@@ -251,6 +264,12 @@ const QuizInterface = () => {
       try {
         const data = JSON.parse(event.data);
         console.log("Received WebSocket message:", data);
+        if (data.type === "error") {
+          console.error("Frame processing error:", data);
+        }
+        if (data.type === "result" || data.type === "error") {
+          scheduleCapture(data.next_capture_ms);
+        }
         if (data.type === "alert") {
           data.message.forEach((alert) => {
             toast.custom(
@@ -302,7 +321,7 @@ const QuizInterface = () => {
 
             stopWebcamStream();
             if (wsRef.current) wsRef.current.close();
-            if (intervalRef.current) clearInterval(intervalRef.current);
+            if (intervalRef.current) clearTimeout(intervalRef.current);
 
             setShowCheatingWarning(true);
 
@@ -320,7 +339,11 @@ const QuizInterface = () => {
             console.log("Sending payload to /submit_due_to_cheating:", payload);
             fetch("http://localhost:8001/submit_due_to_cheating", {
               method: "POST",
-              headers: { "Content-Type": "application/json" },
+              headers: {
+                "Content-Type": "application/json",
+                // Lets a proxy route the session to the worker holding its state
+                "X-Session-Key": `${studentId}_${quizId}`,
+              },
               body: JSON.stringify(payload),
             })
               .then((response) => response.json())
@@ -377,17 +400,55 @@ const QuizInterface = () => {
     };
     wsRef.current.onclose = () => console.log("WebSocket closed");
 
-    // Periodically capture image from webcam
-    const interval = setInterval(async () => {
+    // Capture images from the webcam on the schedule the ML service returns
+    let captureStopped = false;
+    const scheduleCapture = (delay) => {
+      if (captureStopped) return;
+      clearTimeout(intervalRef.current);
+      intervalRef.current = setTimeout(
+        captureFrame,
+        delay > 0 ? delay : DEFAULT_CAPTURE_MS
+      );
+    };
+
+    const captureFrame = async () => {
       if (
         !quizStarted ||
         !videoRef.current ||
         !canvasRef.current ||
         !isVideoReady
-      )
+      ) {
+        scheduleCapture(DEFAULT_CAPTURE_MS);
         return;
+      }
       const context = canvasRef.current.getContext("2d");
       context.drawImage(videoRef.current, 0, 0, 1280, 720);
+      const answers = Object.entries(selectedAnswers).map(
+        ([questionId, answer]) => ({
+          question_id: parseInt(questionId),
+          answer: answer,
+        })
+      );
+
+      // Prefer sending raw JPEG bytes over the open WebSocket
+      if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
+        const jpeg = await new Promise((resolve) =>
+          canvasRef.current.toBlob(resolve, "image/jpeg", 0.8)
+        );
+        if (jpeg && wsRef.current.readyState === WebSocket.OPEN) {
+          frameSeqRef.current += 1;
+          wsRef.current.send(
+            encodeFrameMessage(
+              { auth_token: authToken, seq: frameSeqRef.current, answers },
+              jpeg
+            )
+          );
+          // Fallback in case no reply arrives; the reply reschedules sooner or later
+          scheduleCapture(DEFAULT_CAPTURE_MS);
+          return;
+        }
+      }
+
       const imageData = canvasRef.current.toDataURL("image/jpeg", 0.8);
       console.log("Full base64 image:", imageData);
       const payload = {
@@ -395,18 +456,17 @@ const QuizInterface = () => {
         quiz_id: quizId,
         image_b64: imageData,
         auth_token: authToken,
-        answers: Object.entries(selectedAnswers).map(
-          ([questionId, answer]) => ({
-            question_id: parseInt(questionId),
-            answer: answer,
-          })
-        ),
+        answers,
       };
       console.log("Sending to /process_periodic:", payload);
       try {
         const response = await fetch("http://localhost:8001/process_periodic", {
           method: "POST",
-          headers: { "Content-Type": "application/json" },
+          headers: {
+            "Content-Type": "application/json",
+            // Lets a proxy route the session to the worker holding its state
+            "X-Session-Key": `${studentId}_${quizId}`,
+          },
           body: JSON.stringify(payload),
         });
         const result = await response.json();
@@ -415,17 +475,25 @@ const QuizInterface = () => {
           toast.error(
             `Cheating detection failed: ${result.error || "Unknown error"}`
           );
+          const retryAfter = parseInt(response.headers.get("Retry-After"), 10);
+          scheduleCapture(
+            retryAfter > 0 ? retryAfter * 1000 : DEFAULT_CAPTURE_MS
+          );
         } else {
           console.log("Process periodic success:", result);
+          scheduleCapture(result.next_capture_ms);
         }
       } catch (err) {
         console.error("Error processing image:", err);
         toast.error("Error in cheating detection.");
+        scheduleCapture(DEFAULT_CAPTURE_MS);
       }
-    }, 10000);
+    };
+    scheduleCapture(DEFAULT_CAPTURE_MS);
 
     return () => {
-      clearInterval(interval);
+      captureStopped = true;
+      clearTimeout(intervalRef.current);
       if (wsRef.current) wsRef.current.close();
       stopWebcamStream();
     };
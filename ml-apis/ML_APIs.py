@@ -20,33 +20,62 @@ from fastapi import (
     File,
     UploadFile,
     HTTPException,
-    Form,
     WebSocket,
     WebSocketDisconnect,
 )
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Dict
+from typing import List, Dict, Optional
 import base64
 import uuid
 from mysql.connector import Error
 from pydantic import BaseModel, ValidationError
-from io import BytesIO
+from torch.fx.experimental.optimization import fuse as fuse_conv_bn
 from torchvision import transforms
 from PIL import Image
 import torchvision.models as models
-import io
-import asyncio
 import json
+import logging
 import httpx
 import mediapipe as mp
-from collections import deque
+from collections import deque, OrderedDict
 import torch.nn as nn
 import asyncio
+import bisect
+from abc import ABC, abstractmethod
+import hashlib
+import hmac
+import queue
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager, suppress
+from functools import partial, wraps
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import onnxruntime as ort
+except ImportError:  # Only needed for INFERENCE_BACKEND=onnx
+    ort = None
+
+try:
+    import redis
+    import redis.asyncio
+except ImportError:  # Only needed for SESSION_BACKEND=redis or ALERT_BUS=redis
+    redis = None
 
 # Load environment variables from .env file
 load_dotenv()
 
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+logging.basicConfig(
+    level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+# Messages use %-style arguments so they are only formatted when the level is enabled
+logger = logging.getLogger("eduguard.ml")
+
 DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT")
 DB_DATABASE = os.getenv("DB_DATABASE")
@@ -58,34 +87,518 @@ OBJECT_DETECTION_MODEL_PATH = os.getenv("OBJECT_DETECTION_MODEL_PATH")
 
 os.environ.update(
     {
-        "DB_HOST": DB_HOST,
-        "DB_PORT": DB_PORT,
-        "DB_DATABASE": DB_DATABASE,
-        "DB_USERNAME": DB_USERNAME,
-        "DB_PASSWORD": DB_PASSWORD,
+        key: value
+        for key, value in {
+            "DB_HOST": DB_HOST,
+            "DB_PORT": DB_PORT,
+            "DB_DATABASE": DB_DATABASE,
+            "DB_USERNAME": DB_USERNAME,
+            "DB_PASSWORD": DB_PASSWORD,
+        }.items()
+        if value is not None
     }
 )
 
-# Load YOLOv8 face detection model
-face_detector = YOLO(FACE_MODEL_PATH)
-
-# Load head pose estimation model
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 head_pose_model_path = HEAD_POSE_MODEL_PATH
 
-# Load object detection model
-object_detection_model = YOLO(OBJECT_DETECTION_MODEL_PATH).to(
-    "cuda" if torch.cuda.is_available() else "cpu"
+# Comma-separated models to load at startup ("all" or "none"); the rest load on first use
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "all")
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+
+        # ru_maxrss is a high-water mark, which is the best we have off Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ModelRegistry:
+    """Loads each model exactly once, on first use, and records load time and memory"""
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._profile = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def register(self, name: str, loader):
+        self._loaders[name] = loader
+        self._load_locks[name] = threading.Lock()
+
+    def get(self, name: str):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        # Per-model lock so a slow load does not block unrelated models
+        with self._load_locks[name]:
+            if name not in self._models:
+                logger.info("Loading %s...", name)
+                rss_before = current_rss()
+                started = time.perf_counter()
+                self._models[name] = self._loaders[name]()
+                self._profile[name] = {
+                    "seconds": round(time.perf_counter() - started, 3),
+                    "rss_mb": round((current_rss() - rss_before) / 2**20, 1),
+                }
+                logger.info("%s loaded.", name)
+            return self._models[name]
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def preload(self, names=PRELOAD_MODELS):
+        if isinstance(names, str):
+            if names.strip() == "all":
+                names = list(self._loaders)
+            elif names.strip() == "none":
+                names = []
+            else:
+                names = [name.strip() for name in names.split(",") if name.strip()]
+        for name in names:
+            self.get(name)
+
+    def profile(self) -> Dict:
+        return {
+            "backend": INFERENCE_BACKEND,
+            "profile": INFERENCE_PROFILE,
+            "threads": torch.get_num_threads(),
+            "loaded": dict(self._profile),
+            "deferred": [name for name in self._loaders if name not in self._models],
+            "total_seconds": round(
+                sum(p["seconds"] for p in self._profile.values()), 3
+            ),
+            "rss_mb": round(current_rss() / 2**20, 1),
+        }
+
+    def print_profile(self):
+        profile = self.profile()
+        logger.info("Model load profile:")
+        for name, p in profile["loaded"].items():
+            logger.info("  %-20s %8.3fs %9.1f MB", name, p["seconds"], p["rss_mb"])
+        if profile["deferred"]:
+            logger.info("  deferred: %s", ", ".join(profile["deferred"]))
+        logger.info(
+            "  total %.3fs, process RSS %.1f MB",
+            profile["total_seconds"],
+            profile["rss_mb"],
+        )
+
+
+model_registry = ModelRegistry()
+
+# "torch" runs the models eagerly; "onnx" exports them once to ONNX_DIR (with a
+# dynamic batch axis) and serves them through onnxruntime's CPU provider
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch").lower()
+ONNX_DIR = os.getenv("ONNX_DIR", "onnx")
+# onnxruntime intra-op threads (0 lets onnxruntime pick)
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+# Also export and serve the Ultralytics YOLO detectors through onnxruntime
+ONNX_EXPORT_YOLO = os.getenv("ONNX_EXPORT_YOLO", "false").lower() == "true"
+ONNX_OPSET = 17
+
+if INFERENCE_BACKEND not in ("torch", "onnx"):
+    raise ValueError(f"Unknown INFERENCE_BACKEND: {INFERENCE_BACKEND}")
+
+# "default" serves the torch models in eager fp32; "fast_cpu" folds BatchNorm
+# into the convolutions, quantizes the Linear layers to int8 and runs them
+# channels_last under torch.inference_mode
+INFERENCE_PROFILE = os.getenv("INFERENCE_PROFILE", "default").lower()
+
+if INFERENCE_PROFILE not in ("default", "fast_cpu"):
+    raise ValueError(f"Unknown INFERENCE_PROFILE: {INFERENCE_PROFILE}")
+
+
+class FastCpuModule(torch.nn.Module):
+    """Runs a CPU model channels_last under torch.inference_mode"""
+
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x):
+        with torch.inference_mode():
+            return self.model(x.contiguous(memory_format=torch.channels_last))
+
+
+def fold_batch_norm(model: torch.nn.Module) -> torch.nn.Module:
+    """Fold each eval-mode BatchNorm into the convolution before it, if the model traces"""
+    try:
+        return fuse_conv_bn(model, inplace=True)
+    except Exception as e:
+        logger.warning("Could not fold BatchNorm in %s: %s", type(model).__name__, e)
+        return model
+
+
+def apply_inference_profile(model, profile: str = None):
+    """Return the model prepared for the inference profile (default: INFERENCE_PROFILE)"""
+    profile = profile or INFERENCE_PROFILE
+    if profile != "fast_cpu":
+        return model
+    if device.type != "cpu":
+        logger.warning("INFERENCE_PROFILE=fast_cpu only applies on CPU, keeping fp32")
+        return model
+    # Dynamic quantization only covers Linear layers, a small share of a ResNet.
+    # The convolutions stay fp32 with BatchNorm folded in and take the oneDNN
+    # channels_last path; INFERENCE_BACKEND=onnx goes further on the backbones
+    model = torch.ao.quantization.quantize_dynamic(
+        fold_batch_norm(model.eval()), {torch.nn.Linear}, dtype=torch.qint8
+    )
+    return FastCpuModule(model.to(memory_format=torch.channels_last)).eval()
+
+
+class OnnxModule:
+    """An exported model served by onnxruntime behind the torch module call signature"""
+
+    def __init__(self, path: str, threads: int = None):
+        if ort is None:
+            raise RuntimeError("INFERENCE_BACKEND=onnx requires onnxruntime")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = ONNX_THREADS if threads is None else threads
+        if threads:
+            options.intra_op_num_threads = threads
+        self.path = path
+        self.session = ort.InferenceSession(
+            path, options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x: torch.Tensor):
+        inputs = np.ascontiguousarray(x.detach().cpu().numpy(), dtype=np.float32)
+        outputs = [
+            torch.from_numpy(output)
+            for output in self.session.run(None, {self.input_name: inputs})
+        ]
+        return outputs[0] if len(outputs) == 1 else tuple(outputs)
+
+    def eval(self):
+        return self
+
+    def to(self, *args, **kwargs):
+        return self
+
+
+def export_onnx(model, path: str, input_shape: tuple, output_names: List[str]):
+    """Export a torch model to ONNX with a dynamic batch axis on every input and output"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    sample = torch.zeros((2, *input_shape), device=next(model.parameters()).device)
+    torch.onnx.export(
+        model.eval(),
+        sample,
+        path,
+        input_names=["input"],
+        output_names=output_names,
+        dynamic_axes={name: {0: "batch"} for name in ["input", *output_names]},
+        opset_version=ONNX_OPSET,
+    )
+    logger.info("Exported %s", path)
+    return path
+
+
+def is_stale(path: str, source: str = None) -> bool:
+    """Whether an exported file is missing or older than the checkpoint it came from"""
+    if not os.path.exists(path):
+        return True
+    return (
+        bool(source)
+        and os.path.exists(source)
+        and (os.path.getmtime(source) > os.path.getmtime(path))
+    )
+
+
+def onnx_backed(
+    name: str, load_torch, input_shape: tuple, output_names: List[str], source=None
+):
+    """Wrap a torch model loader so INFERENCE_BACKEND=onnx serves its export instead"""
+
+    def load():
+        if INFERENCE_BACKEND != "onnx":
+            return apply_inference_profile(load_torch())
+        path = os.path.join(ONNX_DIR, f"{name}.onnx")
+        if is_stale(path, source):
+            export_onnx(load_torch(), path, input_shape, output_names)
+        return OnnxModule(path)
+
+    return load
+
+
+def load_yolo(path: str):
+    if INFERENCE_BACKEND == "onnx" and ONNX_EXPORT_YOLO:
+        onnx_path = os.path.splitext(path)[0] + ".onnx"
+        model = YOLO(path)
+        if is_stale(onnx_path, path):
+            onnx_path = model.export(format="onnx", dynamic=True, opset=ONNX_OPSET)
+        # Ultralytics runs .onnx weights through onnxruntime itself. It cannot tell
+        # the task from an .onnx file, so pass the checkpoint's own: a pose model
+        # loaded as "detect" would silently drop the face keypoints.
+        return YOLO(onnx_path, task=model.task)
+    return YOLO(path).to(device)
+
+
+# YOLOv8 face detection and object detection models
+model_registry.register("face_detector", lambda: load_yolo(FACE_MODEL_PATH))
+model_registry.register(
+    "object_detector", lambda: load_yolo(OBJECT_DETECTION_MODEL_PATH)
 )
+# Ultralytics predictors are not thread-safe, so each model is used by one thread at a time
+face_detector_lock = threading.Lock()
+object_detection_lock = threading.Lock()
+
+
+# Prefix of every metric name on /metrics
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "eduguard")
+
+
+def format_labels(labels: Dict) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+class MetricsRegistry:
+    """Renders histograms and scrape-time gauges/counters in the Prometheus text format
+
+    Histograms register themselves when created. Gauges and counters are read
+    from callbacks at scrape time, so they cost nothing on the hot path.
+    """
+
+    def __init__(self, namespace: str = METRICS_NAMESPACE):
+        self.namespace = namespace
+        self._histograms = {}
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def register(self, histogram: "Histogram"):
+        key = (histogram.name, tuple(sorted(histogram.labels.items())))
+        with self._lock:
+            # A re-created owner replaces its series instead of duplicating it
+            self._histograms[key] = histogram
+
+    def gauge(self, name: str, description: str, read):
+        """read() returns a number, or a list of (labels, value) pairs"""
+        self._callbacks.append((name, "gauge", description, read))
+
+    def counter(self, name: str, description: str, read):
+        self._callbacks.append((name, "counter", description, read))
+
+    def render(self) -> str:
+        prefix = f"{self.namespace}_" if self.namespace else ""
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.values(), key=lambda h: h.name)
+        described = set()
+        for histogram in histograms:
+            name = prefix + histogram.name
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {histogram.description}")
+                lines.append(f"# TYPE {name} histogram")
+            lines.extend(histogram.samples(name))
+        for name, kind, description, read in self._callbacks:
+            try:
+                value = read()
+            except Exception as e:
+                logger.warning("Metric %s failed: %s", name, e)
+                continue
+            name = prefix + name
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            series = value if isinstance(value, list) else [({}, value)]
+            for labels, sample in series:
+                lines.append(f"{name}{format_labels(labels)} {float(sample)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+class Histogram:
+    """Cumulative fixed-bucket histogram, safe to observe from several threads"""
+
+    def __init__(self, name: str, description: str, buckets, labels: Dict = None):
+        self.name = name
+        self.description = description
+        self.labels = dict(labels or {})
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+        metrics.register(self)
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self.buckets, self.counts):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            buckets["+Inf"] = self.count
+            return {
+                "count": self.count,
+                "sum": self.sum,
+                "mean": self.sum / self.count if self.count else 0.0,
+                "buckets": buckets,
+            }
+
+    def samples(self, name: str) -> List[str]:
+        """Prometheus bucket, sum and count lines for this histogram"""
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = format_labels({**self.labels, "le": bound})
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = format_labels({**self.labels, "le": "+Inf"})
+        lines.append(f"{name}_bucket{labels} {count}")
+        lines.append(f"{name}_sum{format_labels(self.labels)} {total}")
+        lines.append(f"{name}_count{format_labels(self.labels)} {count}")
+        return lines
+
+
+# Latency of each pipeline stage, observed by the timed_stage decorator
+STAGE_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+stage_latency: Dict[str, Histogram] = {}
+
+
+def timed_stage(stage: str):
+    """Record every call of the decorated function in model_stage_seconds{stage=...}"""
+    histogram = stage_latency.get(stage)
+    if histogram is None:
+        histogram = stage_latency[stage] = Histogram(
+            "model_stage_seconds",
+            "Latency of each pipeline stage",
+            STAGE_BUCKETS,
+            {"stage": stage},
+        )
+
+    def decorate(fn):
+        if asyncio.iscoroutinefunction(fn):
+
+            @wraps(fn)
+            async def timed_async(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - started)
+
+            return timed_async
+
+        @wraps(fn)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started)
+
+        return timed
+
+    return decorate
+
+
+# Database connection pool settings (DB_CONNECTION=sqlite gives a local stand-in)
+DB_CONNECTION = os.getenv("DB_CONNECTION", "mysql")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_ERRORS = (Error, sqlite3.Error)
+
+# On-disk embedding format: float32 (raw), float16, or int8 with a per-row scale
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "float32")
+EMBEDDING_DIM = 512
+# Format version stored in face_embeddings.encoding
+EMBEDDING_ENCODINGS = {"float32": 0, "float16": 1, "int8": 2}
+
+
+def encode_embeddings(embeddings, storage: str = EMBEDDING_STORAGE):
+    """Normalize and encode embeddings, returning (encoding, blobs, scales)"""
+    vectors = np.asarray(embeddings, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    encoding = EMBEDDING_ENCODINGS[storage]
+    scales = [None] * len(vectors)
+    if storage == "float16":
+        encoded = vectors.astype(np.float16)
+    elif storage == "int8":
+        row_scale = np.abs(vectors).max(axis=1) / 127.0
+        row_scale[row_scale == 0] = 1.0
+        encoded = np.round(vectors / row_scale[:, None]).astype(np.int8)
+        scales = row_scale.tolist()
+    else:
+        encoded = vectors
+    return encoding, [row.tobytes() for row in encoded], scales
+
+
+def decode_embeddings(blobs, encodings, scales) -> np.ndarray:
+    """Decode embedding blobs of mixed formats into an (N, 512) float32 array"""
+    out = np.empty((len(blobs), EMBEDDING_DIM), dtype=np.float32)
+    encodings = np.asarray(encodings, dtype=np.int64)
+    for dtype, encoding in (
+        (np.float32, EMBEDDING_ENCODINGS["float32"]),
+        (np.float16, EMBEDDING_ENCODINGS["float16"]),
+        (np.int8, EMBEDDING_ENCODINGS["int8"]),
+    ):
+        rows = np.flatnonzero(encodings == encoding)
+        if rows.size == 0:
+            continue
+        # One frombuffer over the concatenated blobs instead of one per row
+        joined = b"".join(blobs[i] for i in rows)
+        decoded = np.frombuffer(joined, dtype=dtype).reshape(-1, EMBEDDING_DIM)
+        if dtype is np.int8:
+            row_scale = np.asarray([scales[i] for i in rows], dtype=np.float32)
+            out[rows] = decoded * row_scale[:, None]
+        else:
+            out[rows] = decoded
+    return out
 
 
 class FaceDB:
-    def __init__(self):
-        self.conn = None
+    def __init__(self, pool_size=DB_POOL_SIZE):
+        self.backend = DB_CONNECTION
+        self.pool_size = pool_size
         self._verify_env_vars()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._pool_lock = threading.Lock()
+        # DB calls from async endpoints run here instead of on the event loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=pool_size, thread_name_prefix="facedb"
+        )
+        self.pool_wait = Histogram(
+            "db_pool_wait_seconds",
+            "Time spent waiting for a pooled database connection",
+            [0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0],
+        )
+        self.query_latency = Histogram(
+            "db_query_seconds",
+            "Database query latency",
+            [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0],
+        )
         self._init_db()
 
     def _verify_env_vars(self):
+        if self.backend == "sqlite":
+            return
         required_vars = ["DB_HOST", "DB_DATABASE", "DB_USERNAME", "DB_PASSWORD"]
         missing = [var for var in required_vars if var not in os.environ]
         if missing:
@@ -93,6 +606,15 @@ class FaceDB:
 
     def _get_connection(self):
         try:
+            if self.backend == "sqlite":
+                database = os.environ.get("DB_DATABASE", ":memory:")
+                if database == ":memory:":
+                    # Shared cache so every pooled connection sees the same in-memory DB
+                    database = "file:eduguard?mode=memory&cache=shared"
+                conn = sqlite3.connect(database, uri=True, check_same_thread=False)
+                conn.execute("PRAGMA foreign_keys = ON")
+                logger.info("✅ Connected to SQLite")
+                return conn
             conn = mysql.connector.connect(
                 host=os.environ["DB_HOST"],
                 database=os.environ["DB_DATABASE"],
@@ -100,130 +622,291 @@ class FaceDB:
                 password=os.environ["DB_PASSWORD"],
                 port=int(os.environ.get("DB_PORT", "3306")),
             )
-            print("✅ Connected to MySQL")
+            logger.info("✅ Connected to MySQL")
             return conn
-        except Error as e:
-            print(f"Error connecting to MySQL: {e}")
+        except DB_ERRORS as e:
+            logger.error("Error connecting to database: %s", e)
             raise
 
-    def _init_db(self):
+    def _is_healthy(self, conn) -> bool:
         try:
-            self.conn = self._get_connection()
-            cursor = self.conn.cursor()
-            cursor.execute(
+            if self.backend == "sqlite":
+                conn.execute("SELECT 1")
+            else:
+                conn.ping(reconnect=True, attempts=1, delay=0)
+            return True
+        except DB_ERRORS:
+            return False
+
+    def _close(self, conn):
+        with suppress(*DB_ERRORS):
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        """Check a healthy connection out of the pool, waiting up to DB_POOL_TIMEOUT"""
+        started = time.perf_counter()
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                can_create = self._created < self.pool_size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    conn = self._get_connection()
+                except Exception:
+                    with self._pool_lock:
+                        self._created -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=DB_POOL_TIMEOUT)
+                except queue.Empty:
+                    raise TimeoutError(
+                        f"No database connection available within {DB_POOL_TIMEOUT}s"
+                    )
+        self.pool_wait.observe(time.perf_counter() - started)
+
+        if not self._is_healthy(conn):
+            self._close(conn)
+            try:
+                conn = self._get_connection()
+            except Exception:
+                with self._pool_lock:
+                    self._created -= 1
+                raise
+        try:
+            yield conn
+        except Exception:
+            with suppress(*DB_ERRORS):
+                conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def _sql(self, query: str) -> str:
+        return query.replace("%s", "?") if self.backend == "sqlite" else query
+
+    def _run(self, work):
+        """Run work(cursor) on a pooled connection and commit"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            started = time.perf_counter()
+            try:
+                result = work(cursor)
+                conn.commit()
+                return result
+            finally:
+                self.query_latency.observe(time.perf_counter() - started)
+                cursor.close()
+
+    async def run_async(self, method, *args):
+        """Await a FaceDB method without blocking the event loop"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, partial(method, *args)
+        )
+
+    def _init_db(self):
+        def work(cursor):
+            if self.backend == "sqlite":
+                # Stand-in for the Laravel-owned users table
+                cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS users (
+                        id INTEGER PRIMARY KEY,
+                        name TEXT NOT NULL
+                    )
+                """
+                )
+                cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS face_embeddings (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id INTEGER NOT NULL,
+                        embedding BLOB NOT NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+                    )
+                """
+                )
+            else:
+                cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS face_embeddings (
+                        id INT AUTO_INCREMENT PRIMARY KEY,
+                        user_id BIGINT UNSIGNED NOT NULL,
+                        embedding BLOB NOT NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+                    )
                 """
-                CREATE TABLE IF NOT EXISTS face_embeddings (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    user_id BIGINT UNSIGNED NOT NULL,
-                    embedding BLOB NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
                 )
+            cursor.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_user_id ON face_embeddings(user_id)
             """
             )
+            self._migrate(cursor)
+
+        try:
+            self._run(work)
+            logger.info("✅ Database initialized")
+        except DB_ERRORS as e:
+            logger.error("Error initializing database: %s", e)
+            raise
+
+    def _migrate(self, cursor):
+        """Add the embedding format columns to tables created before they existed"""
+        if self.backend == "sqlite":
+            cursor.execute("PRAGMA table_info(face_embeddings)")
+            columns = {row[1] for row in cursor.fetchall()}
+        else:
             cursor.execute(
                 """
-                CREATE INDEX IF NOT EXISTS idx_user_id ON face_embeddings(user_id)
+                SELECT COLUMN_NAME FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'face_embeddings'
             """
             )
-            self.conn.commit()
-            print("✅ Database initialized")
-        except Error as e:
-            print(f"Error initializing database: {e}")
+            columns = {row[0] for row in cursor.fetchall()}
+        if "encoding" not in columns:
+            cursor.execute(
+                "ALTER TABLE face_embeddings ADD COLUMN encoding SMALLINT NOT NULL DEFAULT 0"
+            )
+        if "scale" not in columns:
+            cursor.execute("ALTER TABLE face_embeddings ADD COLUMN scale FLOAT NULL")
+
+    def get_user(self, user_id):
+        """Return (id, name) for a user, or None if it does not exist"""
+
+        def work(cursor):
+            cursor.execute(
+                self._sql("SELECT id, name FROM users WHERE id = %s"), (user_id,)
+            )
+            return cursor.fetchone()
+
+        try:
+            return self._run(work)
+        except DB_ERRORS as e:
+            logger.error("Error verifying user_id: %s", e)
             raise
-        finally:
-            if cursor:
-                cursor.close()
-            if self.conn and self.conn.is_connected():
-                self.conn.close()
 
-    def store_embeddings(self, user_id, embeddings):
+    def store_embeddings(self, user_id, embeddings, storage=EMBEDDING_STORAGE):
+        encoding, blobs, scales = encode_embeddings(embeddings, storage)
+        rows = [(user_id, blob, encoding, scale) for blob, scale in zip(blobs, scales)]
+
+        def work(cursor):
+            # One batched insert in a single transaction
+            cursor.executemany(
+                self._sql(
+                    "INSERT INTO face_embeddings (user_id, embedding, encoding, scale) "
+                    "VALUES (%s, %s, %s, %s)"
+                ),
+                rows,
+            )
+
         try:
-            self.conn = self._get_connection()
-            cursor = self.conn.cursor()
-            for emb in embeddings:
-                emb_norm = emb / np.linalg.norm(emb)
-                cursor.execute(
-                    "INSERT INTO face_embeddings (user_id, embedding) VALUES (%s, %s)",
-                    (user_id, emb_norm.tobytes()),
-                )
-            self.conn.commit()
-            print(f"✅ Stored embeddings for user {user_id}")
-        except Error as e:
-            print(f"Error storing embeddings: {e}")
+            self._run(work)
+            logger.info("✅ Stored embeddings for user %s", user_id)
+        except DB_ERRORS as e:
+            logger.error("Error storing embeddings: %s", e)
             raise
-        finally:
-            if cursor:
-                cursor.close()
-            if self.conn and self.conn.is_connected():
-                self.conn.close()
 
     def load_embeddings(self, user_id=None):
-        try:
-            self.conn = self._get_connection()
-            cursor = self.conn.cursor(dictionary=True)
-            query = """
-            SELECT u.id as user_id, u.name, fe.embedding 
+        query = """
+            SELECT u.id as user_id, u.name, fe.embedding, fe.encoding, fe.scale
             FROM face_embeddings fe
             JOIN users u ON fe.user_id = u.id
         """
+        params = []
+        if user_id is not None:
+            query += "WHERE fe.user_id = %s"
+            params.append(user_id)
+
+        def work(cursor):
+            cursor.execute(self._sql(query), params)
+            rows = cursor.fetchall()
+            if not rows:
+                return np.array([]), np.array([]), np.array([])
+            user_ids, labels, blobs, encodings, scales = zip(*rows)
+            embeddings = decode_embeddings(blobs, encodings, scales)
+            return embeddings, np.array(labels), np.array(user_ids)
 
-            params = []
-            if user_id is not None:
-                query += "WHERE fe.user_id = %s"
-                params.append(user_id)
-
-            cursor.execute(query, params)
-
-            embeddings = []
-            labels = []
-            user_ids = []
-            for row in cursor:
-                embeddings.append(np.frombuffer(row["embedding"], dtype=np.float32))
-                labels.append(row["name"])
-                user_ids.append(row["user_id"])
-            return np.array(embeddings), np.array(labels), np.array(user_ids)
-        except Error as e:
-            print(f"Error loading embeddings: {e}")
+        try:
+            return self._run(work)
+        except DB_ERRORS as e:
+            logger.error("Error loading embeddings: %s", e)
             raise
-        finally:
-            if cursor:
-                cursor.close()
-            if self.conn and self.conn.is_connected():
-                self.conn.close()
 
-    def get_student_names(self):
+    def delete_embeddings(self, user_id):
+        def work(cursor):
+            cursor.execute(
+                self._sql("DELETE FROM face_embeddings WHERE user_id = %s"),
+                (user_id,),
+            )
+            return cursor.rowcount
+
         try:
-            self.conn = self._get_connection()
-            cursor = self.conn.cursor()
+            deleted = self._run(work)
+            logger.info("✅ Deleted %s embeddings for user %s", deleted, user_id)
+            return deleted
+        except DB_ERRORS as e:
+            logger.error("Error deleting embeddings: %s", e)
+            raise
+
+    def get_student_names(self):
+        def work(cursor):
             cursor.execute("SELECT DISTINCT name FROM users")
-            names = [row[0] for row in cursor.fetchall()]
-            return names
-        except Error as e:
-            print(f"Error getting student names: {e}")
+            return [row[0] for row in cursor.fetchall()]
+
+        try:
+            return self._run(work)
+        except DB_ERRORS as e:
+            logger.error("Error getting student names: %s", e)
             raise
-        finally:
-            if cursor:
-                cursor.close()
-            if self.conn and self.conn.is_connected():
-                self.conn.close()
+
+    def stats(self) -> Dict:
+        return {
+            "backend": self.backend,
+            "pool_size": self.pool_size,
+            "connections": self._created,
+            "idle": self._idle.qsize(),
+            "pool_wait_seconds": self.pool_wait.snapshot(),
+            "query_seconds": self.query_latency.snapshot(),
+        }
+
+
+# Faces per FaceNet forward pass
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
 
 
 class FaceRecognition:
     def __init__(self, target_size=(160, 160)):
         self.target_size = target_size
-        self.detector = MTCNN()
-        self.facenet = (
-            InceptionResnetV1(pretrained="vggface2")
-            .eval()
-            .to("cuda" if torch.cuda.is_available() else "cpu")
-        )
+        self._detector = None
+        self._detector_lock = threading.Lock()
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.facenet = onnx_backed(
+            "facenet",
+            lambda: InceptionResnetV1(pretrained="vggface2").eval().to(self.device),
+            (3, *target_size),
+            ["embedding"],
+        )()
         self.align_params = {
             "desired_left_eye": (0.35, 0.35),
             "desired_right_eye": (0.65, 0.35),
             "desired_nose": (0.50, 0.50),
         }
 
+    @property
+    def detector(self):
+        # MTCNN is only the fallback aligner, so build it on first use
+        if self._detector is None:
+            self._detector = MTCNN()
+        return self._detector
+
     def _align_face(self, img, keypoints):
         src_points = np.array(
             [keypoints["left_eye"], keypoints["right_eye"], keypoints["nose"]],
@@ -249,29 +932,54 @@ class FaceRecognition:
         M = cv2.getAffineTransform(src_points, dst_points)
         return cv2.warpAffine(img, M, self.target_size)
 
-    def process_image(self, img):
-        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img_rgb = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2LAB)
+    @staticmethod
+    def _equalize(img_rgb):
+        img_lab = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2LAB)
         clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        img_rgb[:, :, 0] = clahe.apply(img_rgb[:, :, 0])
-        img_rgb = cv2.cvtColor(img_rgb, cv2.COLOR_LAB2RGB)
-        detections = self.detector.detect_faces(img_rgb)
+        img_lab[:, :, 0] = clahe.apply(img_lab[:, :, 0])
+        return cv2.cvtColor(img_lab, cv2.COLOR_LAB2RGB)
+
+    def process_image(self, img, keypoints=None):
+        """Equalize and align a face crop, running MTCNN only when no keypoints are given"""
+        img_rgb = self._equalize(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+        if keypoints is not None:
+            return self._align_face(img_rgb, keypoints)
+        with self._detector_lock:
+            detections = self.detector.detect_faces(img_rgb)
         if not detections:
             return None
         return self._align_face(img_rgb, detections[0]["keypoints"])
 
     def generate_embeddings(self, face_img):
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        face_tensor = torch.from_numpy(face_img.transpose(2, 0, 1)).float().to(device)
-        face_tensor = (face_tensor / 255.0 - 0.5) / 0.5
+        return self.generate_embeddings_batch([face_img])[0]
+
+    @timed_stage("embedding")
+    def generate_embeddings_batch(self, face_imgs, batch_size=EMBED_BATCH_SIZE):
+        """Embed a stack of aligned RGB faces, returning L2-normalized (N, 512) float32"""
+        if len(face_imgs) == 0:
+            return np.empty((0, 512), dtype=np.float32)
+        faces = np.asarray(face_imgs, dtype=np.float32)
+        # NHWC in [0, 255] -> NCHW in [-1, 1], done once for the whole stack
+        faces = (faces.transpose(0, 3, 1, 2) / 255.0 - 0.5) / 0.5
+        embeddings = []
         with torch.no_grad():
-            return self.facenet(face_tensor.unsqueeze(0)).cpu().numpy().flatten()
+            for start in range(0, len(faces), batch_size):
+                chunk = torch.from_numpy(faces[start : start + batch_size]).to(
+                    self.device
+                )
+                embeddings.append(self.facenet(chunk).cpu().numpy())
+        embeddings = np.concatenate(embeddings).astype(np.float32, copy=False)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings
+
+
+model_registry.register("face_recognition", FaceRecognition)
 
 
 class BatchProcessor:
-    def __init__(self):
-        self.fr = FaceRecognition()
-        self.db = FaceDB()
+    def __init__(self, db: FaceDB = None, fr: FaceRecognition = None):
+        self.fr = fr or model_registry.get("face_recognition")
+        self.db = db or FaceDB()
 
     def _augment(self, face):
         augments = []
@@ -297,23 +1005,11 @@ class BatchProcessor:
         ]
 
         # Verify that the user_id exists in the users table
-        try:
-            conn = self.db._get_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT id FROM users WHERE id = %s", (user_id,))
-            result = cursor.fetchone()
-            if not result:
-                raise ValueError(f"User with ID {user_id} does not exist")
-        except Error as e:
-            print(f"Error verifying user_id: {e}")
-            raise
-        finally:
-            if cursor:
-                cursor.close()
-            if conn and conn.is_connected():
-                conn.close()
+        if not self.db.get_user(user_id):
+            raise ValueError(f"User with ID {user_id} does not exist")
 
-        # Process images and generate embeddings
+        # Process images and generate embeddings, one FaceNet batch at a time
+        pending = []
         for img_file in tqdm(image_files[:500], desc=f"Processing user_id {user_id}"):
             img_path = os.path.join(directory, img_file)
             try:
@@ -323,132 +1019,432 @@ class BatchProcessor:
                 aligned = self.fr.process_image(img)
                 if aligned is None:
                     continue
-                for aug_face in self._augment(aligned):
-                    embedding = self.fr.generate_embeddings(aug_face)
-                    all_embeddings.append(embedding)
+                pending.extend(self._augment(aligned))
             except Exception as e:
-                print(f"Error processing {img_file}: {str(e)}")
+                logger.error("Error processing %s: %s", img_file, e)
                 continue
+            if len(pending) >= EMBED_BATCH_SIZE:
+                all_embeddings.extend(self.fr.generate_embeddings_batch(pending))
+                pending = []
+        if pending:
+            all_embeddings.extend(self.fr.generate_embeddings_batch(pending))
 
         # Store embeddings if any were generated
         if all_embeddings:
             self.db.store_embeddings(user_id, all_embeddings)
-            print(f"✅ User {user_id} stored with {len(all_embeddings)} embeddings")
+            logger.info(
+                "✅ User %s stored with %s embeddings", user_id, len(all_embeddings)
+            )
         else:
-            print(f"❌ Failed to process user {user_id}")
+            logger.error("❌ Failed to process user %s", user_id)
+
+
+# 1:1 verification against per-user prototype embeddings
+VERIFY_THRESHOLD = float(os.getenv("VERIFY_THRESHOLD", "0.6"))
+VERIFY_PROTOTYPES = int(os.getenv("VERIFY_PROTOTYPES", "3"))
+VERIFY_SCALE = float(os.getenv("VERIFY_SCALE", "20"))
+# Laravel accepts a verification match at confidence >= 0.7
+VERIFY_PASS_CONFIDENCE = 0.7
+
+
+def build_prototypes(vectors: np.ndarray, count: int = VERIFY_PROTOTYPES) -> np.ndarray:
+    """Summarise one user's embeddings as their centroid plus up to `count` cluster medoids"""
+    centroid = vectors.mean(axis=0)
+    centroid /= np.linalg.norm(centroid)
+    k = min(count, len(vectors))
+    if k <= 1:
+        return centroid[None, :]
+
+    # Spherical k-means seeded by farthest-point sampling
+    seeds = [int(np.argmax(vectors @ centroid))]
+    closest = vectors @ vectors[seeds[0]]
+    while len(seeds) < k:
+        seeds.append(int(np.argmin(closest)))
+        closest = np.maximum(closest, vectors @ vectors[seeds[-1]])
+    centers = vectors[seeds]
+    for _ in range(10):
+        assignment = np.argmax(vectors @ centers.T, axis=1)
+        for c in range(k):
+            members = vectors[assignment == c]
+            if len(members):
+                mean = members.mean(axis=0)
+                centers[c] = mean / np.linalg.norm(mean)
+
+    # A medoid is the real embedding closest to its cluster center
+    assignment = np.argmax(vectors @ centers.T, axis=1)
+    medoids = []
+    for c in range(k):
+        members = vectors[assignment == c]
+        if len(members):
+            medoids.append(members[np.argmax(members @ centers[c])])
+    return np.vstack([centroid] + medoids).astype(np.float32)
+
+
+def calibrate_similarity(similarity: float) -> float:
+    """Map cosine similarity to a confidence that crosses VERIFY_PASS_CONFIDENCE at the threshold"""
+    offset = np.log(VERIFY_PASS_CONFIDENCE / (1 - VERIFY_PASS_CONFIDENCE))
+    return float(
+        1 / (1 + np.exp(-(VERIFY_SCALE * (similarity - VERIFY_THRESHOLD) + offset)))
+    )
+
+
+class FaceIndex:
+    """In-memory FAISS index of every enrolled embedding, loaded once and updated in place"""
+
+    def __init__(self, dim=512):
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dim))
+        self._next_id = 0
+        self._owners: Dict[int, int] = {}  # FAISS id -> user_id
+        self._user_ids: Dict[int, np.ndarray] = {}  # user_id -> FAISS ids
+        self._prototypes: Dict[int, np.ndarray] = {}  # user_id -> centroid + medoids
+        self._names: Dict[int, str] = {}
+
+    def load(self, db: "FaceDB"):
+        """Replace the index contents with every embedding stored in the database"""
+        embeddings, labels, user_ids = db.load_embeddings()
+        # Group rows by user in one sort instead of a mask per user
+        order = np.argsort(user_ids, kind="stable")
+        users, starts = np.unique(user_ids[order], return_index=True)
+        with self._lock:
+            self._reset()
+            for user_id, rows in zip(users, np.split(order, starts[1:])):
+                self.add(int(user_id), str(labels[rows[0]]), embeddings[rows])
+        logger.info("✅ Loaded %s embeddings into the face index", len(embeddings))
+
+    def add(self, user_id: int, name: str, embeddings):
+        """Append a user's embeddings under fresh ids"""
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32).reshape(
+            -1, self.dim
+        )
+        if len(vectors) == 0:
+            return
+        vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        with self._lock:
+            ids = np.arange(self._next_id, self._next_id + len(vectors), dtype=np.int64)
+            self._next_id += len(vectors)
+            self.index.add_with_ids(vectors, ids)
+            for faiss_id in ids.tolist():
+                self._owners[faiss_id] = user_id
+            if user_id in self._user_ids:
+                ids = np.concatenate([self._user_ids[user_id], ids])
+                vectors = self._vectors(ids)
+            self._user_ids[user_id] = ids
+            self._prototypes[user_id] = build_prototypes(vectors)
+            self._names[user_id] = name
+
+    def _vectors(self, ids: np.ndarray) -> np.ndarray:
+        """Stored embeddings for FAISS ids, read back from the index rather than kept twice"""
+        return np.vstack([self.index.reconstruct(int(faiss_id)) for faiss_id in ids])
+
+    def remove_user(self, user_id: int) -> int:
+        """Drop every embedding of a user, returning how many were removed"""
+        with self._lock:
+            ids = self._user_ids.pop(user_id, None)
+            if ids is None:
+                return 0
+            self.index.remove_ids(ids)
+            for faiss_id in ids.tolist():
+                del self._owners[faiss_id]
+            del self._prototypes[user_id]
+            del self._names[user_id]
+            return len(ids)
+
+    def replace_user(self, user_id: int, name: str, embeddings):
+        """Swap a user's embeddings for new ones in one step, as seen by searches"""
+        with self._lock:
+            self.remove_user(user_id)
+            self.add(user_id, name, embeddings)
+
+    def has_user(self, user_id: int) -> bool:
+        return user_id in self._user_ids
+
+    @timed_stage("faiss_search")
+    def search(self, embedding, k=3) -> List[tuple]:
+        """Top-k (user_id, name, similarity) over the whole population"""
+        with self._lock:
+            if self.index.ntotal == 0:
+                return []
+            scores, ids = self.index.search(
+                np.asarray(embedding, dtype=np.float32).reshape(1, -1),
+                min(k, self.index.ntotal),
+            )
+            hits = []
+            for score, faiss_id in zip(scores[0], ids[0]):
+                if faiss_id == -1:
+                    continue
+                user_id = self._owners[int(faiss_id)]
+                hits.append((user_id, self._names[user_id], float(score)))
+            return hits
+
+    @timed_stage("faiss_search")
+    def search_user(self, user_id: int, embedding, k=3) -> List[tuple]:
+        """Top-k (user_id, name, similarity) among one user's own embeddings"""
+        with self._lock:
+            ids = self._user_ids.get(user_id)
+            if ids is None:
+                return []
+            vectors = self._vectors(ids)
+            name = self._names[user_id]
+        scores = vectors @ np.asarray(embedding, dtype=np.float32).reshape(-1)
+        top = np.argsort(-scores)[:k]
+        return [(user_id, name, float(scores[i])) for i in top]
+
+    def verify(self, user_id: int, embedding) -> tuple:
+        """Best cosine similarity between an embedding and a user's prototypes"""
+        with self._lock:
+            prototypes = self._prototypes[user_id]
+            name = self._names[user_id]
+        scores = prototypes @ np.asarray(embedding, dtype=np.float32).reshape(-1)
+        return float(scores.max()), name
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "users": len(self._user_ids),
+                "embeddings": int(self.index.ntotal),
+                "prototypes": int(sum(len(p) for p in self._prototypes.values())),
+            }
+
+
+face_index = FaceIndex()
+
+
+# Minimum YOLO keypoint confidence to align without falling back to MTCNN
+KEYPOINT_MIN_CONFIDENCE = float(os.getenv("KEYPOINT_MIN_CONFIDENCE", "0.5"))
+
+
+def face_detections(results, min_confidence: float = KEYPOINT_MIN_CONFIDENCE):
+    """Boxes from one YOLO face result, each with eye/nose keypoints when the model provides them"""
+    if results[0].boxes is None:
+        return []
+    boxes = results[0].boxes.xyxy.cpu().numpy()
+    keypoints = getattr(results[0], "keypoints", None)
+    points = keypoints.data.cpu().numpy() if keypoints is not None else None
+
+    detections = []
+    for i, box in enumerate(boxes):
+        x1, y1, x2, y2 = map(int, box)
+        face_keypoints = None
+        # Face-landmark YOLO models emit eyes, nose and mouth corners as (x, y, conf)
+        if points is not None and i < len(points) and points.shape[1] >= 3:
+            eyes_nose = points[i, :3]
+            confident = (
+                eyes_nose.shape[1] < 3 or eyes_nose[:, 2].min() >= min_confidence
+            )
+            if confident:
+                left_eye, right_eye = sorted(eyes_nose[:2, :2].tolist())
+                face_keypoints = {
+                    "left_eye": left_eye,
+                    "right_eye": right_eye,
+                    "nose": eyes_nose[2, :2].tolist(),
+                }
+        detections.append(((x1, y1, x2, y2), face_keypoints))
+    return detections
 
 
 class RealTimeRecognizer:
-    def __init__(self):
-        self.yolo = YOLO(FACE_MODEL_PATH)
-        self.fr = FaceRecognition()
-        self.db = FaceDB()
+    def __init__(self, db: FaceDB = None):
+        self.db = db or FaceDB()
+        self.index = face_index
+        # Recognitions run one at a time over the shared detector and FaceNet
+        self._lock = threading.Lock()
         self._refresh_embeddings()
 
-    def _refresh_embeddings(self, user_id=None):
-        """Update embeddings from the database"""
-        self.embeddings, self.labels, self.user_ids = self.db.load_embeddings(user_id)
-        if len(self.embeddings) == 0:
-            self.index = None
-            print(
-                f"No embeddings found for user_id: {user_id if user_id else 'all users'}"
-            )
-            return
-        self.index = faiss.IndexFlatIP(self.embeddings.shape[1])
-        self.index.add(self.embeddings)
-        print(f"✅ Loaded {len(self.embeddings)} embeddings")
+    @property
+    def yolo(self):
+        return model_registry.get("face_detector")
+
+    @property
+    def fr(self):
+        return model_registry.get("face_recognition")
+
+    def _detect(self, img_rgb):
+        # The face detector is shared with the proctoring pipeline
+        with face_detector_lock:
+            return face_detections(self.yolo(img_rgb))
+
+    def _refresh_embeddings(self):
+        """Reload the resident index from the database"""
+        self.index.load(self.db)
+
+    def _embed_faces(self, img, detections):
+        """Align every detected face and embed them together, yielding (box, normalized embedding)
+
+        Crops come from the BGR frame: FaceRecognition.process_image converts to
+        RGB itself, exactly as it does for enrollment images.
+        """
+        boxes, faces = [], []
+        for (x1, y1, x2, y2), keypoints in detections:
+            face_roi = img[y1:y2, x1:x2]
+            if keypoints is not None:
+                # Shift the detector keypoints into crop coordinates
+                keypoints = {
+                    name: (x - x1, y - y1) for name, (x, y) in keypoints.items()
+                }
+            try:
+                aligned = self.fr.process_image(face_roi, keypoints)
+                if aligned is None:
+                    continue
+                boxes.append((x1, y1, x2, y2))
+                faces.append(aligned)
+            except Exception as e:
+                logger.error("Processing error: %s", e)
+                continue
+        if faces:
+            yield from zip(boxes, self.fr.generate_embeddings_batch(faces))
+
+    @staticmethod
+    def _draw(img_rgb, box, label, confidence):
+        x1, y1, x2, y2 = box
+        color = (0, 255, 0) if confidence > 0.7 else (0, 0, 255)
+        cv2.rectangle(img_rgb, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(
+            img_rgb,
+            f"{label} ({confidence:.2f})",
+            (x1, y1 - 10),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.8,
+            color,
+            2,
+        )
+
+    @staticmethod
+    def _unknown_matches(detections):
+        return [
+            {
+                "user_id": 0,
+                "name": "unknown",
+                "confidence": 0.5,
+                "box": list(box),
+            }
+            for box, _ in detections
+        ]
 
+    @timed_stage("recognize")
     def process_image(self, img, user_id=None):
         """Process image for API usage"""
+        with self._lock:
+            return self._recognize(img, user_id)
+
+    def verify(self, img, user_id):
+        """1:1 check of the faces in an image against one user's prototypes"""
+        with self._lock:
+            return self._verify(img, int(user_id))
+
+    def _recognize(self, img, user_id=None):
         img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        results = self.yolo(img_rgb)
+        detections = self._detect(img_rgb)
         matches = []
 
-        if results[0].boxes is None:
+        if not detections:
             return img, []
 
-        # Refresh embeddings for the specific user
         if user_id is not None:
-            self._refresh_embeddings(user_id=user_id)
-        else:
-            self._refresh_embeddings()  # Fallback to all users if no user_id provided
-
-        for box in results[0].boxes.xyxy.cpu().numpy():
-            x1, y1, x2, y2 = map(int, box)
-            face_roi = img_rgb[y1:y2, x1:x2]
-            try:
-                aligned = self.fr.process_image(face_roi)
-                if aligned is None:
-                    continue
-                embedding = self.fr.generate_embeddings(aligned)
-                embedding /= np.linalg.norm(embedding)
-                if self.index is None:
-                    print("No embeddings available for recognition.")
-                    continue
+            user_id = int(user_id)
 
-                _, indices = self.index.search(embedding.reshape(1, -1), 3)
-                votes = {}
-                for idx in indices[0]:
-                    label = self.labels[idx]
-                    votes[label] = votes.get(label, 0) + 1
-                if votes:
-                    best_match = max(votes, key=votes.get)
-                    confidence = votes[best_match] / 3
-                    matched_user_id = self.user_ids[
-                        self.labels.tolist().index(best_match)
-                    ]
-
-                    # Only include match if it corresponds to the provided user_id
-                    if user_id is None or matched_user_id == user_id:
-                        matches.append(
-                            {
-                                "user_id": int(matched_user_id),
-                                "name": best_match,
-                                "confidence": float(confidence),
-                                "box": [int(x1), int(y1), int(x2), int(y2)],
-                            }
-                        )
-                    else:
-                        print(
-                            f"Match found for user {matched_user_id}, but expected {user_id}"
-                        )
-
-                    color = (0, 255, 0) if confidence > 0.7 else (0, 0, 255)
-                    cv2.rectangle(img_rgb, (x1, y1), (x2, y2), color, 2)
-                    cv2.putText(
-                        img_rgb,
-                        f"{best_match} ({confidence:.2f})",
-                        (x1, y1 - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.8,
-                        color,
-                        2,
-                    )
-            except Exception as e:
-                print(f"Processing error: {str(e)}")
+        for box, embedding in self._embed_faces(img, detections):
+            # Verification only needs the claimed user's embeddings
+            if user_id is not None:
+                hits = self.index.search_user(user_id, embedding, 3)
+            else:
+                hits = self.index.search(embedding, 3)
+            if not hits:
+                logger.debug("No embeddings available for recognition.")
                 continue
+
+            votes = {}
+            names = {}
+            for hit_user_id, hit_name, _ in hits:
+                votes[hit_user_id] = votes.get(hit_user_id, 0) + 1
+                names[hit_user_id] = hit_name
+            matched_user_id = max(votes, key=votes.get)
+            best_match = names[matched_user_id]
+            confidence = votes[matched_user_id] / 3
+
+            # Only include match if it corresponds to the provided user_id
+            if user_id is None or matched_user_id == user_id:
+                matches.append(
+                    {
+                        "user_id": int(matched_user_id),
+                        "name": best_match,
+                        "confidence": float(confidence),
+                        "box": list(box),
+                    }
+                )
+            else:
+                logger.debug(
+                    "Match found for user %s, but expected %s", matched_user_id, user_id
+                )
+            self._draw(img_rgb, box, best_match, confidence)
         output_img = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2BGR)
 
         # If no matches and faces were detected, return "unknown"
-        if not matches and results[0].boxes is not None:
-            for box in results[0].boxes.xyxy.cpu().numpy():
-                x1, y1, x2, y2 = map(int, box)
+        if not matches:
+            matches = self._unknown_matches(detections)
+        return output_img, matches
+
+    def _verify(self, img, user_id):
+        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        detections = self._detect(img_rgb)
+        verification = {
+            "user_id": user_id,
+            "verified": False,
+            "similarity": None,
+            "confidence": 0.0,
+            "threshold": VERIFY_THRESHOLD,
+        }
+
+        if not detections:
+            return img, [], verification
+        if not self.index.has_user(user_id):
+            logger.debug("No embeddings enrolled for user %s", user_id)
+            return img, self._unknown_matches(detections), verification
+
+        matches = []
+        for box, embedding in self._embed_faces(img, detections):
+            similarity, name = self.index.verify(user_id, embedding)
+            confidence = calibrate_similarity(similarity)
+            if (
+                verification["similarity"] is None
+                or similarity > verification["similarity"]
+            ):
+                verification.update(
+                    similarity=similarity,
+                    confidence=confidence,
+                    verified=similarity >= VERIFY_THRESHOLD,
+                )
+            if similarity >= VERIFY_THRESHOLD:
                 matches.append(
                     {
-                        "user_id": 0,
-                        "name": "unknown",
-                        "confidence": 0.5,
-                        "box": [int(x1), int(y1), int(x2), int(y2)],
+                        "user_id": user_id,
+                        "name": name,
+                        "confidence": confidence,
+                        "similarity": similarity,
+                        "box": list(box),
                     }
                 )
-        return output_img, matches
+            self._draw(img_rgb, box, name, confidence)
+        output_img = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2BGR)
+
+        if not matches:
+            matches = self._unknown_matches(detections)
+        return output_img, matches, verification
 
 
 # Define the exact model used during training
 class PoseAwareResNet(torch.nn.Module):
-    def __init__(self, freeze_backbone=False):
+    def __init__(self, freeze_backbone=False, pretrained_backbone=True):
         super().__init__()
-        self.backbone = models.resnet18(weights=models.ResNet18_Weights.IMAGENET1K_V1)
+        self.backbone = models.resnet18(
+            weights=(
+                models.ResNet18_Weights.IMAGENET1K_V1 if pretrained_backbone else None
+            )
+        )
         if freeze_backbone:
             for param in self.backbone.parameters():
                 param.requires_grad = False
@@ -476,16 +1472,30 @@ class PoseAwareResNet(torch.nn.Module):
         return angles, pose_logits
 
 
-# Instantiate model and load weights
-model = PoseAwareResNet().to(device)
+def load_head_pose_model():
+    # Instantiate model and load weights
+    model = PoseAwareResNet().to(device)
+
+    # Load checkpoint
+    checkpoint = torch.load(head_pose_model_path, map_location=device)
+    model_state_dict = checkpoint.get("model_state_dict", checkpoint)
 
-# Load checkpoint
-checkpoint = torch.load(head_pose_model_path, map_location=device)
-model_state_dict = checkpoint.get("model_state_dict", checkpoint)
+    # Load weights
+    model.load_state_dict(model_state_dict)
+    model.eval()
+    return model
 
-# Load weights
-model.load_state_dict(model_state_dict)
-model.eval()
+
+model_registry.register(
+    "head_pose",
+    onnx_backed(
+        "head_pose",
+        load_head_pose_model,
+        (3, 256, 256),
+        ["angles", "pose_logits"],
+        source=head_pose_model_path,
+    ),
+)
 
 # Define normalization parameters
 angle_ranges = {"yaw": (-75, 75), "pitch": (-60, 80), "roll": (-80, 40)}
@@ -510,6 +1520,31 @@ transform = transforms.Compose(
     ]
 )
 
+# Head pose input: crops are resized with cv2 into one uint8 batch and normalized
+# on the device in a single pass, matching `transform` without a PIL round trip
+HEAD_POSE_INPUT_SIZE = 256
+# ImageNet statistics shared by the head pose and gaze backbones
+IMAGENET_MEAN = torch.tensor([0.485, 0.456, 0.406], device=device).view(1, 3, 1, 1)
+IMAGENET_STD = torch.tensor([0.229, 0.224, 0.225], device=device).view(1, 3, 1, 1)
+
+
+def preprocess_face_crops(face_crops: List[np.ndarray]) -> torch.Tensor:
+    """Resize RGB face crops into a normalized (N, 3, 256, 256) float tensor"""
+    size = HEAD_POSE_INPUT_SIZE
+    batch = np.empty((len(face_crops), size, size, 3), dtype=np.uint8)
+    for i, crop in enumerate(face_crops):
+        # INTER_AREA when shrinking approximates PIL's antialiased bilinear resize
+        shrinking = crop.shape[0] > size or crop.shape[1] > size
+        cv2.resize(
+            crop,
+            (size, size),
+            dst=batch[i],
+            interpolation=cv2.INTER_AREA if shrinking else cv2.INTER_LINEAR,
+        )
+    tensor = torch.from_numpy(batch).to(device).permute(0, 3, 1, 2).float()
+    return tensor.div_(255.0).sub_(IMAGENET_MEAN).div_(IMAGENET_STD)
+
+
 # Pose thresholds
 POSE_THRESHOLDS = {
     "frontal": (-10, 10),
@@ -540,6 +1575,8 @@ def get_pose_category(pitch, yaw):
 
 # Exponential Moving Average (EMA) for smoothing
 class EMA:
+    __slots__ = ("alpha", "ema_yaw", "ema_pitch", "ema_roll")
+
     def __init__(self, alpha=0.3):
         self.alpha = alpha
         self.ema_yaw = None
@@ -558,9 +1595,6 @@ class EMA:
         return self.ema_yaw, self.ema_pitch, self.ema_roll
 
 
-# Initialize EMA smoother
-ema_smoother = EMA(alpha=0.3)
-
 # Cheating score weights
 CHEATING_WEIGHTS = {
     "multiple_faces": 20,
@@ -572,58 +1606,215 @@ CHEATING_WEIGHTS = {
 
 
 # Function to detect faces using YOLO
-def detect_faces(image: Image.Image) -> List[Dict]:
-    """Run face detection"""
-    try:
-        # Convert PIL Image to OpenCV format
-        image_np = np.array(image)
-        image_cv = cv2.cvtColor(image_np, cv2.COLOR_RGB2BGR)
-        # Enhance image: increase brightness and contrast
-        image_cv = cv2.convertScaleAbs(image_cv, alpha=1.5, beta=20)
-        # Optional: Resize to match training resolution
-        image_cv = cv2.resize(image_cv, (640, 640))
-        results = face_detector(image_cv)
-        print(f"YOLO raw results: {results}")
-        faces = []
-        for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                if box.conf >= 0.5:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    # Scale bounding box back to original image size
-                    orig_width, orig_height = image.size
-                    x1 = int(x1 * orig_width / 640)
-                    y1 = int(y1 * orig_height / 640)
-                    x2 = int(x2 * orig_width / 640)
-                    y2 = int(y2 * orig_height / 640)
-                    faces.append(
-                        {
-                            "bounding_box": [x1, y1, x2, y2],
-                            "confidence": float(box.conf),
+# Detector input resolution (frames are stretched to it, as the models were trained)
+DETECTOR_INPUT_SIZE = (640, 640)
+
+
+class Frame:
+    """One decoded frame whose derived views are built once and shared by every detector
+
+    Views are cached by name. Detectors may build the same view concurrently
+    from different pool threads; the race only costs duplicate work.
+    """
+
+    __slots__ = ("_views", "size", "bytes_reused")
+
+    def __init__(self, bgr: np.ndarray = None, rgb: np.ndarray = None):
+        self._views = {}
+        if bgr is not None:
+            self._views["bgr"] = bgr
+        if rgb is not None:
+            self._views["rgb"] = rgb
+        source = bgr if bgr is not None else rgb
+        # (width, height), matching PIL's Image.size
+        self.size = (source.shape[1], source.shape[0])
+        self.bytes_reused = 0
+
+    @classmethod
+    @timed_stage("decode")
+    def from_bytes(cls, buffer) -> "Frame":
+        """Decode encoded image bytes (or a memoryview over them) straight to BGR"""
+        bgr = cv2.imdecode(np.frombuffer(buffer, np.uint8), cv2.IMREAD_COLOR)
+        if bgr is None:
+            raise ValueError("Invalid image")
+        return cls(bgr=bgr)
+
+    @classmethod
+    def from_pil(cls, image: Image.Image) -> "Frame":
+        return cls(rgb=np.asarray(image.convert("RGB")))
+
+    def view(self, name: str, build):
+        cached = self._views.get(name)
+        if cached is None:
+            cached = self._views.setdefault(name, build())
+        else:
+            self.bytes_reused += cached.nbytes
+        return cached
+
+    @property
+    def bgr(self) -> np.ndarray:
+        return self.view("bgr", lambda: cv2.cvtColor(self.rgb, cv2.COLOR_RGB2BGR))
+
+    @property
+    def rgb(self) -> np.ndarray:
+        return self.view("rgb", lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB))
+
+    @property
+    def gray(self) -> np.ndarray:
+        return self.view("gray", lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY))
+
+    @property
+    def bgr_640(self) -> np.ndarray:
+        """BGR at the detector input size, shared by object and gaze detection"""
+        return self.view("bgr_640", lambda: cv2.resize(self.bgr, DETECTOR_INPUT_SIZE))
+
+    @property
+    def enhanced_640(self) -> np.ndarray:
+        """Brightened, contrast-stretched BGR at the detector input size for face detection"""
+        return self.view(
+            "enhanced_640",
+            lambda: cv2.resize(
+                cv2.convertScaleAbs(self.bgr, alpha=1.5, beta=20), DETECTOR_INPUT_SIZE
+            ),
+        )
+
+    @property
+    def mirrored_640(self) -> np.ndarray:
+        """Horizontally flipped bgr_640, as the gaze model was trained on selfie views"""
+        return self.view("mirrored_640", lambda: cv2.flip(self.bgr_640, 1))
+
+    @property
+    def mirrored_640_rgb(self) -> np.ndarray:
+        return self.view(
+            "mirrored_640_rgb",
+            lambda: cv2.cvtColor(self.mirrored_640, cv2.COLOR_BGR2RGB),
+        )
+
+    def crop(self, box) -> np.ndarray:
+        """RGB crop as a view into the frame (no copy)"""
+        x1, y1, x2, y2 = box
+        return self.view(
+            f"crop_{x1}_{y1}_{x2}_{y2}",
+            lambda: self.rgb[max(0, y1) : max(0, y2), max(0, x1) : max(0, x2)],
+        )
+
+    def dhash(self) -> int:
+        """64-bit difference hash of the grayscale frame, for near-duplicate detection"""
+        small = cv2.resize(self.gray, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = (small[:, 1:] > small[:, :-1]).flatten()
+        return int(np.packbits(bits).view(">u8")[0])
+
+    def nbytes(self) -> int:
+        # Crops are views into rgb and own no memory
+        return sum(v.nbytes for v in self._views.values() if v.base is None)
+
+
+class FrameMetrics:
+    """Running totals of frame decoding and of the view bytes reused from cache"""
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes_decoded = 0
+        self.bytes_reused = 0
+
+    def record(self, frame: Frame):
+        self.frames += 1
+        self.bytes_decoded += frame.nbytes()
+        self.bytes_reused += frame.bytes_reused
+
+    def stats(self) -> Dict:
+        return {
+            "frames": self.frames,
+            "bytes_decoded": self.bytes_decoded,
+            "bytes_reused": self.bytes_reused,
+        }
+
+
+frame_metrics = FrameMetrics()
+
+
+@timed_stage("detect_faces")
+def detect_faces_batch(images: List[Frame]) -> List[List[Dict]]:
+    """Run face detection on a batch of frames"""
+    try:
+        batch = [image.enhanced_640 for image in images]
+        face_detector = model_registry.get("face_detector")
+        with face_detector_lock:
+            results = face_detector(batch)
+        logger.debug("YOLO raw results: %s", results)
+        all_faces = []
+        for result, image in zip(results, images):
+            faces = []
+            orig_width, orig_height = image.size
+            for box in result.boxes:
+                if box.conf >= 0.5:
+                    x1, y1, x2, y2 = map(int, box.xyxy[0])
+                    # Scale bounding box back to original image size
+                    x1 = int(x1 * orig_width / 640)
+                    y1 = int(y1 * orig_height / 640)
+                    x2 = int(x2 * orig_width / 640)
+                    y2 = int(y2 * orig_height / 640)
+                    faces.append(
+                        {
+                            "bounding_box": [x1, y1, x2, y2],
+                            "confidence": float(box.conf),
                         }
                     )
-        print(f"Detected faces: {faces}")
-        return faces
+            logger.debug("Detected faces: %s", faces)
+            all_faces.append(faces)
+        return all_faces
     except Exception as e:
-        print(f"Error in detect_faces: {str(e)}")
-        return []
+        logger.error("Error in detect_faces: %s", e)
+        return [[] for _ in images]
 
 
-# Function to process a single image and detect poses
-async def detect_head_pose(face_region: Image.Image):
-    """Run head pose estimation"""
-    input_tensor = transform(face_region).unsqueeze(0).to(device)
-    with torch.no_grad():
-        angles, _ = model(input_tensor)
-        pitch, yaw, roll = angles[0].cpu().numpy()
+def detect_faces(image: Frame) -> List[Dict]:
+    """Run face detection"""
+    return detect_faces_batch([image])[0]
+
+
+@timed_stage("head_pose")
+def estimate_head_poses(face_crops: List[np.ndarray]) -> List[Optional[Dict]]:
+    """Run head pose estimation on RGB face crops from any number of frames in one pass
+
+    Returns raw (unsmoothed) angles in degrees and their pose category per crop,
+    or None for a crop that is empty or could not be estimated.
+    """
+    poses = [None] * len(face_crops)
+    # Boxes clipped at the frame edge can leave empty crops, which cv2.resize rejects
+    valid = [
+        i
+        for i, crop in enumerate(face_crops)
+        if crop.ndim == 3 and crop.shape[0] > 0 and crop.shape[1] > 0
+    ]
+    if len(valid) < len(face_crops):
+        logger.warning("Skipping %s empty face crops", len(face_crops) - len(valid))
+    if not valid:
+        return poses
+    try:
+        input_tensor = preprocess_face_crops([face_crops[i] for i in valid])
+        with torch.no_grad():
+            angles, _ = model_registry.get("head_pose")(input_tensor)
+    except Exception as e:
+        logger.error("Error in head pose estimation: %s", e)
+        return poses
+
+    for i, (pitch, yaw, roll) in zip(valid, angles.cpu().numpy()):
+        pitch = float(denormalize_angle(pitch, "pitch"))
+        yaw = float(denormalize_angle(yaw, "yaw"))
+        roll = float(denormalize_angle(roll, "roll"))
+        poses[i] = {
+            "pose": get_pose_category(pitch, yaw),
+            "yaw": yaw,
+            "pitch": pitch,
+            "roll": roll,
+        }
+    return poses
 
-    # Denormalize
-    pitch = denormalize_angle(pitch, "pitch")
-    yaw = denormalize_angle(yaw, "yaw")
-    roll = denormalize_angle(roll, "roll")
 
-    # Apply EMA smoothing
-    smoothed_yaw, smoothed_pitch, smoothed_roll = ema_smoother.update(yaw, pitch, roll)
+def smooth_head_pose(pitch, yaw, roll, smoother: EMA) -> Dict:
+    """Apply EMA smoothing to raw angles and categorize the pose"""
+    smoothed_yaw, smoothed_pitch, smoothed_roll = smoother.update(yaw, pitch, roll)
 
     # Get pose category
     pose_category = get_pose_category(smoothed_pitch, smoothed_yaw)
@@ -636,27 +1827,36 @@ async def detect_head_pose(face_region: Image.Image):
     }
 
 
-def detect_objects(image: Image.Image) -> List[Dict]:
-    """Run object detection to check for suspicious objects"""
+# Function to process a single image and detect poses
+async def detect_head_pose(face_region, state: "SessionState" = None):
+    """Run head pose estimation"""
+    state = state or SessionState()
+    raw = estimate_head_poses([np.asarray(face_region)])[0]
+    if raw is None:
+        raise ValueError("Head pose could not be estimated for this face region")
+    return smooth_head_pose(raw["pitch"], raw["yaw"], raw["roll"], state.ema)
+
+
+@timed_stage("detect_objects")
+def detect_objects_batch(images: List[Frame]) -> List[List[Dict]]:
+    """Run object detection on a batch of frames to check for suspicious objects"""
     try:
-        # Convert PIL Image to OpenCV format
-        image_np = np.array(image)
-        image_cv = cv2.cvtColor(image_np, cv2.COLOR_RGB2BGR)
-        # Resize to match training resolution (640x640)
-        image_cv = cv2.resize(image_cv, (640, 640))
-        results = object_detection_model(image_cv)
-        print(f"YOLO raw results: {results}")
-
-        suspicious_objects = []
-        for result in results:
-            boxes = result.boxes
-            for box in boxes:
+        batch = [image.bgr_640 for image in images]
+        object_detection_model = model_registry.get("object_detector")
+        with object_detection_lock:
+            results = object_detection_model(batch)
+        logger.debug("YOLO raw results: %s", results)
+
+        all_objects = []
+        for result, image in zip(results, images):
+            suspicious_objects = []
+            orig_width, orig_height = image.size
+            for box in result.boxes:
                 if box.conf >= 0.5:
                     cls = int(box.cls[0])  # Class index
                     class_name = result.names[cls]  # Get class name
                     x1, y1, x2, y2 = map(int, box.xyxy[0])
                     # Scale back to original image size
-                    orig_width, orig_height = image.size
                     x1 = int(x1 * orig_width / 640)
                     y1 = int(y1 * orig_height / 640)
                     x2 = int(x2 * orig_width / 640)
@@ -668,18 +1868,28 @@ def detect_objects(image: Image.Image) -> List[Dict]:
                             "confidence": float(box.conf),
                         }
                     )
-        print(f"Suspicious objects: {suspicious_objects}")
-        return suspicious_objects
+            logger.debug("Suspicious objects: %s", suspicious_objects)
+            all_objects.append(suspicious_objects)
+        return all_objects
     except Exception as e:
-        print(f"Error in detect_objects: {str(e)}")
-        return []
+        logger.error("Error in detect_objects: %s", e)
+        return [[] for _ in images]
+
+
+def detect_objects(image: Frame) -> List[Dict]:
+    """Run object detection to check for suspicious objects"""
+    return detect_objects_batch([image])[0]
 
 
 # Gaze tracking model definition
 class GazeResNet18(nn.Module):
-    def __init__(self):
+    def __init__(self, pretrained_backbone=True):
         super().__init__()
-        self.base_model = models.resnet18(weights=models.ResNet18_Weights.IMAGENET1K_V1)
+        self.base_model = models.resnet18(
+            weights=(
+                models.ResNet18_Weights.IMAGENET1K_V1 if pretrained_backbone else None
+            )
+        )
         for i, (name, param) in enumerate(self.base_model.named_parameters()):
             if i < 30:
                 param.requires_grad = False
@@ -697,6 +1907,8 @@ class GazeResNet18(nn.Module):
 
 
 class GazeKalmanFilter:
+    __slots__ = ("kf",)
+
     def __init__(self):
         self.kf = cv2.KalmanFilter(3, 3)
         self.kf.measurementMatrix = np.eye(3, dtype=np.float32)
@@ -708,6 +1920,34 @@ class GazeKalmanFilter:
         self.kf.predict()
         return self.kf.correct(measurement.reshape(3, 1)).flatten()
 
+    def to_dict(self) -> Dict:
+        # predict() rebuilds the prior from these, so the posterior is the whole state
+        return {
+            "state": self.kf.statePost.flatten().tolist(),
+            "covariance": self.kf.errorCovPost.tolist(),
+        }
+
+    def load(self, data: Dict):
+        self.kf.statePost = np.array(data["state"], dtype=np.float32).reshape(3, 1)
+        self.kf.errorCovPost = np.array(data["covariance"], dtype=np.float32)
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the OpenCV filter matrices"""
+        return sum(
+            getattr(self.kf, name).nbytes
+            for name in (
+                "statePre",
+                "statePost",
+                "transitionMatrix",
+                "processNoiseCov",
+                "measurementMatrix",
+                "measurementNoiseCov",
+                "errorCovPre",
+                "errorCovPost",
+                "gain",
+            )
+        )
+
 
 def extract_eye_region(image, landmarks, eye_indices, expand_ratio=0.2, min_size=20):
     points = np.array(
@@ -729,15 +1969,58 @@ def extract_eye_region(image, landmarks, eye_indices, expand_ratio=0.2, min_size
     return image[y_min:y_max, x_min:x_max], (x_min, y_min, x_max, y_max)
 
 
-def preprocess_eye(eye_img):
-    transform = transforms.Compose(
-        [
-            transforms.Resize((224, 224)),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-        ]
-    )
-    return transform(Image.fromarray(cv2.cvtColor(eye_img, cv2.COLOR_BGR2RGB)))
+GAZE_INPUT_SIZE = 224
+
+
+class GazeEngine:
+    """Runs the gaze model on stacked eye crops through reusable input buffers
+
+    Every thread keeps its own uint8 staging array and float input tensor, grown
+    to the next power of two, so steady-state preprocessing allocates nothing.
+    """
+
+    def __init__(self, size: int = GAZE_INPUT_SIZE):
+        self.size = size
+        self._local = threading.local()
+
+    def _buffers(self, count: int):
+        local = self._local
+        capacity = getattr(local, "capacity", 0)
+        if capacity < count:
+            capacity = 1 << (count - 1).bit_length()
+            local.staging = np.empty((capacity, self.size, self.size, 3), np.uint8)
+            local.input = torch.empty(
+                (capacity, 3, self.size, self.size), dtype=torch.float32, device=device
+            )
+            local.capacity = capacity
+        return local.staging, local.input
+
+    def preprocess(self, eyes: List[np.ndarray]) -> torch.Tensor:
+        """Resize BGR eye crops into a normalized RGB (N, 3, 224, 224) view of the input buffer"""
+        staging, input_buffer = self._buffers(len(eyes))
+        for i, eye in enumerate(eyes):
+            shrinking = eye.shape[0] > self.size or eye.shape[1] > self.size
+            cv2.resize(
+                eye,
+                (self.size, self.size),
+                dst=staging[i],
+                interpolation=cv2.INTER_AREA if shrinking else cv2.INTER_LINEAR,
+            )
+            cv2.cvtColor(staging[i], cv2.COLOR_BGR2RGB, dst=staging[i])
+        batch = input_buffer[: len(eyes)]
+        batch.copy_(torch.from_numpy(staging[: len(eyes)]).permute(0, 3, 1, 2))
+        return batch.div_(255.0).sub_(IMAGENET_MEAN).div_(IMAGENET_STD)
+
+    def predict(self, eyes: List[np.ndarray]) -> np.ndarray:
+        """Gaze vectors (N, 3) for the eye crops in one forward pass"""
+        if not eyes:
+            return np.empty((0, 3), dtype=np.float32)
+        batch = self.preprocess(eyes)
+        with torch.no_grad():
+            return model_registry.get("gaze")(batch).cpu().numpy()
+
+
+gaze_engine = GazeEngine()
 
 
 def classify_gaze(gaze_vector, yaw_thresh=15):
@@ -777,102 +2060,134 @@ def classify_gaze(gaze_vector, yaw_thresh=15):
     return direction.strip(), yaw, pitch
 
 
-def detect_gaze(image: Image.Image) -> Dict:
-    """Run gaze tracking on the image"""
-    print("Starting gaze detection...")
-    try:
-        # Convert PIL Image to OpenCV format
-        image_np = np.array(image)
-        image_cv = cv2.cvtColor(image_np, cv2.COLOR_RGB2BGR)
-        image_cv = cv2.resize(image_cv, (640, 640))
-        image_cv = cv2.flip(image_cv, 1)
-        print("Image converted for gaze detection.")
-
+LEFT_EYE_INDICES = [
+    33,
+    7,
+    163,
+    144,
+    145,
+    153,
+    154,
+    155,
+    133,
+    173,
+    157,
+    158,
+    159,
+    160,
+    161,
+    246,
+]
+RIGHT_EYE_INDICES = [
+    362,
+    382,
+    381,
+    380,
+    374,
+    373,
+    390,
+    249,
+    263,
+    466,
+    388,
+    387,
+    386,
+    385,
+    384,
+    398,
+]
+
+
+def extract_eyes(image: Frame):
+    """Locate both eyes with MediaPipe, returning (status, None) on failure or (None, (left, right))"""
+    image_cv = image.mirrored_640
+
+    with mediapipe_lock:
         # Face detection
-        results = mp_face.process(cv2.cvtColor(image_cv, cv2.COLOR_BGR2RGB))
+        mp_face = model_registry.get("mediapipe_face")
+        results = mp_face.process(image.mirrored_640_rgb)
         if not results.detections:
-            print("Gaze detection: No face detected by MediaPipe.")
-            return {"status": "no_face_detected", "message": "No face detected"}
+            logger.debug("Gaze detection: No face detected by MediaPipe.")
+            return {"status": "no_face_detected", "message": "No face detected"}, None
 
         # Face mesh for landmarks
-        mesh_results = mp_face_mesh.process(image_cv)
-        if not mesh_results.multi_face_landmarks:
-            print("Gaze detection: Face detected but no landmarks found.")
-            return {
-                "status": "no_face_landmarks",
-                "message": "Face detected but no landmarks",
-            }
+        mesh_results = model_registry.get("mediapipe_mesh").process(image_cv)
+    if not mesh_results.multi_face_landmarks:
+        logger.debug("Gaze detection: Face detected but no landmarks found.")
+        return {
+            "status": "no_face_landmarks",
+            "message": "Face detected but no landmarks",
+        }, None
 
-        face_landmarks = mesh_results.multi_face_landmarks[0]
-        print("Gaze detection: Face landmarks detected.")
+    face_landmarks = mesh_results.multi_face_landmarks[0]
 
-        # Process both eyes
-        left_eye, left_box = extract_eye_region(
-            image_cv,
-            face_landmarks.landmark,
-            [
-                33,
-                7,
-                163,
-                144,
-                145,
-                153,
-                154,
-                155,
-                133,
-                173,
-                157,
-                158,
-                159,
-                160,
-                161,
-                246,
-            ],
-        )
-        right_eye, right_box = extract_eye_region(
-            image_cv,
-            face_landmarks.landmark,
-            [
-                362,
-                382,
-                381,
-                380,
-                374,
-                373,
-                390,
-                249,
-                263,
-                466,
-                388,
-                387,
-                386,
-                385,
-                384,
-                398,
-            ],
-        )
-        print("Gaze detection: Eye regions extracted.")
+    # Process both eyes
+    left_eye, _ = extract_eye_region(
+        image_cv, face_landmarks.landmark, LEFT_EYE_INDICES
+    )
+    right_eye, _ = extract_eye_region(
+        image_cv, face_landmarks.landmark, RIGHT_EYE_INDICES
+    )
+    return None, (left_eye, right_eye)
+
+
+@timed_stage("gaze")
+def detect_gaze_batch(images: List[Frame]) -> List[Dict]:
+    """Run the gaze model once over the eyes of every frame, returning raw gaze vectors"""
+    gaze_results = [None] * len(images)
+    eye_crops = []
+    owners = []
+    for i, image in enumerate(images):
+        try:
+            status, eyes = extract_eyes(image)
+            if status is not None:
+                gaze_results[i] = status
+                continue
+            if any(eye.size == 0 for eye in eyes):
+                gaze_results[i] = {"status": "error", "message": "Empty eye region"}
+                continue
+            # Left and right eyes sit next to each other in the batch
+            eye_crops.extend(eyes)
+            owners.append(i)
+        except Exception as e:
+            logger.error("Error in detect_gaze: %s", e)
+            gaze_results[i] = {"status": "error", "message": str(e)}
+
+    if owners:
+        try:
+            predictions = gaze_engine.predict(eye_crops)
+            for n, i in enumerate(owners):
+                left_gaze, right_gaze = predictions[2 * n], predictions[2 * n + 1]
+                gaze_results[i] = {
+                    "status": "success",
+                    "raw_gaze": (left_gaze + right_gaze) / 2,
+                }
+        except Exception as e:
+            logger.error("Error in detect_gaze: %s", e)
+            for i in owners:
+                gaze_results[i] = {"status": "error", "message": str(e)}
+    return gaze_results
 
-        # Get gaze predictions
-        with torch.no_grad():
-            left_input = preprocess_eye(left_eye).unsqueeze(0).to(device)
-            right_input = preprocess_eye(right_eye).unsqueeze(0).to(device)
-            left_gaze = gaze_model(left_input)[0].cpu().numpy()
-            right_gaze = gaze_model(right_input)[0].cpu().numpy()
-        print("Gaze detection: Gaze predictions obtained.")
 
+def finish_gaze(raw_result: Dict, history: deque, kalman: GazeKalmanFilter) -> Dict:
+    """Apply temporal smoothing and Kalman filtering to a raw gaze result and classify it"""
+    if raw_result["status"] != "success":
+        return raw_result
+    try:
         # Temporal smoothing
-        current_gaze = (left_gaze + right_gaze) / 2
-        gaze_history.append(current_gaze)
-        smoothed_gaze = np.mean(gaze_history, axis=0)
+        history.append(raw_result["raw_gaze"])
+        smoothed_gaze = np.mean(history, axis=0)
 
         # Kalman filtering
-        filtered_gaze = kf.update(smoothed_gaze)
+        filtered_gaze = kalman.update(smoothed_gaze)
 
         # Classify gaze direction
         direction, yaw, pitch = classify_gaze(filtered_gaze)
-        print(
-            f"Gaze detection successful: direction={direction}, yaw={yaw}, pitch={pitch}"
+        logger.debug(
+            "Gaze detection successful: direction=%s, yaw=%s, pitch=%s",
+            direction,
+            yaw,
+            pitch,
         )
 
         return {
@@ -883,366 +2198,1214 @@ def detect_gaze(image: Image.Image) -> Dict:
             "gaze_vector": filtered_gaze.tolist(),
         }
     except Exception as e:
-        print(f"Error in detect_gaze: {str(e)}")
+        logger.error("Error in detect_gaze: %s", e)
         return {"status": "error", "message": str(e)}
 
 
-# Global dictionaries to track sequences of non-frontal pose and suspicious gaze detections
-non_frontal_pose_sequences: Dict[str, deque] = {}
-suspicious_gaze_sequences: Dict[str, deque] = {}
-
+def detect_gaze(image: Frame, state: "SessionState" = None) -> Dict:
+    """Run gaze tracking on the image"""
+    state = state or SessionState()
+    return finish_gaze(detect_gaze_batch([image])[0], state.gaze_history, state.kalman)
+
+
+# Per-session temporal state (smoothers and consecutive-occurrence rules)
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "10000"))
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+# "inprocess" keeps sessions in this worker; "redis" shares them between workers and hosts
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "inprocess").lower()
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+SESSION_REDIS_PREFIX = os.getenv("SESSION_REDIS_PREFIX", "eduguard:session:")
+SESSION_REDIS_TIMEOUT = float(os.getenv("SESSION_REDIS_TIMEOUT", "0.5"))
+# Threads for blocking Redis session calls, so they stay off the event loop
+SESSION_REDIS_WORKERS = int(os.getenv("SESSION_REDIS_WORKERS", "8"))
+# Session affinity: comma-separated base URLs of every worker, and this worker's own
+SESSION_WORKERS = [
+    url.strip() for url in os.getenv("SESSION_WORKERS", "").split(",") if url.strip()
+]
+WORKER_URL = os.getenv("WORKER_URL", "")
+
+
+def json_default(value):
+    """json.dumps fallback for numpy arrays and scalars"""
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def deep_sizeof(value) -> int:
+    """Approximate memory held by a value and the containers nested in it"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_sizeof(k) + deep_sizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, deque)):
+        size += sum(deep_sizeof(item) for item in value)
+    return size
+
+
+class SessionState:
+    """Smoothing filters and rule sequences for one student_id_quiz_id session"""
+
+    __slots__ = (
+        "ema",
+        "gaze_history",
+        "kalman",
+        "non_frontal_poses",
+        "suspicious_gazes",
+        "alert_history",
+        "score",
+        "last_hash",
+        "last_analysis",
+        "last_analysis_at",
+        "last_seen",
+    )
 
-async def process_image(
-    image: Image.Image, student_id: str = None, quiz_id: str = None
-) -> Dict:
-    """Process image with all models"""
-    try:
-        # Define async wrappers for non-async detection functions
-        async def run_face_detection(img):
-            return detect_faces(img)
-
-        async def run_object_detection(img):
-            return detect_objects(img)
-
-        async def run_gaze_detection(img):
-            result = detect_gaze(img)
-            print(f"Gaze detection result: {result}")
-            return result
-
-        # Run all detections in parallel
-        face_task = run_face_detection(image)
-        head_pose_tasks = []
-        object_task = run_object_detection(image)
-        gaze_task = run_gaze_detection(image)
-
-        # Await all tasks
-        faces, suspicious_objects, gaze_result = await asyncio.gather(
-            face_task, object_task, gaze_task
+    def __init__(self):
+        self.ema = EMA(alpha=0.3)
+        self.gaze_history = deque(maxlen=5)
+        self.kalman = GazeKalmanFilter()
+        self.non_frontal_poses = deque(maxlen=3)
+        self.suspicious_gazes = deque(maxlen=3)
+        # Whether each recent frame raised alerts, for the capture interval
+        self.alert_history = deque(maxlen=6)
+        # Last cheating score Laravel returned plus increments queued since;
+        # None until a report for this session has been delivered
+        self.score = None
+        # Detections of the last analysed frame, reused for near-duplicates
+        self.last_hash = None
+        self.last_analysis = None
+        self.last_analysis_at = 0.0
+        self.last_seen = time.monotonic()
+
+    def nbytes(self) -> int:
+        """Approximate memory held by this session"""
+        return (
+            sys.getsizeof(self)
+            + sys.getsizeof(self.ema)
+            + sys.getsizeof(self.gaze_history)
+            + sum(sys.getsizeof(gaze) for gaze in self.gaze_history)
+            + sys.getsizeof(self.kalman)
+            + self.kalman.nbytes()
+            + sys.getsizeof(self.non_frontal_poses)
+            + sys.getsizeof(self.suspicious_gazes)
+            + sys.getsizeof(self.alert_history)
+            + sys.getsizeof(self.score)
+            + sys.getsizeof(self.last_hash)
+            + deep_sizeof(self.last_analysis)
         )
 
-        # Process head pose for each detected face
-        for face in faces:
-            x1, y1, x2, y2 = face["bounding_box"]
-            face_region = image.crop((x1, y1, x2, y2))
-            head_pose_tasks.append(detect_head_pose(face_region))
-
-        head_poses = await asyncio.gather(*head_pose_tasks)
-
-        # Compute cheating score
-        score_increment = 0
-        alerts = []
-
-        # Generate session key if student_id and quiz_id are provided
-        session_key = f"{student_id}_{quiz_id}" if student_id and quiz_id else None
-
-        # Check for multiple faces
-        if len(faces) > 1:
-            score_increment += CHEATING_WEIGHTS["multiple_faces"]
-            alerts.append("Multiple faces detected")
-        elif len(faces) == 0:
-            alerts.append("No faces detected")
-            score_increment += CHEATING_WEIGHTS["no_faces_detected"]
-
-        # Initialize sequences if not present
-        if session_key and session_key not in non_frontal_pose_sequences:
-            non_frontal_pose_sequences[session_key] = deque(maxlen=3)
-        if session_key and session_key not in suspicious_gaze_sequences:
-            suspicious_gaze_sequences[session_key] = deque(maxlen=3)
-
-        # Check for non-frontal pose
-        non_frontal_poses = [pose for pose in head_poses if pose["pose"] != "frontal"]
-        if non_frontal_poses and session_key:
-            alerts.append("Non-frontal pose detected")
-            # Add True to the sequence for non-frontal pose
-            non_frontal_pose_sequences[session_key].append(True)
-            if len(non_frontal_pose_sequences[session_key]) == 3 and all(
-                non_frontal_pose_sequences[session_key]
-            ):
-                score_increment += CHEATING_WEIGHTS["non_frontal_pose"]
-                alerts.append("Non-frontal pose detected (3rd consecutive occurrence)")
-                # Clear the sequence after incrementing the score
-                non_frontal_pose_sequences[session_key].clear()
-        elif non_frontal_poses:
-            alerts.append("Non-frontal pose detected")
-        elif session_key:
-            # Add False to the sequence for frontal pose
-            non_frontal_pose_sequences[session_key].append(False)
-
-        # Check for suspicious objects
-        if suspicious_objects:
-            score_increment += CHEATING_WEIGHTS["suspicious_object"]
-            for obj in suspicious_objects:
-                alerts.append(f"Suspicious object detected: {obj['class']}")
-
-        # Check for suspicious gaze direction
-        if gaze_result["status"] == "success":
-            gaze_direction = gaze_result["gaze_direction"]
-            print(f"Processing gaze direction: {gaze_direction}")
-            if gaze_direction not in ["Center", "Up", "Down"] and session_key:
-                alerts.append(f"Suspicious gaze direction: {gaze_direction}")
-                # Add True to the sequence for suspicious gaze
-                suspicious_gaze_sequences[session_key].append(True)
-                if len(suspicious_gaze_sequences[session_key]) == 3 and all(
-                    suspicious_gaze_sequences[session_key]
-                ):
-                    score_increment += CHEATING_WEIGHTS["suspicious_gaze"]
-                    alerts.append(
-                        "Suspicious gaze threshold reached (3rd consecutive occurrence)"
-                    )
-                    # Clear the sequence after incrementing the score
-                    suspicious_gaze_sequences[session_key].clear()
-            elif session_key:
-                # Add False to the sequence for non-suspicious gaze
-                suspicious_gaze_sequences[session_key].append(False)
-        elif gaze_result["status"] == "error":
-            print(f"Gaze detection failed: {gaze_result['message']}")
-        else:
-            print(
-                f"Gaze detection status: {gaze_result['status']}, message: {gaze_result['message']}"
-            )
-
+    def to_dict(self) -> Dict:
+        """JSON-safe snapshot; monotonic timestamps become ages so other hosts can restore them"""
         return {
-            "faces": faces,
-            "head_poses": head_poses,
-            "suspicious_objects": suspicious_objects,
-            "gaze_result": gaze_result,
-            "score_increment": score_increment,
-            "alerts": alerts,
-        }
-    except Exception as e:
-        print(f"Error in process_image: {str(e)}")
-        return {
-            "faces": [],
-            "head_poses": [],
-            "suspicious_objects": [],
-            "gaze_result": {"status": "error", "message": str(e)},
-            "alerts": [],
-            "score_increment": 0,
+            "ema": [self.ema.ema_yaw, self.ema.ema_pitch, self.ema.ema_roll],
+            "gaze_history": [np.asarray(gaze).tolist() for gaze in self.gaze_history],
+            "kalman": self.kalman.to_dict(),
+            "non_frontal_poses": list(self.non_frontal_poses),
+            "suspicious_gazes": list(self.suspicious_gazes),
+            "alert_history": list(self.alert_history),
+            "score": self.score,
+            "last_hash": self.last_hash,
+            "last_analysis": self.last_analysis,
+            "last_analysis_age": time.monotonic() - self.last_analysis_at,
+            "saved_at": time.time(),
         }
 
+    @classmethod
+    def from_dict(cls, data: Dict) -> "SessionState":
+        state = cls()
+        state.ema.ema_yaw, state.ema.ema_pitch, state.ema.ema_roll = data["ema"]
+        # The Kalman filter needs float32 measurements, like the model output
+        state.gaze_history.extend(
+            np.asarray(gaze, dtype=np.float32) for gaze in data["gaze_history"]
+        )
+        state.kalman.load(data["kalman"])
+        state.non_frontal_poses.extend(data["non_frontal_poses"])
+        state.suspicious_gazes.extend(data["suspicious_gazes"])
+        state.alert_history.extend(data["alert_history"])
+        state.score = data["score"]
+        state.last_hash = data["last_hash"]
+        analysis = data["last_analysis"]
+        if analysis is not None:
+            raw_gaze = analysis.get("raw_gaze") or {}
+            if "raw_gaze" in raw_gaze:
+                raw_gaze["raw_gaze"] = np.asarray(
+                    raw_gaze["raw_gaze"], dtype=np.float32
+                )
+            state.last_analysis = analysis
+            elapsed = max(0.0, time.time() - data["saved_at"])
+            state.last_analysis_at = (
+                time.monotonic() - data["last_analysis_age"] - elapsed
+            )
+        return state
 
-class RegisterRequest(BaseModel):
-    user_id: int
-    images: List[str]
 
+class SessionBackend(ABC):
+    """Where per-session temporal state lives between frames
 
-face_db = FaceDB()
-fr = FaceRecognition()
-yolo = YOLO(FACE_MODEL_PATH).to("cuda" if torch.cuda.is_available() else "cpu")
-recognizer = RealTimeRecognizer()
+    Callers mutate the state returned by get() or peek() and then call save(),
+    which is a no-op for backends that hand out live objects. Async code goes
+    through run_async(), so backends that block on the network do it off the
+    event loop.
+    """
 
-# New global variables for gaze tracking
-CHECKPOINT_DIR = os.getenv("GAZE_ESTIMATION_MODEL_PATH", "checkpoints")
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-gaze_model = None
-mp_face = None
-mp_face_mesh = None
-gaze_history = deque(maxlen=5)
-kf = GazeKalmanFilter()
+    name = "base"
 
-from contextlib import asynccontextmanager
+    @abstractmethod
+    def get(self, session_key: str) -> SessionState:
+        """Return the state for a session, creating it if missing or expired"""
 
+    @abstractmethod
+    def peek(self, session_key: str):
+        """Return the state for a session, or None, without creating it"""
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    global gaze_model, mp_face, mp_face_mesh, yolo_face, object_detector
-    try:
-        print("Loading YOLO face model...")
-        yolo_face = YOLO(FACE_MODEL_PATH).to(
-            "cuda" if torch.cuda.is_available() else "cpu"
-        )
-        print("YOLO face model loaded.")
+    def save(self, session_key: str, state: SessionState):
+        """Persist changes made to a state returned by get() or peek()"""
 
-        print("Loading YOLO object detection model...")
-        object_detector = YOLO(os.getenv("OBJECT_DETECTION_MODEL_PATH")).to(
-            "cuda" if torch.cuda.is_available() else "cpu"
-        )
-        print("YOLO object detection model loaded.")
-
-        print("Loading gaze model...")
-        gaze_model = GazeResNet18()
-        checkpoint_path = os.path.join(CHECKPOINT_DIR, "best_gaze_model.pth")
-        checkpoint = torch.load(checkpoint_path, map_location="cpu")
-        if "model_state_dict" in checkpoint:
-            state_dict = checkpoint["model_state_dict"]
-        else:
-            state_dict = checkpoint
-        state_dict = {k.replace("module.", ""): v for k, v in state_dict.items()}
-        gaze_model.load_state_dict(state_dict)
-        gaze_model.eval()
-        gaze_model.to(device)
-        print("Gaze model loaded.")
-
-        print("Loading MediaPipe face detection...")
-        mp_face = mp.solutions.face_detection.FaceDetection(
-            min_detection_confidence=0.5
+    @abstractmethod
+    def discard(self, session_key: str):
+        """Forget a session's state"""
+
+    def evict_idle(self) -> int:
+        return 0
+
+    async def run_async(self, fn, *args):
+        """Await fn(*args), which may use this backend; in-memory backends run it inline"""
+        return fn(*args)
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of live sessions, approximate for shared backends"""
+
+    @abstractmethod
+    def stats(self) -> Dict:
+        pass
+
+
+class InProcessSessionBackend(SessionBackend):
+    """LRU map of session states with idle-TTL and max-sessions eviction"""
+
+    name = "inprocess"
+
+    def __init__(
+        self, max_sessions: int = SESSION_MAX, idle_ttl: float = SESSION_IDLE_TTL
+    ):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted_idle = 0
+        self.evicted_lru = 0
+
+    def get(self, session_key: str) -> SessionState:
+        """Return the live state for a session, creating it if missing or expired"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._sessions.pop(session_key, None)
+            if state is None or now - state.last_seen > self.idle_ttl:
+                state = SessionState()
+            self._sessions[session_key] = state
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted_lru += 1
+            state.last_seen = now
+            return state
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def peek(self, session_key: str):
+        """Return the state for a session without creating or touching it"""
+        with self._lock:
+            return self._sessions.get(session_key)
+
+    def discard(self, session_key: str):
+        with self._lock:
+            self._sessions.pop(session_key, None)
+
+    def evict_idle(self) -> int:
+        """Drop sessions idle for longer than the TTL (oldest entries sit at the front)"""
+        cutoff = time.monotonic() - self.idle_ttl
+        evicted = 0
+        with self._lock:
+            while self._sessions:
+                session_key, state = next(iter(self._sessions.items()))
+                if state.last_seen > cutoff:
+                    break
+                del self._sessions[session_key]
+                evicted += 1
+            self.evicted_idle += evicted
+        return evicted
+
+    def stats(self) -> Dict:
+        with self._lock:
+            nbytes = sum(state.nbytes() for state in self._sessions.values())
+            return {
+                "backend": self.name,
+                "sessions": len(self._sessions),
+                "bytes": nbytes,
+                "max_sessions": self.max_sessions,
+                "idle_ttl_seconds": self.idle_ttl,
+                "evicted_idle": self.evicted_idle,
+                "evicted_lru": self.evicted_lru,
+            }
+
+
+class RedisSessionBackend(SessionBackend):
+    """Session states serialized to Redis with the idle TTL as key expiry
+
+    Every worker reads and writes the same keys, so the consecutive-occurrence
+    rules survive a session moving between workers. Pass a client (for example
+    fakeredis.FakeRedis()) to run without a server.
+
+    Updates are get, mutate, save without WATCH, so two workers scoring frames
+    of the same session at the same moment would lose one update. Session
+    affinity (one worker per session at a time) is required for exact rule
+    counts; the backend only makes a session survive moving between workers.
+    """
+
+    name = "redis"
+
+    def __init__(
+        self,
+        client=None,
+        url: str = SESSION_REDIS_URL,
+        prefix: str = SESSION_REDIS_PREFIX,
+        idle_ttl: float = SESSION_IDLE_TTL,
+    ):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("SESSION_BACKEND=redis requires the redis package")
+            client = redis.Redis.from_url(
+                url,
+                socket_timeout=SESSION_REDIS_TIMEOUT,
+                socket_connect_timeout=SESSION_REDIS_TIMEOUT,
+            )
+        self.client = client
+        self.prefix = prefix
+        # Sorted set of session keys by last save time, for a scan-free session count
+        self.active_key = prefix + "active"
+        self.idle_ttl = idle_ttl
+        self.active_sessions = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=SESSION_REDIS_WORKERS, thread_name_prefix="session"
         )
-        print("MediaPipe face detection loaded.")
-
-        print("Loading MediaPipe face mesh...")
-        mp_face_mesh = mp.solutions.face_mesh.FaceMesh(
-            static_image_mode=False,
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_tracking_confidence=0.3,
+        self.loads = 0
+        self.saves = 0
+        self.errors = 0
+        self.latency = Histogram(
+            "session_backend_seconds",
+            "Latency of session state loads and saves",
+            [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5],
         )
-        print("MediaPipe face mesh loaded.")
-    except Exception as e:
-        print(f"Failed to load models: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to load models: {str(e)}")
-    yield
-    print("Shutting down application...")
 
+    def _key(self, session_key: str) -> str:
+        return self.prefix + session_key
 
-app = FastAPI(title="Face Recognition API", lifespan=lifespan)
+    def _load(self, session_key: str):
+        started = time.perf_counter()
+        try:
+            data = self.client.get(self._key(session_key))
+            self.loads += 1
+        except Exception as e:
+            # Scoring carries on without history rather than failing the frame
+            self.errors += 1
+            logger.error("Error loading session %s: %s", session_key, e)
+            return None
+        finally:
+            self.latency.observe(time.perf_counter() - started)
+        return None if data is None else SessionState.from_dict(json.loads(data))
 
-# Store WebSocket connections by student_id and quiz_id
-connections: Dict[str, WebSocket] = {}
+    def get(self, session_key: str) -> SessionState:
+        state = self._load(session_key) or SessionState()
+        state.last_seen = time.monotonic()
+        return state
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    def peek(self, session_key: str):
+        return self._load(session_key)
 
+    def save(self, session_key: str, state: SessionState):
+        data = json.dumps(state.to_dict(), default=json_default)
+        now = time.time()
+        started = time.perf_counter()
+        try:
+            # One round trip: store the state and refresh the active-session count
+            pipe = self.client.pipeline(transaction=False)
+            pipe.set(self._key(session_key), data, ex=max(1, int(self.idle_ttl)))
+            pipe.zadd(self.active_key, {session_key: now})
+            pipe.zremrangebyscore(self.active_key, "-inf", now - self.idle_ttl)
+            pipe.zcard(self.active_key)
+            self.active_sessions = pipe.execute()[-1]
+            self.saves += 1
+        except Exception as e:
+            self.errors += 1
+            logger.error("Error saving session %s: %s", session_key, e)
+        finally:
+            self.latency.observe(time.perf_counter() - started)
 
-@app.post("/register")
-async def register_student(data: RegisterRequest):
-    user_id = data.user_id
-    images = data.images
-    print("Received:", {"user_id": user_id, "images": images[:3]})
-    try:
-        # First verify the user exists before processing
-        conn = mysql.connector.connect(
-            host=DB_HOST,
-            database=DB_DATABASE,
-            user=DB_USERNAME,
-            password=DB_PASSWORD,
-            port=int(DB_PORT),
+    def discard(self, session_key: str):
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.delete(self._key(session_key))
+            pipe.zrem(self.active_key, session_key)
+            pipe.execute()
+        except Exception as e:
+            self.errors += 1
+            logger.error("Error discarding session %s: %s", session_key, e)
+
+    async def run_async(self, fn, *args):
+        """Await fn(*args) on the session threads, since the Redis client blocks"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, partial(fn, *args)
         )
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM users WHERE id = %s", (user_id,))
-        user_result = cursor.fetchone()
-        cursor.close()
-        conn.close()
 
-        if not user_result:
-            return JSONResponse(
-                {
-                    "status": "error",
-                    "message": f"User with ID {user_id} does not exist in the database",
-                },
-                status_code=404,
-            )
+    def __len__(self) -> int:
+        # Count seen by this worker's last save, so /metrics never touches Redis
+        return self.active_sessions
 
-        if len(images) < 3:
-            raise HTTPException(400, "At least 3 images required")
+    def stats(self) -> Dict:
+        return {
+            "backend": self.name,
+            "idle_ttl_seconds": self.idle_ttl,
+            "active_sessions": self.active_sessions,
+            "loads": self.loads,
+            "saves": self.saves,
+            "errors": self.errors,
+            "latency_seconds": self.latency.snapshot(),
+        }
 
-        embeddings = []
-        processor = BatchProcessor()
 
-        for img_b64 in images:
-            try:
-                if "," in img_b64:
-                    img_b64 = img_b64.split(",")[1]
+def create_session_backend(name: str = SESSION_BACKEND) -> SessionBackend:
+    if name == "inprocess":
+        return InProcessSessionBackend()
+    if name == "redis":
+        return RedisSessionBackend()
+    raise ValueError(f"Unknown SESSION_BACKEND: {name}")
 
-                img_data = base64.b64decode(img_b64)
-                nparr = np.frombuffer(img_data, np.uint8)
-                img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
 
-                if img is None:
-                    continue
+session_store = create_session_backend()
 
-                aligned = processor.fr.process_image(img)
-                if aligned is None:
-                    continue
 
-                embedding = processor.fr.generate_embeddings(aligned)
-                embeddings.append(embedding)
+def session_worker(session_key: str, workers: List[str] = None):
+    """The worker that owns a session, by rendezvous (highest random weight) hashing
 
-            except Exception as e:
-                print(f"Error processing image: {str(e)}")
-                continue
+    Adding or removing a worker only moves the sessions that hashed to it.
+    """
+    workers = SESSION_WORKERS if workers is None else workers
+    if not workers:
+        return None
+    return max(
+        workers,
+        key=lambda worker: hashlib.sha1(f"{worker}|{session_key}".encode()).digest(),
+    )
 
-        if embeddings:
-            processor.db.store_embeddings(user_id, embeddings)
-            recognizer._refresh_embeddings()
 
-            return JSONResponse(
-                {
-                    "status": "success",
-                    "message": f"Registered {len(embeddings)} embeddings for user {user_id}",
-                }
-            )
-        else:
-            raise HTTPException(400, "No valid faces detected")
+async def sweep_sessions():
+    """Periodically evict idle sessions so /process_periodic-only sessions do not pile up"""
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+        evicted = session_store.evict_idle()
+        if evicted:
+            logger.info("Evicted %s idle sessions", evicted)
 
-    except Exception as e:
-        raise HTTPException(500, detail=str(e))
 
+# Thread pool that keeps model inference off the asyncio event loop
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "4"))
+INFERENCE_MAX_PENDING = int(os.getenv("INFERENCE_MAX_PENDING", "32"))
+INFERENCE_RETRY_AFTER = int(os.getenv("INFERENCE_RETRY_AFTER", "2"))
+# Intra-op threads per model call (0 keeps torch's default). Workers run models
+# concurrently, so fast_cpu defaults to splitting the cores between them
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "0"))
 
-@app.post("/recognize")
-async def recognize_face(request_data: dict):
-    try:
-        captured_image = request_data.get("captured_image")
-        user_id = request_data.get("user_id")
-        if not captured_image:
-            raise HTTPException(400, "Invalid image")
+if INFERENCE_THREADS or INFERENCE_PROFILE == "fast_cpu":
+    torch.set_num_threads(
+        INFERENCE_THREADS or max(1, (os.cpu_count() or 1) // INFERENCE_WORKERS)
+    )
 
-        # Extract base64 data (remove "data:image/jpeg;base64," prefix if present)
-        if "," in captured_image:
-            captured_image = captured_image.split(",")[1]
 
-        img_data = base64.b64decode(captured_image)
-        nparr = np.frombuffer(img_data, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+class InferenceSaturated(Exception):
+    """Raised when the inference executor cannot accept more work"""
 
-        if img is None:
-            raise HTTPException(400, "Invalid image")
 
-        processed_img, matches = recognizer.process_image(img, user_id=user_id)
+class InferenceExecutor:
+    """Bounded thread pool for blocking model calls (torch and cv2 release the GIL)"""
 
-        print(f"Recognition results for user_id {user_id}: {matches}")
+    def __init__(
+        self, workers: int = INFERENCE_WORKERS, max_pending: int = INFERENCE_MAX_PENDING
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="inference"
+        )
+        self.pending = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
 
-        # Ensure matches always contains at least detection info, even if no recognition
-        yolo_results = yolo(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
-        if (
-            not matches and yolo_results[0].boxes is not None
-        ):  # If YOLO detected faces but no recognition
-            for box in yolo_results[0].boxes.xyxy.cpu().numpy():
-                x1, y1, x2, y2 = map(int, box)
-                matches.append(
-                    {
-                        "user_id": 0,
-                        "name": "unknown",
-                        "confidence": 0.5,  # Default confidence for detected but unrecognized faces
-                        "box": [int(x1), int(y1), int(x2), int(y2)],
-                    }
+    @contextmanager
+    def admission(self):
+        """Hold one of max_pending request slots for the block, or reject up front
+
+        The slot is reserved under the same lock as the check, so concurrent
+        requests cannot all slip past the limit.
+        """
+        with self._lock:
+            if self.admitted >= self.max_pending:
+                self.rejected += 1
+                raise InferenceSaturated(
+                    f"{self.admitted} inference requests admitted (limit {self.max_pending})"
                 )
+            self.admitted += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.admitted -= 1
+
+    def _release(self, _future):
+        with self._lock:
+            self.pending -= 1
+
+    async def run(self, fn, *args):
+        """Run a blocking call on the pool and await its result"""
+        with self._lock:
+            self.pending += 1
+        future = self.pool.submit(fn, *args)
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
 
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict:
         return {
-            "status": "success",
-            "matches": matches,
-            "detected_faces": len(matches) > 0,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "admitted": self.admitted,
+            "pending": self.pending,
+            "rejected": self.rejected,
         }
 
-    except Exception as e:
-        raise HTTPException(500, detail=str(e))
 
+inference_executor = InferenceExecutor()
 
-@app.get("/students")
-async def list_students():
-    try:
-        names = face_db.get_student_names()
-        return JSONResponse({"status": "success", "students": names})
-    except Exception as e:
-        raise HTTPException(500, detail=str(e))
 
+def saturated_response(error: InferenceSaturated) -> JSONResponse:
+    """503 returned while the inference executor is saturated"""
+    logger.warning("Inference saturated: %s", error)
+    return JSONResponse(
+        content={"error": "Inference capacity exhausted, retry later"},
+        status_code=503,
+        headers={"Retry-After": str(INFERENCE_RETRY_AFTER)},
+    )
 
-class Answer(BaseModel):
-    question_id: int
-    answer: str
+
+# Near-duplicate skipping: frames within DEDUP_MAX_DISTANCE bits of the session's
+# last analysed frame reuse its detections, for at most DEDUP_MAX_AGE seconds
+DEDUP_MAX_DISTANCE = int(os.getenv("DEDUP_MAX_DISTANCE", "4"))
+DEDUP_MAX_AGE = float(os.getenv("DEDUP_MAX_AGE", "60"))
+
+
+class CascadeMetrics:
+    """Counts of how often each analysis stage ran, was skipped or was reused"""
+
+    STAGES = ("faces", "objects", "head_pose", "gaze")
+
+    def __init__(self):
+        self.counts = {
+            stage: {"ran": 0, "skipped": 0, "reused": 0} for stage in self.STAGES
+        }
+
+    def record(self, analysis: Dict):
+        for stage, outcome in analysis["stages"].items():
+            self.counts[stage]["reused" if analysis.get("reused") else outcome] += 1
+
+    def stats(self) -> Dict:
+        return {stage: dict(counts) for stage, counts in self.counts.items()}
+
+
+cascade_metrics = CascadeMetrics()
+
+
+def reusable_analysis(state: "SessionState", frame_hash: int):
+    """The session's previous analysis if this frame is a recent near-duplicate of it"""
+    if state is None or state.last_analysis is None or state.last_hash is None:
+        return None
+    if time.monotonic() - state.last_analysis_at > DEDUP_MAX_AGE:
+        return None
+    if bin(frame_hash ^ state.last_hash).count("1") > DEDUP_MAX_DISTANCE:
+        return None
+    return state.last_analysis
+
+
+def remember_analysis(session_key: str, frame_hash: int, analysis: Dict):
+    """Keep a frame's detections on its session for near-duplicate reuse"""
+    state = session_store.get(session_key)
+    state.last_hash = frame_hash
+    state.last_analysis = analysis
+    state.last_analysis_at = time.monotonic()
+    session_store.save(session_key, state)
+
+
+@timed_stage("analyze_frames")
+async def analyze_frames(
+    images: List[Frame], session_keys: List[str] = None
+) -> List[Dict]:
+    """Run the model cascade over a batch of frames and return per-frame raw detections
+
+    Near-duplicates of a session's previous frame reuse its detections. Faces and
+    objects run first; head pose and gaze only run for frames with exactly one
+    face, since zero or several faces already decide the score.
+    """
+    session_keys = session_keys or [None] * len(images)
+    analyses = [None] * len(images)
+    hashes = [None] * len(images)
+    pending = []
+    for i, (image, session_key) in enumerate(zip(images, session_keys)):
+        if session_key:
+            hashes[i] = image.dhash()
+            state = await session_store.run_async(session_store.peek, session_key)
+            reused = reusable_analysis(state, hashes[i])
+            if reused is not None:
+                # Keep the original stage outcomes; scoring still depends on them
+                analyses[i] = {**reused, "reused": True}
+                continue
+        pending.append(i)
+
+    if pending:
+        frames = [images[i] for i in pending]
+        # Faces and objects are independent, so they run concurrently on the pool
+        all_faces, all_objects = await asyncio.gather(
+            inference_executor.run(detect_faces_batch, frames),
+            inference_executor.run(detect_objects_batch, frames),
+        )
+
+        single_face = [n for n, faces in enumerate(all_faces) if len(faces) == 1]
+        face_crops = [
+            frames[n].crop(tuple(all_faces[n][0]["bounding_box"])) for n in single_face
+        ]
+        raw_poses, gaze_results = await asyncio.gather(
+            inference_executor.run(estimate_head_poses, face_crops),
+            inference_executor.run(detect_gaze_batch, [frames[n] for n in single_face]),
+        )
+        # A crop that failed only costs its own frame its head pose
+        poses_by_frame = {
+            n: pose for n, pose in zip(single_face, raw_poses) if pose is not None
+        }
+        gaze_by_frame = dict(zip(single_face, gaze_results))
+
+        for n, i in enumerate(pending):
+            posed = n in poses_by_frame
+            ran = n in gaze_by_frame
+            analyses[i] = {
+                "faces": all_faces[n],
+                "raw_head_poses": [poses_by_frame[n]] if posed else [],
+                "suspicious_objects": all_objects[n],
+                "raw_gaze": (
+                    gaze_by_frame[n]
+                    if ran
+                    else {
+                        "status": "skipped",
+                        "message": f"Gaze skipped for {len(all_faces[n])} faces",
+                    }
+                ),
+                "stages": {
+                    "faces": "ran",
+                    "objects": "ran",
+                    "head_pose": "ran" if posed else "skipped",
+                    "gaze": "ran" if ran else "skipped",
+                },
+            }
+            if session_keys[i]:
+                await session_store.run_async(
+                    remember_analysis, session_keys[i], hashes[i], analyses[i]
+                )
+            frame_metrics.record(images[i])
+
+    for analysis in analyses:
+        cascade_metrics.record(analysis)
+    return analyses
+
+
+# Risk-adaptive capture interval returned to clients as next_capture_ms
+CAPTURE_MIN_MS = int(os.getenv("CAPTURE_MIN_MS", "3000"))
+CAPTURE_BASE_MS = int(os.getenv("CAPTURE_BASE_MS", "10000"))
+CAPTURE_MAX_MS = int(os.getenv("CAPTURE_MAX_MS", "20000"))
+# Consecutive alert-free frames before a session is sampled at CAPTURE_MAX_MS
+CAPTURE_CALM_FRAMES = int(os.getenv("CAPTURE_CALM_FRAMES", "3"))
+# How strongly server load stretches the interval (0 disables)
+CAPTURE_LOAD_FACTOR = float(os.getenv("CAPTURE_LOAD_FACTOR", "1.0"))
+
+
+def inference_load() -> float:
+    """Fraction of the inference admission limit currently in use"""
+    return min(1.0, inference_executor.admitted / inference_executor.max_pending)
+
+
+def next_capture_interval(state: "SessionState", score_increment: int) -> int:
+    """Milliseconds until the session's next frame, from its recent risk and the server load"""
+    if score_increment > 0:
+        risk = 1.0
+    else:
+        # Share of recent frames with alerts or pending pose/gaze sequences
+        risk = max(
+            (
+                sum(history) / len(history)
+                for history in (
+                    state.alert_history,
+                    state.non_frontal_poses,
+                    state.suspicious_gazes,
+                )
+                if history
+            ),
+            default=0.0,
+        )
+
+    if risk > 0:
+        interval = CAPTURE_BASE_MS - risk * (CAPTURE_BASE_MS - CAPTURE_MIN_MS)
+    elif len(state.alert_history) >= CAPTURE_CALM_FRAMES and not any(
+        list(state.alert_history)[-CAPTURE_CALM_FRAMES:]
+    ):
+        interval = CAPTURE_MAX_MS
+    else:
+        interval = CAPTURE_BASE_MS
+
+    # Back off everyone a little when inference is busy, and spread clients out
+    interval *= 1.0 + CAPTURE_LOAD_FACTOR * inference_load()
+    interval *= random.uniform(0.9, 1.1)
+    return int(min(max(interval, CAPTURE_MIN_MS), CAPTURE_MAX_MS))
+
+
+@timed_stage("score")
+def score_frame(analysis: Dict, student_id: str = None, quiz_id: str = None) -> Dict:
+    """Apply temporal smoothing and the cheating rules to one frame's detections"""
+    faces = analysis["faces"]
+    suspicious_objects = analysis["suspicious_objects"]
+
+    # Generate session key if student_id and quiz_id are provided
+    session_key = f"{student_id}_{quiz_id}" if student_id and quiz_id else None
+    state = session_store.get(session_key) if session_key else SessionState()
+
+    # Apply EMA smoothing to each face's head pose
+    head_poses = [
+        smooth_head_pose(raw["pitch"], raw["yaw"], raw["roll"], state.ema)
+        for raw in analysis["raw_head_poses"]
+    ]
+    gaze_result = finish_gaze(analysis["raw_gaze"], state.gaze_history, state.kalman)
+    logger.debug("Gaze detection result: %s", gaze_result)
+
+    # Compute cheating score
+    score_increment = 0
+    alerts = []
+
+    # Check for multiple faces
+    if len(faces) > 1:
+        score_increment += CHEATING_WEIGHTS["multiple_faces"]
+        alerts.append("Multiple faces detected")
+    elif len(faces) == 0:
+        alerts.append("No faces detected")
+        score_increment += CHEATING_WEIGHTS["no_faces_detected"]
+
+    # Check for non-frontal pose
+    non_frontal_poses = [pose for pose in head_poses if pose["pose"] != "frontal"]
+    if non_frontal_poses and session_key:
+        alerts.append("Non-frontal pose detected")
+        # Add True to the sequence for non-frontal pose
+        state.non_frontal_poses.append(True)
+        if len(state.non_frontal_poses) == 3 and all(state.non_frontal_poses):
+            score_increment += CHEATING_WEIGHTS["non_frontal_pose"]
+            alerts.append("Non-frontal pose detected (3rd consecutive occurrence)")
+            # Clear the sequence after incrementing the score
+            state.non_frontal_poses.clear()
+    elif non_frontal_poses:
+        alerts.append("Non-frontal pose detected")
+    elif session_key and head_poses:
+        # Add False to the sequence for frontal pose
+        state.non_frontal_poses.append(False)
+
+    # Check for suspicious objects
+    if suspicious_objects:
+        score_increment += CHEATING_WEIGHTS["suspicious_object"]
+        for obj in suspicious_objects:
+            alerts.append(f"Suspicious object detected: {obj['class']}")
+
+    # Check for suspicious gaze direction
+    if gaze_result["status"] == "success":
+        gaze_direction = gaze_result["gaze_direction"]
+        logger.debug("Processing gaze direction: %s", gaze_direction)
+        if gaze_direction not in ["Center", "Up", "Down"] and session_key:
+            alerts.append(f"Suspicious gaze direction: {gaze_direction}")
+            # Add True to the sequence for suspicious gaze
+            state.suspicious_gazes.append(True)
+            if len(state.suspicious_gazes) == 3 and all(state.suspicious_gazes):
+                score_increment += CHEATING_WEIGHTS["suspicious_gaze"]
+                alerts.append(
+                    "Suspicious gaze threshold reached (3rd consecutive occurrence)"
+                )
+                # Clear the sequence after incrementing the score
+                state.suspicious_gazes.clear()
+        elif session_key:
+            # Add False to the sequence for non-suspicious gaze
+            state.suspicious_gazes.append(False)
+    elif gaze_result["status"] == "error":
+        logger.debug("Gaze detection failed: %s", gaze_result["message"])
+    else:
+        logger.debug(
+            "Gaze detection status: %s, message: %s",
+            gaze_result["status"],
+            gaze_result["message"],
+        )
+
+    if session_key:
+        state.alert_history.append(bool(alerts))
+        session_store.save(session_key, state)
+
+    return {
+        "faces": faces,
+        "head_poses": head_poses,
+        "suspicious_objects": suspicious_objects,
+        "gaze_result": gaze_result,
+        "score_increment": score_increment,
+        "alerts": alerts,
+        "stages": analysis.get("stages", {}),
+        "reused": analysis.get("reused", False),
+        "next_capture_ms": (
+            next_capture_interval(state, score_increment)
+            if session_key
+            else CAPTURE_BASE_MS
+        ),
+    }
+
+
+def failed_result(error: Exception) -> Dict:
+    """Result returned when a frame could not be analysed"""
+    return {
+        "faces": [],
+        "head_poses": [],
+        "suspicious_objects": [],
+        "gaze_result": {"status": "error", "message": str(error)},
+        "alerts": [],
+        "score_increment": 0,
+    }
+
+
+async def process_image(
+    image: Frame, student_id: str = None, quiz_id: str = None
+) -> Dict:
+    """Process image with all models"""
+    with inference_executor.admission():
+        try:
+            session_key = f"{student_id}_{quiz_id}" if student_id and quiz_id else None
+            analysis = (await analyze_frames([image], [session_key]))[0]
+            return await session_store.run_async(
+                score_frame, analysis, student_id, quiz_id
+            )
+        except Exception as e:
+            logger.error("Error in process_image: %s", e)
+            return failed_result(e)
+
+
+# Micro-batching of /process_periodic frames across sessions
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "30"))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "16"))
+
+
+class InferenceBatcher:
+    """Collects frames from all sessions for a short window and analyses them as one batch"""
+
+    def __init__(
+        self, window_ms: float = BATCH_WINDOW_MS, max_size: int = BATCH_MAX_SIZE
+    ):
+        self.window = window_ms / 1000.0
+        self.max_size = max_size
+        self.queue = None
+        self._task = None
+        self._batches = set()
+        self.batch_size = Histogram(
+            "inference_batch_size",
+            "Frames analysed per batch",
+            [1, 2, 4, 8, 16, 32, 64],
+        )
+        self.queue_wait = Histogram(
+            "inference_queue_wait_seconds",
+            "Time a frame waited before its batch started",
+            [0.005, 0.01, 0.02, 0.03, 0.05, 0.075, 0.1, 0.25, 0.5, 1.0],
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 and self.max_size > 1
+
+    def start(self):
+        if not self.enabled:
+            return
+        self.queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+
+    async def submit(
+        self, image: Frame, student_id: str = None, quiz_id: str = None
+    ) -> Dict:
+        """Queue a frame and wait for its scored result"""
+        if self._task is None:
+            return await process_image(image, student_id, quiz_id)
+        # Queued frames hold their slot until scored
+        with inference_executor.admission():
+            future = asyncio.get_running_loop().create_future()
+            await self.queue.put(
+                (image, student_id, quiz_id, time.perf_counter(), future)
+            )
+            return await future
+
+    async def _collect(self) -> list:
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Keep collecting the next batch while this one is on the executor
+            task = asyncio.create_task(self._process(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _process(self, batch: list):
+        started = time.perf_counter()
+        self.batch_size.observe(len(batch))
+        for item in batch:
+            self.queue_wait.observe(started - item[3])
+
+        try:
+            analyses = await analyze_frames(
+                [item[0] for item in batch],
+                [
+                    f"{student_id}_{quiz_id}" if student_id and quiz_id else None
+                    for _, student_id, quiz_id, _, _ in batch
+                ],
+            )
+        except Exception as e:
+            logger.error("Error in batched inference: %s", e)
+            analyses, batch_error = None, e
+
+        for index, (_, student_id, quiz_id, _, future) in enumerate(batch):
+            if future.done():
+                continue
+            if analyses is None:
+                future.set_result(failed_result(batch_error))
+                continue
+            try:
+                result = await session_store.run_async(
+                    score_frame, analyses[index], student_id, quiz_id
+                )
+                if not future.done():
+                    future.set_result(result)
+            except Exception as score_error:
+                logger.error("Error in process_image: %s", score_error)
+                future.set_result(failed_result(score_error))
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "window_ms": self.window * 1000.0,
+            "max_size": self.max_size,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "in_flight": len(self._batches),
+            "batch_size": self.batch_size.snapshot(),
+            "queue_wait_seconds": self.queue_wait.snapshot(),
+        }
+
+
+inference_batcher = InferenceBatcher()
+
+
+class RegisterRequest(BaseModel):
+    user_id: int
+    images: List[str]
+
+
+face_db = FaceDB()
+recognizer = RealTimeRecognizer(face_db)
+
+# New global variables for gaze tracking
+CHECKPOINT_DIR = os.getenv("GAZE_ESTIMATION_MODEL_PATH", "checkpoints")
+mediapipe_lock = threading.Lock()
+
+
+def load_gaze_model():
+    gaze_model = GazeResNet18()
+    checkpoint_path = os.path.join(CHECKPOINT_DIR, "best_gaze_model.pth")
+    checkpoint = torch.load(checkpoint_path, map_location="cpu")
+    if "model_state_dict" in checkpoint:
+        state_dict = checkpoint["model_state_dict"]
+    else:
+        state_dict = checkpoint
+    state_dict = {k.replace("module.", ""): v for k, v in state_dict.items()}
+    gaze_model.load_state_dict(state_dict)
+    gaze_model.eval()
+    gaze_model.to(device)
+    return gaze_model
+
+
+model_registry.register(
+    "gaze",
+    onnx_backed(
+        "gaze",
+        load_gaze_model,
+        (3, 224, 224),
+        ["gaze"],
+        source=os.path.join(CHECKPOINT_DIR, "best_gaze_model.pth"),
+    ),
+)
+model_registry.register(
+    "mediapipe_face",
+    lambda: mp.solutions.face_detection.FaceDetection(min_detection_confidence=0.5),
+)
+model_registry.register(
+    "mediapipe_mesh",
+    lambda: mp.solutions.face_mesh.FaceMesh(
+        static_image_mode=False,
+        max_num_faces=1,
+        refine_landmarks=True,
+        min_tracking_confidence=0.3,
+    ),
+)
+
+from contextlib import asynccontextmanager
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        model_registry.preload()
+        model_registry.print_profile()
+    except Exception as e:
+        logger.error("Failed to load models: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to load models: {str(e)}")
+    laravel_client.start()
+    await alert_bus.start()
+    await face_index_sync.start()
+    report_outbox.start()
+    inference_batcher.start()
+    session_sweeper = asyncio.create_task(sweep_sessions())
+    yield
+    logger.info("Shutting down application...")
+    session_sweeper.cancel()
+    await inference_batcher.stop()
+    await report_outbox.stop()
+    await face_index_sync.stop()
+    await alert_bus.stop()
+    await laravel_client.close()
+    inference_executor.shutdown()
+
+
+app = FastAPI(title="Face Recognition API", lifespan=lifespan)
+
+websocket_send_latency = Histogram(
+    "websocket_send_seconds",
+    "Time to send a message to a client WebSocket",
+    [0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0],
+)
+
+
+async def send_ws_json(websocket: WebSocket, message: Dict):
+    started = time.perf_counter()
+    try:
+        await websocket.send_json(message)
+    finally:
+        websocket_send_latency.observe(time.perf_counter() - started)
+
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+
+@timed_stage("enrollment")
+def embed_registration_images(face_recognition: FaceRecognition, images: List[str]):
+    """Decode and align the base64 images sent to /register, then embed them in batches"""
+    faces = []
+    for img_b64 in images:
+        try:
+            if "," in img_b64:
+                img_b64 = img_b64.split(",")[1]
+
+            img_data = base64.b64decode(img_b64)
+            nparr = np.frombuffer(img_data, np.uint8)
+            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+            if img is None:
+                continue
+
+            aligned = face_recognition.process_image(img)
+            if aligned is None:
+                continue
+
+            faces.append(aligned)
+
+        except Exception as e:
+            logger.error("Error processing image: %s", e)
+            continue
+    return list(face_recognition.generate_embeddings_batch(faces))
+
+
+@app.post("/register")
+async def register_student(data: RegisterRequest):
+    user_id = data.user_id
+    images = data.images
+    logger.info("Register request: user_id=%s, images=%d", user_id, len(images))
+    try:
+        # First verify the user exists before processing
+        user_result = await face_db.run_async(face_db.get_user, user_id)
+
+        if not user_result:
+            return JSONResponse(
+                {
+                    "status": "error",
+                    "message": f"User with ID {user_id} does not exist in the database",
+                },
+                status_code=404,
+            )
+
+        if len(images) < 3:
+            raise HTTPException(400, "At least 3 images required")
+
+        processor = BatchProcessor(face_db)
+        with inference_executor.admission():
+            embeddings = await inference_executor.run(
+                embed_registration_images, processor.fr, images
+            )
+
+        if embeddings:
+            await face_db.run_async(face_db.store_embeddings, user_id, embeddings)
+            face_index.add(user_id, user_result[1], np.array(embeddings))
+            await face_index_sync.publish(user_id)
+
+            return JSONResponse(
+                {
+                    "status": "success",
+                    "message": f"Registered {len(embeddings)} embeddings for user {user_id}",
+                }
+            )
+        else:
+            raise HTTPException(400, "No valid faces detected")
+
+    except InferenceSaturated as e:
+        return saturated_response(e)
+    except Exception as e:
+        raise HTTPException(500, detail=str(e))
+
+
+@app.post("/recognize")
+async def recognize_face(request_data: dict):
+    try:
+        captured_image = request_data.get("captured_image")
+        user_id = request_data.get("user_id")
+        if not captured_image:
+            raise HTTPException(400, "Invalid image")
+
+        # Extract base64 data (remove "data:image/jpeg;base64," prefix if present)
+        if "," in captured_image:
+            captured_image = captured_image.split(",")[1]
+
+        img_data = base64.b64decode(captured_image)
+        nparr = np.frombuffer(img_data, np.uint8)
+        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+        if img is None:
+            raise HTTPException(400, "Invalid image")
+
+        verification = None
+        with inference_executor.admission():
+            if user_id is not None:
+                processed_img, matches, verification = await inference_executor.run(
+                    recognizer.verify, img, user_id
+                )
+            else:
+                processed_img, matches = await inference_executor.run(
+                    recognizer.process_image, img, user_id
+                )
+
+        # Unrecognized faces already come back as "unknown" matches from the same detection
+        logger.debug("Recognition results for user_id %s: %s", user_id, matches)
+
+        response = {
+            "status": "success",
+            "matches": matches,
+            "detected_faces": len(matches) > 0,
+        }
+        if verification is not None:
+            response["verification"] = verification
+        return response
+
+    except InferenceSaturated as e:
+        return saturated_response(e)
+    except Exception as e:
+        raise HTTPException(500, detail=str(e))
+
+
+@app.get("/evidence/{ref}")
+async def get_evidence(ref: str, expires: int = 0, signature: str = ""):
+    # Evidence shows students' faces, so only signed, unexpired links are served
+    if not evidence_store.verify(ref, expires, signature):
+        raise HTTPException(403, "Invalid or expired evidence link")
+    path = evidence_store.path_for(ref)
+    if path is None or not os.path.isfile(path):
+        raise HTTPException(404, "Evidence not found")
+    media_type = next(
+        media for ext, _, media in EVIDENCE_ENCODINGS.values() if ref.endswith(ext)
+    )
+    return FileResponse(path, media_type=media_type)
+
+
+@app.delete("/embeddings/{user_id}")
+async def delete_embeddings(user_id: int):
+    try:
+        deleted = await face_db.run_async(face_db.delete_embeddings, user_id)
+        face_index.remove_user(user_id)
+        await face_index_sync.publish(user_id)
+        return JSONResponse(
+            {
+                "status": "success",
+                "message": f"Deleted {deleted} embeddings for user {user_id}",
+            }
+        )
+    except Exception as e:
+        raise HTTPException(500, detail=str(e))
+
+
+@app.get("/students")
+async def list_students():
+    try:
+        names = await face_db.run_async(face_db.get_student_names)
+        return JSONResponse({"status": "success", "students": names})
+    except Exception as e:
+        raise HTTPException(500, detail=str(e))
+
+
+class Answer(BaseModel):
+    question_id: int
+    answer: str
 
 
 # Pydantic model for /process_periodic input
@@ -1255,129 +3418,1239 @@ class ProcessPeriodicRequest(BaseModel):
     answers: List[Answer] = []
 
 
-# Pydantic model for /submit_due_to_cheating input
-class SubmitDueToCheatingRequest(BaseModel):
-    student_id: str
-    quiz_id: str
-    answers: List[Answer]
-    auth_token: str
+# Header sent ahead of the JPEG bytes in a binary WebSocket frame
+class FrameHeader(BaseModel):
+    auth_token: str
+    seq: int = 0
+    answers: List[Answer] = []
+
+
+# Pydantic model for /submit_due_to_cheating input
+class SubmitDueToCheatingRequest(BaseModel):
+    student_id: str
+    quiz_id: str
+    answers: List[Answer]
+    auth_token: str
+
+
+@app.websocket("/ws/{student_id}/{quiz_id}")
+async def websocket_endpoint(websocket: WebSocket, student_id: str, quiz_id: str):
+    await websocket.accept()
+    session_key = f"{student_id}_{quiz_id}"
+    mailbox = alert_bus.attach(session_key, websocket)
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes") is not None:
+                await handle_binary_frame(
+                    websocket, student_id, quiz_id, message["bytes"]
+                )
+            elif message.get("text") is not None:
+                logger.debug("Received WebSocket message: %s", message["text"])
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await alert_bus.detach(session_key, mailbox)
+        await session_store.run_async(session_store.discard, session_key)
+
+
+def parse_frame_message(data: bytes):
+    """Split a binary frame into its JSON header and a zero-copy view of the JPEG
+
+    Layout: 4-byte big-endian header length, UTF-8 JSON header, JPEG bytes.
+    """
+    view = memoryview(data)
+    if len(view) < 4:
+        raise ValueError("Frame too short")
+    header_length = int.from_bytes(view[:4], "big")
+    if len(view) < 4 + header_length:
+        raise ValueError("Frame header truncated")
+    header = FrameHeader(**json.loads(bytes(view[4 : 4 + header_length])))
+    return header, view[4 + header_length :]
+
+
+async def handle_binary_frame(
+    websocket: WebSocket, student_id: str, quiz_id: str, data: bytes
+):
+    """Analyze one binary frame and push the result back on the same socket"""
+    seq = None
+    try:
+        header, jpeg = parse_frame_message(data)
+        seq = header.seq
+        image = Frame.from_bytes(jpeg)
+        result = await inference_batcher.submit(image, student_id, quiz_id)
+        await send_ws_json(websocket, {"type": "result", "seq": seq, **result})
+        if result["alerts"]:
+            await report_frame_result(
+                student_id, quiz_id, result, header.auth_token, image, header.answers
+            )
+    except InferenceSaturated as e:
+        logger.warning("Inference saturated: %s", e)
+        await send_ws_json(
+            websocket,
+            {
+                "type": "error",
+                "seq": seq,
+                "error": "Inference capacity exhausted, retry later",
+                "retry_after": INFERENCE_RETRY_AFTER,
+                "next_capture_ms": INFERENCE_RETRY_AFTER * 1000,
+            },
+        )
+    except (ValueError, ValidationError) as e:
+        logger.error("Error in binary frame: %s", e)
+        await send_ws_json(websocket, {"type": "error", "seq": seq, "error": str(e)})
+    except WebSocketDisconnect:
+        raise
+    except Exception as e:
+        # Outbox, evidence or session backend failures cost this frame, not the socket
+        logger.error("Error handling binary frame: %s", e)
+        await send_ws_json(
+            websocket,
+            {"type": "error", "seq": seq, "error": "Frame could not be processed"},
+        )
+
+
+def add_to_score(session_key: str, increment: int):
+    """Add an increment to the session's score estimate, returning it (None if unseeded)"""
+    state = session_store.get(session_key)
+    if state.score is not None:
+        state.score = min(state.score + increment, 100)
+        session_store.save(session_key, state)
+    return state.score
+
+
+def adopt_score(session_key: str, new_score: int) -> bool:
+    """Replace the session's score estimate with Laravel's, returning whether the client's may differ"""
+    state = session_store.peek(session_key)
+    if state is None:
+        # Without local state the client only has its own estimate, so always correct it
+        return True
+    changed = state.score != new_score
+    state.score = new_score
+    session_store.save(session_key, state)
+    return changed
+
+
+async def report_frame_result(
+    student_id: str,
+    quiz_id: str,
+    result: Dict,
+    auth_token: str,
+    frame: Frame = None,
+    answers: List[Answer] = (),
+):
+    """Queue a frame's alerts for Laravel and push them to the student's socket right away"""
+    # Convert answers to plain dictionaries
+    serialized_answers = [
+        {"question_id": answer.question_id, "answer": answer.answer}
+        for answer in answers
+    ]
+    payload = cheating_score_payload(
+        student_id,
+        quiz_id,
+        result["alerts"],
+        result["score_increment"],
+        answers=serialized_answers,
+    )
+    # Only frames that actually raise the score are kept as evidence
+    if frame is not None and result["score_increment"] > 0:
+        try:
+            evidence = await evidence_store.capture_async(frame, result)
+            # Laravel keeps the thumbnail and the ref; the full frame stays in the
+            # evidence store and Laravel mints signed links to it on demand
+            payload["image_b64"] = evidence["thumbnail"]
+            payload["evidence_ref"] = evidence["ref"]
+        except (OSError, ValueError) as e:
+            logger.error("Failed to capture evidence: %s", e)
+    await report_outbox.enqueue(
+        "cheating_score",
+        "/api/quizzes/update-cheating-score",
+        payload,
+        auth_token,
+        student_id,
+        quiz_id,
+    )
+    # Laravel caps the score at 100; mirror that locally until the report lands.
+    # A session with no delivered report yet has no score to build on, so the
+    # client adds the increment to the score it last got from Laravel instead.
+    new_score = await session_store.run_async(
+        add_to_score, f"{student_id}_{quiz_id}", result["score_increment"]
+    )
+    ws_message = {
+        "type": "alert",
+        "message": result["alerts"],
+        "score_increment": result["score_increment"],
+        "auto_submitted": False,
+        "new_score": new_score,
+    }
+    await notify_client(student_id, quiz_id, ws_message)
+
+
+async def reconcile_cheating_score(report: Dict, response_data: Dict):
+    """Adopt Laravel's score once a report is delivered and relay auto-submission"""
+    student_id, quiz_id = report["student_id"], report["quiz_id"]
+    new_score = response_data.get("new_score", response_data.get("score"))
+    auto_submitted = response_data.get("auto_submitted", False)
+    changed = new_score is not None and await session_store.run_async(
+        adopt_score, f"{student_id}_{quiz_id}", new_score
+    )
+    if auto_submitted or changed:
+        await notify_client(
+            student_id,
+            quiz_id,
+            {
+                "type": "alert",
+                "message": [],
+                "score_increment": 0,
+                "auto_submitted": auto_submitted,
+                "new_score": new_score,
+            },
+        )
+
+
+# Alert delivery: "inprocess" reaches sockets on this worker only; "redis" fans
+# alerts out over pub/sub so the worker holding the socket delivers them
+ALERT_BUS = os.getenv("ALERT_BUS", "inprocess").lower()
+ALERT_REDIS_URL = os.getenv("ALERT_REDIS_URL", SESSION_REDIS_URL)
+ALERT_CHANNEL = os.getenv("ALERT_CHANNEL", "eduguard:alerts")
+# Alert texts kept when several alerts are merged into one pending message
+ALERT_MAX_MESSAGES = int(os.getenv("ALERT_MAX_MESSAGES", "20"))
 
 
-@app.websocket("/ws/{student_id}/{quiz_id}")
-async def websocket_endpoint(websocket: WebSocket, student_id: str, quiz_id: str):
-    await websocket.accept()
-    session_key = f"{student_id}_{quiz_id}"
-    connections[session_key] = websocket
-    try:
+def coalesce_messages(pending: Dict, message: Dict) -> Dict:
+    """Merge a new message into one that has not been sent yet"""
+    if pending.get("type") != "alert" or message.get("type") != "alert":
+        return message
+    alerts = list(dict.fromkeys(pending["message"] + message["message"]))
+    new_score = message.get("new_score")
+    return {
+        "type": "alert",
+        "message": alerts[-ALERT_MAX_MESSAGES:],
+        "score_increment": pending.get("score_increment", 0)
+        + message.get("score_increment", 0),
+        "auto_submitted": bool(
+            pending.get("auto_submitted") or message.get("auto_submitted")
+        ),
+        "new_score": new_score if new_score is not None else pending.get("new_score"),
+    }
+
+
+class ClientMailbox:
+    """Delivers messages to one local WebSocket through a single sender task
+
+    Messages arriving while a send is in flight are merged into one pending
+    message, so a slow client holds at most one send and one pending message.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.pending = None
+        self.sent = 0
+        self.coalesced = 0
+        self.failed = 0
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def put(self, message: Dict):
+        if self.pending is None:
+            self.pending = message
+        else:
+            self.pending = coalesce_messages(self.pending, message)
+            self.coalesced += 1
+        self._wakeup.set()
+
+    async def _run(self):
         while True:
-            data = await websocket.receive_text()
-            print(f"Received WebSocket message: {data}")
-    except WebSocketDisconnect:
-        if session_key in connections:
-            del connections[session_key]
-        if session_key in non_frontal_pose_sequences:
-            del non_frontal_pose_sequences[session_key]
-        if session_key in suspicious_gaze_sequences:
-            del suspicious_gaze_sequences[session_key]
-    finally:
-        if session_key in connections:
-            del connections[session_key]
-        if session_key in non_frontal_pose_sequences:
-            del non_frontal_pose_sequences[session_key]
-        if session_key in suspicious_gaze_sequences:
-            del suspicious_gaze_sequences[session_key]
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            message, self.pending = self.pending, None
+            if message is None:
+                continue
+            try:
+                await send_ws_json(self.websocket, message)
+                self.sent += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error("Error sending WebSocket message: %s", e)
+
+    async def close(self):
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+
+
+class AlertBus:
+    """Routes alerts to the mailbox of the session's WebSocket on this worker"""
+
+    name = "inprocess"
+
+    def __init__(self):
+        self.mailboxes: Dict[str, ClientMailbox] = {}
+        self.published = 0
+        self.delivered = 0
+        self.undeliverable = 0
+        self.errors = 0
+        # Totals from mailboxes already closed
+        self.sent = 0
+        self.coalesced = 0
+
+    def attach(self, session_key: str, websocket: WebSocket) -> ClientMailbox:
+        previous = self.mailboxes.get(session_key)
+        if previous is not None:
+            # A reconnect replaces the old socket
+            asyncio.create_task(previous.close())
+        mailbox = self.mailboxes[session_key] = ClientMailbox(websocket)
+        return mailbox
+
+    async def detach(self, session_key: str, mailbox: ClientMailbox):
+        # Only the current socket's mailbox is removed, not a newer reconnect's
+        if self.mailboxes.get(session_key) is mailbox:
+            del self.mailboxes[session_key]
+        await mailbox.close()
+        self.sent += mailbox.sent
+        self.coalesced += mailbox.coalesced
+
+    def deliver_local(self, session_key: str, message: Dict) -> bool:
+        mailbox = self.mailboxes.get(session_key)
+        if mailbox is None:
+            return False
+        mailbox.put(message)
+        self.delivered += 1
+        return True
+
+    async def publish(self, session_key: str, message: Dict):
+        self.published += 1
+        if not self.deliver_local(session_key, message):
+            self.undeliverable += 1
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        for session_key, mailbox in list(self.mailboxes.items()):
+            await self.detach(session_key, mailbox)
+
+    def stats(self) -> Dict:
+        mailboxes = list(self.mailboxes.values())
+        return {
+            "bus": self.name,
+            "sockets": len(mailboxes),
+            "published": self.published,
+            "delivered": self.delivered,
+            "undeliverable": self.undeliverable,
+            "errors": self.errors,
+            "sent": self.sent + sum(mailbox.sent for mailbox in mailboxes),
+            "coalesced": self.coalesced
+            + sum(mailbox.coalesced for mailbox in mailboxes),
+            "pending": sum(mailbox.pending is not None for mailbox in mailboxes),
+        }
+
+
+class RedisAlertBus(AlertBus):
+    """Alert bus that fans alerts for remote sockets out over Redis pub/sub
+
+    Alerts for a socket on this worker skip the broker. Every worker subscribes
+    to ALERT_CHANNEL and delivers what arrives for its own sockets. Pass a client
+    (for example fakeredis.aioredis.FakeRedis()) to run without a server.
+    """
+
+    name = "redis"
+
+    def __init__(
+        self, client=None, url: str = ALERT_REDIS_URL, channel: str = ALERT_CHANNEL
+    ):
+        super().__init__()
+        if client is None:
+            if redis is None:
+                raise RuntimeError("ALERT_BUS=redis requires the redis package")
+            client = redis.asyncio.Redis.from_url(url)
+        self.client = client
+        self.channel = channel
+        self.worker_id = uuid.uuid4().hex
+        self.remote_delivered = 0
+        self._task = None
+
+    async def publish(self, session_key: str, message: Dict):
+        self.published += 1
+        if self.deliver_local(session_key, message):
+            return
+        envelope = {
+            "origin": self.worker_id,
+            "session_key": session_key,
+            "message": message,
+        }
+        try:
+            await self.client.publish(
+                self.channel, json.dumps(envelope, default=json_default)
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.error("Error publishing alert for %s: %s", session_key, e)
+
+    async def _listen(self):
+        while True:
+            pubsub = self.client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for item in pubsub.listen():
+                    if item["type"] != "message":
+                        continue
+                    envelope = json.loads(item["data"])
+                    if envelope["origin"] == self.worker_id:
+                        continue
+                    if self.deliver_local(envelope["session_key"], envelope["message"]):
+                        self.remote_delivered += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.error("Alert subscription failed: %s", e)
+                await asyncio.sleep(1.0)
+            finally:
+                with suppress(Exception):
+                    await pubsub.aclose()
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await super().stop()
+        with suppress(Exception):
+            await self.client.aclose()
+
+    def stats(self) -> Dict:
+        return {**super().stats(), "remote_delivered": self.remote_delivered}
+
+
+def create_alert_bus(name: str = ALERT_BUS) -> AlertBus:
+    if name == "inprocess":
+        return AlertBus()
+    if name == "redis":
+        return RedisAlertBus()
+    raise ValueError(f"Unknown ALERT_BUS: {name}")
+
+
+alert_bus = create_alert_bus()
 
 
 async def notify_client(student_id: str, quiz_id: str, message: dict):
-    """Send notification to client via WebSocket"""
-    session_key = f"{student_id}_{quiz_id}"
-    if session_key in connections:
+    """Send notification to the client's WebSocket, on whichever worker holds it"""
+    await alert_bus.publish(f"{student_id}_{quiz_id}", message)
+
+
+# Every worker holds its own face index. "inprocess" only updates this worker's
+# copy, so it needs a single worker; "redis" announces each enrolment change so
+# the other workers reload that user from the database
+FACE_INDEX_SYNC = os.getenv(
+    "FACE_INDEX_SYNC", "redis" if ALERT_BUS == "redis" else "inprocess"
+).lower()
+FACE_INDEX_REDIS_URL = os.getenv("FACE_INDEX_REDIS_URL", ALERT_REDIS_URL)
+FACE_INDEX_CHANNEL = os.getenv("FACE_INDEX_CHANNEL", "eduguard:face_index")
+
+
+class FaceIndexSync:
+    """Propagates enrolment changes to the face index of other workers (none here)"""
+
+    name = "inprocess"
+
+    def __init__(self, index: FaceIndex, db: "FaceDB"):
+        self.index = index
+        self.db = db
+        self.published = 0
+        self.applied = 0
+        self.reloads = 0
+        self.errors = 0
+
+    async def publish(self, user_id: int):
+        """Announce that a user's embeddings changed; this worker's index is already current"""
+        self.published += 1
+
+    async def reload_user(self, user_id: int):
+        """Replace a user's embeddings in the index with what the database holds"""
+        embeddings, labels, _ = await self.db.run_async(
+            self.db.load_embeddings, user_id
+        )
+        if len(embeddings):
+            self.index.replace_user(user_id, str(labels[0]), embeddings)
+        else:
+            self.index.remove_user(user_id)
+        self.applied += 1
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def stats(self) -> Dict:
+        return {
+            "sync": self.name,
+            "published": self.published,
+            "applied": self.applied,
+            "reloads": self.reloads,
+            "errors": self.errors,
+        }
+
+
+class RedisFaceIndexSync(FaceIndexSync):
+    """Face index sync over Redis pub/sub
+
+    Each change is published as a user id on FACE_INDEX_CHANNEL and every other
+    worker reloads that user's embeddings, so deletes propagate as well as
+    registrations. After (re)subscribing a worker reloads the whole index, as
+    changes published while it was not listening are lost. Pass a client (for
+    example fakeredis.aioredis.FakeRedis()) to run without a server.
+    """
+
+    name = "redis"
+
+    def __init__(
+        self,
+        index: FaceIndex,
+        db: "FaceDB",
+        client=None,
+        url: str = FACE_INDEX_REDIS_URL,
+        channel: str = FACE_INDEX_CHANNEL,
+    ):
+        super().__init__(index, db)
+        if client is None:
+            if redis is None:
+                raise RuntimeError("FACE_INDEX_SYNC=redis requires the redis package")
+            client = redis.asyncio.Redis.from_url(url)
+        self.client = client
+        self.channel = channel
+        self.worker_id = uuid.uuid4().hex
+        self._task = None
+
+    async def publish(self, user_id: int):
+        self.published += 1
+        envelope = {"origin": self.worker_id, "user_id": int(user_id)}
         try:
-            await connections[session_key].send_json(message)
+            await self.client.publish(self.channel, json.dumps(envelope))
         except Exception as e:
-            print(f"Error sending WebSocket message: {str(e)}")
+            self.errors += 1
+            logger.error("Error publishing face index change for %s: %s", user_id, e)
+
+    async def _listen(self):
+        while True:
+            pubsub = self.client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                await self.db.run_async(self.index.load, self.db)
+                self.reloads += 1
+                async for item in pubsub.listen():
+                    if item["type"] != "message":
+                        continue
+                    envelope = json.loads(item["data"])
+                    if envelope["origin"] != self.worker_id:
+                        await self.reload_user(envelope["user_id"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.error("Face index subscription failed: %s", e)
+                await asyncio.sleep(1.0)
+            finally:
+                with suppress(Exception):
+                    await pubsub.aclose()
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        with suppress(Exception):
+            await self.client.aclose()
+
+
+def create_face_index_sync(name: str = FACE_INDEX_SYNC) -> FaceIndexSync:
+    if name == "inprocess":
+        # uvicorn --workers falls back to WEB_CONCURRENCY
+        if len(SESSION_WORKERS) > 1 or int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+            raise ValueError(
+                "FACE_INDEX_SYNC=inprocess only supports a single worker; "
+                "set FACE_INDEX_SYNC=redis to run several"
+            )
+        return FaceIndexSync(face_index, face_db)
+    if name == "redis":
+        return RedisFaceIndexSync(face_index, face_db)
+    raise ValueError(f"Unknown FACE_INDEX_SYNC: {name}")
+
+
+face_index_sync = create_face_index_sync()
+
+
+# Evidence frames stored for alerts that raised the cheating score
+EVIDENCE_DIR = os.getenv("EVIDENCE_DIR", "evidence")
+EVIDENCE_FORMAT = os.getenv("EVIDENCE_FORMAT", "jpeg")  # jpeg or webp
+EVIDENCE_QUALITY = int(os.getenv("EVIDENCE_QUALITY", "75"))
+EVIDENCE_MAX_WIDTH = int(os.getenv("EVIDENCE_MAX_WIDTH", "960"))
+EVIDENCE_THUMB_WIDTH = int(os.getenv("EVIDENCE_THUMB_WIDTH", "320"))
+EVIDENCE_THUMB_QUALITY = int(os.getenv("EVIDENCE_THUMB_QUALITY", "60"))
+EVIDENCE_MAX_BYTES = int(os.getenv("EVIDENCE_MAX_BYTES", str(2 * 2**30)))
+EVIDENCE_MAX_AGE = float(os.getenv("EVIDENCE_MAX_AGE", str(30 * 86400)))
+EVIDENCE_PUBLIC_URL = os.getenv("EVIDENCE_PUBLIC_URL", "http://localhost:8001")
+# Evidence URLs carry an expiry and an HMAC-SHA256 signature of "<ref>:<expires>"
+# under this key, shared with Laravel so it can mint fresh links. Unset disables
+# GET /evidence entirely.
+EVIDENCE_SIGNING_KEY = os.getenv("EVIDENCE_SIGNING_KEY", "")
+EVIDENCE_URL_TTL = int(os.getenv("EVIDENCE_URL_TTL", "86400"))
+
+# format -> (file extension, OpenCV quality flag, MIME type)
+EVIDENCE_ENCODINGS = {
+    "jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY, "image/jpeg"),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY, "image/webp"),
+}
+EVIDENCE_REF_PATTERN = re.compile(r"^[0-9a-f]{64}\.(jpg|webp)$")
+
+
+class EvidenceStore:
+    """Content-addressed store of downscaled, annotated evidence frames
+
+    Files live at <root>/<first two hex digits>/<sha256>.<ext>, so identical
+    evidence is stored once. The oldest files are removed once the store
+    exceeds EVIDENCE_MAX_BYTES or they are older than EVIDENCE_MAX_AGE.
+    """
+
+    def __init__(
+        self,
+        root: str = EVIDENCE_DIR,
+        image_format: str = EVIDENCE_FORMAT,
+        max_bytes: int = EVIDENCE_MAX_BYTES,
+        max_age: float = EVIDENCE_MAX_AGE,
+    ):
+        self.root = root
+        self.extension, self.quality_flag, self.media_type = EVIDENCE_ENCODINGS[
+            image_format
+        ]
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        # ref -> (size, mtime), oldest first
+        self._entries: "OrderedDict[str, tuple]" = None
+        self._bytes = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="evidence"
+        )
+        self.captured = 0
+        self.deduplicated = 0
+        self.pruned = 0
+
+    @staticmethod
+    def signature(ref: str, expires: int) -> str:
+        return hmac.new(
+            EVIDENCE_SIGNING_KEY.encode(), f"{ref}:{expires}".encode(), hashlib.sha256
+        ).hexdigest()
+
+    def signed_url(self, ref: str, ttl: int = EVIDENCE_URL_TTL) -> str:
+        """Expiring link to an evidence file, or None when signing is not configured"""
+        if not EVIDENCE_SIGNING_KEY:
+            return None
+        expires = int(time.time()) + ttl
+        return (
+            f"{EVIDENCE_PUBLIC_URL}/evidence/{ref}"
+            f"?expires={expires}&signature={self.signature(ref, expires)}"
+        )
+
+    def verify(self, ref: str, expires: int, signature: str) -> bool:
+        if not EVIDENCE_SIGNING_KEY or expires < time.time():
+            return False
+        return hmac.compare_digest(self.signature(ref, expires), signature)
+
+    def path_for(self, ref: str) -> str:
+        if not EVIDENCE_REF_PATTERN.match(ref):
+            return None
+        return os.path.join(self.root, ref[:2], ref)
+
+    def _index(self):
+        """Scan the store once so retention also covers files from earlier runs"""
+        if self._entries is None:
+            found = []
+            if os.path.isdir(self.root):
+                for directory, _, files in os.walk(self.root):
+                    for name in files:
+                        if EVIDENCE_REF_PATTERN.match(name):
+                            st = os.stat(os.path.join(directory, name))
+                            found.append((st.st_mtime, name, st.st_size))
+            found.sort()
+            self._entries = OrderedDict(
+                (name, (size, mtime)) for mtime, name, size in found
+            )
+            self._bytes = sum(size for size, _ in self._entries.values())
+        return self._entries
+
+    def _enforce_limits(self):
+        entries = self._index()
+        cutoff = time.time() - self.max_age
+        while entries:
+            ref, (size, mtime) = next(iter(entries.items()))
+            if self._bytes <= self.max_bytes and mtime >= cutoff:
+                break
+            del entries[ref]
+            self._bytes -= size
+            self.pruned += 1
+            with suppress(FileNotFoundError):
+                os.remove(self.path_for(ref))
+
+    @staticmethod
+    def _downscale(img: np.ndarray, width: int) -> np.ndarray:
+        if img.shape[1] <= width:
+            return img.copy()
+        height = round(img.shape[0] * width / img.shape[1])
+        return cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA)
+
+    @staticmethod
+    def _annotate(img: np.ndarray, result: Dict, scale: float):
+        for face in result.get("faces", []):
+            x1, y1, x2, y2 = (int(v * scale) for v in face["bounding_box"])
+            cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        for obj in result.get("suspicious_objects", []):
+            x1, y1, x2, y2 = (int(v * scale) for v in obj["bounding_box"])
+            cv2.rectangle(img, (x1, y1), (x2, y2), (0, 0, 255), 2)
+            cv2.putText(
+                img,
+                obj["class"],
+                (x1, max(y1 - 6, 12)),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.5,
+                (0, 0, 255),
+                1,
+            )
+
+    def _encode(self, img: np.ndarray, quality: int) -> bytes:
+        ok, encoded = cv2.imencode(self.extension, img, [self.quality_flag, quality])
+        if not ok:
+            raise ValueError("Failed to encode evidence frame")
+        return encoded.tobytes()
+
+    def capture(self, frame: Frame, result: Dict) -> Dict:
+        """Store an annotated evidence frame and return its ref, URL and a thumbnail data URL"""
+        evidence = self._downscale(frame.bgr, EVIDENCE_MAX_WIDTH)
+        self._annotate(evidence, result, evidence.shape[1] / frame.size[0])
+        data = self._encode(evidence, EVIDENCE_QUALITY)
+        ref = hashlib.sha256(data).hexdigest() + self.extension
+        path = self.path_for(ref)
+
+        with self._lock:
+            entries = self._index()
+            if ref in entries:
+                self.deduplicated += 1
+                entries.move_to_end(ref)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                entries[ref] = (len(data), time.time())
+                self._bytes += len(data)
+                self.captured += 1
+            self._enforce_limits()
+
+        thumbnail = self._encode(
+            self._downscale(evidence, EVIDENCE_THUMB_WIDTH), EVIDENCE_THUMB_QUALITY
+        )
+        return {
+            "ref": ref,
+            "url": self.signed_url(ref),
+            "bytes": len(data),
+            "thumbnail": f"data:{self.media_type};base64,"
+            + base64.b64encode(thumbnail).decode(),
+        }
+
+    async def capture_async(self, frame: Frame, result: Dict) -> Dict:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.capture, frame, result
+        )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._index()
+            return {
+                "root": self.root,
+                "files": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "captured": self.captured,
+                "deduplicated": self.deduplicated,
+                "pruned": self.pruned,
+            }
+
+
+evidence_store = EvidenceStore()
+
+
+# Shared HTTP client for Laravel callbacks
+LARAVEL_URL = os.getenv("LARAVEL_URL", "http://localhost:8000")
+LARAVEL_MAX_CONNECTIONS = int(os.getenv("LARAVEL_MAX_CONNECTIONS", "20"))
+LARAVEL_MAX_KEEPALIVE = int(os.getenv("LARAVEL_MAX_KEEPALIVE", "10"))
+LARAVEL_KEEPALIVE_EXPIRY = float(os.getenv("LARAVEL_KEEPALIVE_EXPIRY", "30"))
+LARAVEL_HTTP2 = os.getenv("LARAVEL_HTTP2", "false").lower() in ("1", "true", "yes")
+LARAVEL_TIMEOUT = float(os.getenv("LARAVEL_TIMEOUT", "10"))
+LARAVEL_CONNECT_TIMEOUT = float(os.getenv("LARAVEL_CONNECT_TIMEOUT", "3"))
+
+
+class LaravelClient:
+    """Application-scoped keep-alive client for the Laravel API"""
+
+    def __init__(self, base_url: str = LARAVEL_URL):
+        self.base_url = base_url
+        self._client = None
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.latency = Histogram(
+            "laravel_request_seconds",
+            "Latency of requests to the Laravel API",
+            [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0],
+        )
+
+    def start(self):
+        if self._client is not None:
+            return
+        http2 = LARAVEL_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning(
+                    "LARAVEL_HTTP2 needs the h2 package (httpx[http2]); using HTTP/1.1"
+                )
+                http2 = False
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=LARAVEL_MAX_CONNECTIONS,
+                max_keepalive_connections=LARAVEL_MAX_KEEPALIVE,
+                keepalive_expiry=LARAVEL_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(LARAVEL_TIMEOUT, connect=LARAVEL_CONNECT_TIMEOUT),
+            headers={"Accept": "application/json"},
+        )
+
+    async def close(self):
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+
+    async def post(self, path: str, payload: Dict, auth_token: str, headers=None):
+        # Started lazily for callers outside the app lifespan (scripts, benchmarks)
+        self.start()
+        self.in_flight += 1
+        self.requests += 1
+        started = time.perf_counter()
+        try:
+            return await self._client.post(
+                path,
+                json=payload,
+                headers={"Authorization": f"Bearer {auth_token}", **(headers or {})},
+            )
+        except httpx.HTTPError:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.latency.observe(time.perf_counter() - started)
+
+    def stats(self) -> Dict:
+        return {
+            "base_url": self.base_url,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "latency_seconds": self.latency.snapshot(),
+        }
+
+
+laravel_client = LaravelClient()
+
+
+# Durable outbox for Laravel reports (SQLite in WAL mode)
+OUTBOX_PATH = os.getenv("OUTBOX_PATH", "outbox.sqlite3")
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "2"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "1"))
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "300"))
+OUTBOX_RETENTION = float(os.getenv("OUTBOX_RETENTION", "86400"))
+OUTBOX_POLL_INTERVAL = 1.0
+
+
+class ReportOutbox:
+    """Durable queue of Laravel reports, delivered by background workers with retry and backoff
+
+    Every report carries an Idempotency-Key, so a retry after a lost response
+    is not applied twice. Rows are claimed with a lease, so several processes
+    can share one outbox file. Settled rows keep neither payload nor token; a
+    report whose token Laravel rejects (401) fails at once rather than retrying.
+    """
+
+    def __init__(self, path: str = OUTBOX_PATH, workers: int = OUTBOX_WORKERS):
+        self.path = path
+        self.workers = workers
+        # sqlite3 calls block, so they run on one dedicated thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="outbox")
+        self._conn = None
+        self._wakeup = None
+        self._tasks = []
+        self._handlers = {}
+        self.enqueued = 0
+        self.delivered = 0
+        self.retried = 0
+        self.failed = 0
+        self.delivery_latency = Histogram(
+            "outbox_delivery_seconds",
+            "Time from enqueue to successful delivery to Laravel",
+            [0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0],
+        )
+
+    def on_delivered(self, kind: str, handler):
+        """Register `await handler(report, response_data)` for delivered reports of a kind"""
+        self._handlers[kind] = handler
+
+    # Blocking SQLite operations, run on the outbox thread
+
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=5.0)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    idempotency_key TEXT NOT NULL UNIQUE,
+                    kind TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    auth_token TEXT NOT NULL,
+                    student_id TEXT,
+                    quiz_id TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    lease_until REAL NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    finished_at REAL
+                )
+            """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _insert(self, report: Dict):
+        self._connection().execute(
+            """
+            INSERT INTO outbox (idempotency_key, kind, path, payload, auth_token,
+                                student_id, quiz_id, next_attempt_at, created_at)
+            VALUES (:idempotency_key, :kind, :path, :payload, :auth_token,
+                    :student_id, :quiz_id, :created_at, :created_at)
+        """,
+            report,
+        )
+
+    def _claim(self, lease: float):
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                """
+                SELECT * FROM outbox
+                WHERE status = 'pending' AND next_attempt_at <= ? AND lease_until <= ?
+                ORDER BY id LIMIT 1
+            """,
+                (now, now),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE outbox SET lease_until = ? WHERE id = ?",
+                    (now + lease, row["id"]),
+                )
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        return dict(row) if row is not None else None
+
+    def _next_due_in(self) -> float:
+        """Seconds until the earliest pending report is due"""
+        due = (
+            self._connection()
+            .execute(
+                "SELECT MIN(MAX(next_attempt_at, lease_until)) FROM outbox WHERE status = 'pending'"
+            )
+            .fetchone()[0]
+        )
+        return OUTBOX_POLL_INTERVAL if due is None else max(0.0, due - time.time())
+
+    def _finish(self, report_id: int, status: str, attempts: int, error: str = None):
+        # Neither the payload (which may hold an image) nor the student's bearer
+        # token is needed once the report is settled
+        self._connection().execute(
+            """
+            UPDATE outbox SET status = ?, attempts = ?, last_error = ?, payload = '',
+                              auth_token = '', lease_until = 0, finished_at = ?
+            WHERE id = ?
+        """,
+            (status, attempts, error, time.time(), report_id),
+        )
+
+    def _reschedule(self, report_id: int, attempts: int, delay: float, error: str):
+        self._connection().execute(
+            """
+            UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ?,
+                              lease_until = 0
+            WHERE id = ?
+        """,
+            (attempts, time.time() + delay, error, report_id),
+        )
 
+    def _prune(self, retention: float) -> int:
+        cursor = self._connection().execute(
+            "DELETE FROM outbox WHERE status != 'pending' AND finished_at < ?",
+            (time.time() - retention,),
+        )
+        return cursor.rowcount
+
+    def _backlog(self) -> int:
+        return (
+            self._connection()
+            .execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'")
+            .fetchone()[0]
+        )
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def _db(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, partial(fn, *args)
+        )
+
+    # Async API
+
+    async def enqueue(
+        self,
+        kind: str,
+        path: str,
+        payload: Dict,
+        auth_token: str,
+        student_id: str = None,
+        quiz_id: str = None,
+    ) -> str:
+        """Persist a report for delivery and return its idempotency key"""
+        key = uuid.uuid4().hex
+        await self._db(
+            self._insert,
+            {
+                "idempotency_key": key,
+                "kind": kind,
+                "path": path,
+                "payload": json.dumps(payload),
+                "auth_token": auth_token,
+                "student_id": student_id,
+                "quiz_id": quiz_id,
+                "created_at": time.time(),
+            },
+        )
+        self.enqueued += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return key
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ] + [asyncio.create_task(self._maintain())]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Undelivered reports stay in the file and are picked up on the next start
+        await self._db(self._close)
+        self._executor.shutdown(wait=True)
+
+    async def _worker(self):
+        lease = LARAVEL_TIMEOUT * 2
+        while True:
+            try:
+                report = await self._db(self._claim, lease)
+                wait = None if report else await self._db(self._next_due_in)
+            except sqlite3.Error as e:
+                logger.error("Outbox claim failed: %s", e)
+                report, wait = None, OUTBOX_POLL_INTERVAL
+            if report is None:
+                self._wakeup.clear()
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(
+                        self._wakeup.wait(), timeout=min(wait, OUTBOX_POLL_INTERVAL)
+                    )
+                continue
+            await self._deliver(report)
+
+    async def _maintain(self):
+        while True:
+            with suppress(sqlite3.Error):
+                pruned = await self._db(self._prune, OUTBOX_RETENTION)
+                if pruned:
+                    logger.info("Pruned %s settled outbox reports", pruned)
+            await asyncio.sleep(3600)
+
+    async def _deliver(self, report: Dict):
+        attempts = report["attempts"] + 1
+        try:
+            response = await laravel_client.post(
+                report["path"],
+                json.loads(report["payload"]),
+                report["auth_token"],
+                headers={"Idempotency-Key": report["idempotency_key"]},
+            )
+        except httpx.HTTPError as e:
+            await self._retry(report, attempts, f"{type(e).__name__}: {str(e)}")
+            return
+
+        if response.status_code < 300:
+            await self._db(self._finish, report["id"], "delivered", attempts)
+            self.delivered += 1
+            self.delivery_latency.observe(time.time() - report["created_at"])
+            handler = self._handlers.get(report["kind"])
+            if handler is not None:
+                try:
+                    data = response.json()
+                except ValueError:
+                    data = {}
+                try:
+                    await handler(report, data)
+                except Exception as e:
+                    logger.error("Outbox handler failed: %s", e)
+        elif 400 <= response.status_code < 500 and response.status_code not in (
+            408,
+            429,
+        ):
+            # Rejected outright; retrying would not change the answer. The token is
+            # the student's own, so one that expired during backoff cannot be renewed
+            error = f"HTTP {response.status_code}"
+            if response.status_code == 401:
+                error += ": auth token rejected (expired or revoked)"
+            logger.error(
+                "Laravel rejected report %s: %s (%s)",
+                report["idempotency_key"],
+                response.text,
+                error,
+            )
+            await self._db(self._finish, report["id"], "failed", attempts, error)
+            self.failed += 1
+        else:
+            await self._retry(report, attempts, f"HTTP {response.status_code}")
+
+    async def _retry(self, report: Dict, attempts: int, error: str):
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            logger.error(
+                "Giving up on report %s after %s attempts: %s",
+                report["idempotency_key"],
+                attempts,
+                error,
+            )
+            await self._db(self._finish, report["id"], "failed", attempts, error)
+            self.failed += 1
+            return
+        # Exponential backoff with jitter
+        delay = min(OUTBOX_BACKOFF_MAX, OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1))
+        delay *= random.uniform(0.5, 1.0)
+        await self._db(self._reschedule, report["id"], attempts, delay, error)
+        self.retried += 1
 
-async def log_cheating_to_laravel(
+    def stats(self) -> Dict:
+        return {
+            "path": self.path,
+            "workers": self.workers,
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "failed": self.failed,
+            "delivery_seconds": self.delivery_latency.snapshot(),
+        }
+
+
+report_outbox = ReportOutbox()
+report_outbox.on_delivered("cheating_score", reconcile_cheating_score)
+
+
+def cheating_score_payload(
     student_id: str,
     quiz_id: str,
     alerts: List[str],
     score_increment: int,
-    auth_token: str,
     image_b64: str = None,
     answers: List[Dict[str, str]] = None,
-):
-    """Send suspicious behaviors and score update to Laravel, and cheating image to Laravel"""
-    async with httpx.AsyncClient() as client:
-        try:
-            payload = {
-                "student_id": student_id,
-                "quiz_id": quiz_id,
-                "score_increment": score_increment,
-                "alerts": alerts,
-            }
-            if image_b64:  # Include image data if provided
-                payload["image_b64"] = image_b64
-            if answers:
-                payload["answers"] = answers
-
-            response = await client.post(
-                "http://localhost:8000/api/quizzes/update-cheating-score",
-                json=payload,
-                headers={
-                    "Authorization": f"Bearer {auth_token}",
-                    "Accept": "application/json",
-                },
-                timeout=10.0,  # Add timeout to prevent hanging
-            )
-            response_data = response.json()
-            if response.status_code != 200:
-                print(
-                    f"Failed to log to Laravel: {response.text} (Status: {response.status_code})"
-                )
-            else:
-                print(f"Successfully logged to Laravel: {response.text}")
-            return response_data
-        except Exception as e:
-            print(f"Error logging to Laravel: {str(e)}")
-            return {"message": "Error logging to Laravel", "error": str(e)}
+) -> Dict:
+    payload = {
+        "student_id": student_id,
+        "quiz_id": quiz_id,
+        "score_increment": score_increment,
+        "alerts": alerts,
+    }
+    if image_b64:  # Include image data if provided
+        payload["image_b64"] = image_b64
+    if answers:
+        payload["answers"] = answers
+    return payload
 
 
 async def submit_to_laravel(
     student_id: str, quiz_id: str, answers: List[Dict[str, str]], auth_token: str
 ):
     """Submit quiz answers to Laravel when cheating score reaches 100"""
-    async with httpx.AsyncClient() as client:
-        try:
-            # Ensure answers is a list of plain dictionaries
-            serialized_answers = [
-                (
-                    {"question_id": answer["question_id"], "answer": answer["answer"]}
-                    if isinstance(answer, dict)
-                    else {"question_id": answer.question_id, "answer": answer.answer}
-                )
-                for answer in answers
-            ]
-            print(f"Sending answers to Laravel: {serialized_answers}")
-            response = await client.post(
-                f"http://localhost:8000/api/quizzes/submit/{quiz_id}",
-                json={
-                    "student_id": student_id,
-                    "answers": serialized_answers,
-                },
-                headers={
-                    "Authorization": f"Bearer {auth_token}",
-                    "Accept": "application/json",
-                },
-                timeout=10.0,
+    try:
+        # Ensure answers is a list of plain dictionaries
+        serialized_answers = [
+            (
+                {"question_id": answer["question_id"], "answer": answer["answer"]}
+                if isinstance(answer, dict)
+                else {"question_id": answer.question_id, "answer": answer.answer}
             )
-            return {"status": response.status_code, "data": response.json()}
-        except Exception as e:
-            print(f"Error submitting to Laravel: {str(e)}")
-            return {
-                "status": 500,
-                "data": {"message": "Error submitting quiz", "error": str(e)},
-            }
+            for answer in answers
+        ]
+        logger.debug("Sending answers to Laravel: %s", serialized_answers)
+        response = await laravel_client.post(
+            f"/api/quizzes/submit/{quiz_id}",
+            {
+                "student_id": student_id,
+                "answers": serialized_answers,
+            },
+            auth_token,
+        )
+        return {"status": response.status_code, "data": response.json()}
+    except Exception as e:
+        logger.error("Error submitting to Laravel: %s", e)
+        return {
+            "status": 500,
+            "data": {"message": "Error submitting quiz", "error": str(e)},
+        }
 
 
 @app.post("/predict")
@@ -1389,34 +4662,24 @@ async def predict(
 ):
     try:
         contents = await file.read()
-        image = Image.open(io.BytesIO(contents)).convert("RGB")
+        image = Frame.from_bytes(contents)
         result = await process_image(image)
         if result["alerts"] and student_id and quiz_id and auth_token:
-            laravel_response = await log_cheating_to_laravel(
-                student_id,
-                quiz_id,
-                result["alerts"],
-                result["score_increment"],
-                auth_token,
-            )
-            ws_message = {
-                "type": "alert",
-                "message": result["alerts"],
-                "score_increment": result["score_increment"],
-                "auto_submitted": laravel_response.get("auto_submitted", False),
-                "new_score": laravel_response.get("new_score", 0),
-            }
-            await notify_client(student_id, quiz_id, ws_message)
+            await report_frame_result(student_id, quiz_id, result, auth_token, image)
         return JSONResponse(content=result)
+    except InferenceSaturated as e:
+        return saturated_response(e)
     except Exception as e:
-        print(f"Error in predict: {str(e)}")
+        logger.error("Error in predict: %s", e)
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
 
 @app.post("/process_periodic")
 async def process_periodic(request: ProcessPeriodicRequest):
-    print(
-        f"Received: student_id={request.student_id}, quiz_id={request.quiz_id}, image_b64_length={len(request.image_b64)}, auth_token={request.auth_token[:10]}..."
+    logger.debug(
+        "process_periodic: student_id=%s, quiz_id=%s",
+        request.student_id,
+        request.quiz_id,
     )
     try:
         # Decode base64 string
@@ -1425,8 +4688,10 @@ async def process_periodic(request: ProcessPeriodicRequest):
             image_data = base64.b64decode(image_b64.split(",")[1])
         else:
             image_data = base64.b64decode(image_b64)
-        image = Image.open(io.BytesIO(image_data)).convert("RGB")
-        result = await process_image(image, request.student_id, request.quiz_id)
+        image = Frame.from_bytes(image_data)
+        result = await inference_batcher.submit(
+            image, request.student_id, request.quiz_id
+        )
         if not isinstance(result, dict):
             raise ValueError("process_image must return a dictionary")
         if "alerts" not in result or "score_increment" not in result:
@@ -1434,46 +4699,144 @@ async def process_periodic(request: ProcessPeriodicRequest):
                 "process_image result missing 'alerts' or 'score_increment'"
             )
         if result["alerts"]:
-            # Convert answers to plain dictionaries
-            serialized_answers = (
-                [
-                    {"question_id": answer.question_id, "answer": answer.answer}
-                    for answer in request.answers
-                ]
-                if hasattr(request, "answers")
-                else []
-            )
-            laravel_response = await log_cheating_to_laravel(
+            await report_frame_result(
                 request.student_id,
                 request.quiz_id,
-                result["alerts"],
-                result["score_increment"],
+                result,
                 request.auth_token,
-                request.image_b64,
-                serialized_answers,
+                image,
+                request.answers,
             )
-            ws_message = {
-                "type": "alert",
-                "message": result["alerts"],
-                "score_increment": result["score_increment"],
-                "auto_submitted": laravel_response.get("auto_submitted", False),
-                "new_score": laravel_response.get(
-                    "new_score", laravel_response.get("score", 0)
-                ),
-            }
-            await notify_client(request.student_id, request.quiz_id, ws_message)
         return JSONResponse(content=result)
+    except InferenceSaturated as e:
+        return saturated_response(e)
     except base64.binascii.Error:
-        print("Error: Invalid base64 string")
+        logger.error("Error: Invalid base64 string")
         return JSONResponse(content={"error": "Invalid base64 string"}, status_code=422)
     except ValueError as ve:
-        print(f"Error in process_periodic: {str(ve)}")
+        logger.error("Error in process_periodic: %s", ve)
         return JSONResponse(content={"error": str(ve)}, status_code=500)
     except Exception as e:
-        print(f"Error in process_periodic: {str(e)}")
+        logger.error("Error in process_periodic: %s", e)
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
 
+@app.get("/health")
+async def health():
+    return JSONResponse({"status": "ok", "inference": inference_executor.stats()})
+
+
+metrics.gauge(
+    "active_sessions", "Sessions with temporal state", lambda: len(session_store)
+)
+metrics.gauge(
+    "websocket_connections", "Open client WebSockets", lambda: len(alert_bus.mailboxes)
+)
+metrics.gauge(
+    "inference_queue_depth",
+    "Frames waiting for the next inference batch",
+    lambda: inference_batcher.queue.qsize() if inference_batcher.queue else 0,
+)
+metrics.gauge(
+    "inference_admitted",
+    "Requests holding an inference admission slot",
+    lambda: inference_executor.admitted,
+)
+metrics.gauge(
+    "inference_pending",
+    "Calls held by the inference pool",
+    lambda: inference_executor.pending,
+)
+metrics.counter(
+    "inference_rejected_total",
+    "Frames rejected because inference was saturated",
+    lambda: inference_executor.rejected,
+)
+metrics.gauge(
+    "laravel_in_flight",
+    "Requests to Laravel in flight",
+    lambda: laravel_client.in_flight,
+)
+metrics.counter(
+    "laravel_requests_total",
+    "Requests sent to Laravel",
+    lambda: laravel_client.requests,
+)
+metrics.counter(
+    "laravel_errors_total", "Failed requests to Laravel", lambda: laravel_client.errors
+)
+metrics.counter(
+    "outbox_reports_total",
+    "Outbox reports by outcome",
+    lambda: [
+        ({"outcome": outcome}, getattr(report_outbox, outcome))
+        for outcome in ("enqueued", "delivered", "retried", "failed")
+    ],
+)
+metrics.counter(
+    "alerts_total",
+    "Alerts by outcome",
+    lambda: [
+        ({"outcome": outcome}, getattr(alert_bus, outcome))
+        for outcome in ("published", "delivered", "undeliverable")
+    ],
+)
+metrics.counter(
+    "cascade_stage_total",
+    "Analysis stages by outcome (ran, skipped, reused)",
+    lambda: [
+        ({"stage": stage, "outcome": outcome}, count)
+        for stage, counts in cascade_metrics.counts.items()
+        for outcome, count in counts.items()
+    ],
+)
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/affinity")
+async def affinity(student_id: str, quiz_id: str):
+    """Which worker a session's frames and WebSocket should go to"""
+    session_key = f"{student_id}_{quiz_id}"
+    worker = session_worker(session_key)
+    return JSONResponse(
+        {
+            "session_key": session_key,
+            "worker": worker,
+            "local": worker is None or worker == WORKER_URL,
+            "session_backend": session_store.name,
+        }
+    )
+
+
+@app.get("/stats")
+async def stats():
+    return JSONResponse(
+        {
+            "batching": inference_batcher.stats(),
+            "inference": inference_executor.stats(),
+            "sessions": session_store.stats(),
+            "face_index": face_index.stats(),
+            "database": face_db.stats(),
+            "models": model_registry.profile(),
+            "frames": frame_metrics.stats(),
+            "laravel": laravel_client.stats(),
+            "outbox": report_outbox.stats(),
+            "evidence": evidence_store.stats(),
+            "cascade": cascade_metrics.stats(),
+            "alerts": alert_bus.stats(),
+            "face_index_sync": face_index_sync.stats(),
+            "stages": {
+                stage: histogram.snapshot()
+                for stage, histogram in stage_latency.items()
+            },
+        }
+    )
+
+
 @app.post("/submit_due_to_cheating")
 async def submit_due_to_cheating(request: SubmitDueToCheatingRequest):
     try:
@@ -1493,7 +4856,7 @@ async def submit_due_to_cheating(request: SubmitDueToCheatingRequest):
                 content={"status": 200, "message": "Quiz submitted due to cheating"}
             )
         else:
-            print(f"Failed to submit to Laravel: {response['data']}")
+            logger.error("Failed to submit to Laravel: %s", response["data"])
             return JSONResponse(
                 content={
                     "error": "Failed to submit quiz to Laravel",
@@ -1502,8 +4865,8 @@ async def submit_due_to_cheating(request: SubmitDueToCheatingRequest):
                 status_code=response["status"],
             )
     except ValidationError as ve:
-        print(f"Validation error in submit_due_to_cheating: {ve.errors()}")
+        logger.warning("Validation error in submit_due_to_cheating: %s", ve.errors())
         raise HTTPException(status_code=422, detail=ve.errors())
     except Exception as e:
-        print(f"Error in submit_due_to_cheating: {str(e)}")
+        logger.error("Error in submit_due_to_cheating: %s", e)
         return JSONResponse(content={"error": str(e)}, status_code=500)
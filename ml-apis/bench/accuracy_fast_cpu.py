@@ -0,0 +1,140 @@
+"""Accuracy of INFERENCE_PROFILE=fast_cpu against the fp32 models on real images.
+
+For every image with a detected face it compares head pose yaw/pitch (and the
+pose category), the gaze direction class and the FaceNet embedding cosine.
+Exits non-zero when a guardrail is exceeded, so it can gate adopting the profile.
+
+    python bench/accuracy_fast_cpu.py --images path/to/webcam_frames
+"""
+
+import argparse
+import copy
+import os
+import sys
+
+import numpy as np
+import torch
+from facenet_pytorch import InceptionResnetV1
+
+from common import load_service, report
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", required=True, help="directory of face images")
+    parser.add_argument("--max-angle-delta", type=float, default=3.0)
+    parser.add_argument("--min-gaze-agreement", type=float, default=0.95)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    service = load_service()
+    models = {}
+    for name, load in (
+        ("head_pose", service.load_head_pose_model),
+        ("gaze", service.load_gaze_model),
+        ("facenet", lambda: InceptionResnetV1(pretrained="vggface2").eval()),
+    ):
+        fp32 = load().cpu().eval()
+        fast = service.apply_inference_profile(copy.deepcopy(fp32), "fast_cpu")
+        models[name] = (fp32, fast)
+    fr = service.FaceRecognition()
+
+    angle_deltas, pose_agree, gaze_agree, cosines = [], [], [], []
+    skipped = []
+    paths = sorted(
+        os.path.join(args.images, name)
+        for name in os.listdir(args.images)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    for path in paths:
+        with open(path, "rb") as f:
+            frame = service.Frame.from_bytes(f.read())
+        faces = service.detect_faces(frame)
+        if not faces:
+            skipped.append(os.path.basename(path))
+            continue
+        x1, y1, x2, y2 = faces[0]["bounding_box"]
+
+        # Head pose
+        face_input = service.preprocess_face_crops([frame.crop((x1, y1, x2, y2))])
+        poses = []
+        for model in models["head_pose"]:
+            with torch.no_grad():
+                pitch, yaw, _ = model(face_input.clone())[0][0].cpu().numpy()
+            pitch = service.denormalize_angle(pitch, "pitch")
+            yaw = service.denormalize_angle(yaw, "yaw")
+            poses.append((yaw, pitch, service.get_pose_category(pitch, yaw)))
+        angle_deltas.append(
+            (abs(poses[0][0] - poses[1][0]), abs(poses[0][1] - poses[1][1]))
+        )
+        pose_agree.append(poses[0][2] == poses[1][2])
+
+        # Gaze direction class
+        status, eyes = service.extract_eyes(frame)
+        if status is None:
+            eye_input = service.gaze_engine.preprocess(list(eyes)).clone()
+            directions = []
+            for model in models["gaze"]:
+                with torch.no_grad():
+                    vectors = model(eye_input.clone()).cpu().numpy()
+                directions.append(service.classify_gaze(vectors.mean(axis=0))[0])
+            gaze_agree.append(directions[0] == directions[1])
+
+        # Embedding cosine (embeddings are L2-normalized)
+        aligned = fr.process_image(frame.bgr[y1:y2, x1:x2])
+        if aligned is not None:
+            embeddings = []
+            for model in models["facenet"]:
+                fr.facenet = model
+                embeddings.append(fr.generate_embeddings_batch([aligned])[0])
+            cosines.append(float(np.dot(embeddings[0], embeddings[1])))
+
+    deltas = np.asarray(angle_deltas).reshape(-1, 2)
+    results = {
+        "images": len(paths),
+        "skipped_no_face": skipped,
+        "head_pose": {
+            "faces": len(deltas),
+            "yaw_delta_mean": (
+                round(float(deltas[:, 0].mean()), 3) if len(deltas) else None
+            ),
+            "yaw_delta_max": (
+                round(float(deltas[:, 0].max()), 3) if len(deltas) else None
+            ),
+            "pitch_delta_mean": (
+                round(float(deltas[:, 1].mean()), 3) if len(deltas) else None
+            ),
+            "pitch_delta_max": (
+                round(float(deltas[:, 1].max()), 3) if len(deltas) else None
+            ),
+            "category_agreement": float(np.mean(pose_agree)) if pose_agree else None,
+        },
+        "gaze": {
+            "frames": len(gaze_agree),
+            "direction_agreement": float(np.mean(gaze_agree)) if gaze_agree else None,
+        },
+        "embeddings": {
+            "faces": len(cosines),
+            "cosine_mean": round(float(np.mean(cosines)), 5) if cosines else None,
+            "cosine_min": round(float(np.min(cosines)), 5) if cosines else None,
+        },
+    }
+    failures = []
+    if len(deltas) and deltas.max() > args.max_angle_delta:
+        failures.append(f"angle delta {deltas.max():.2f} > {args.max_angle_delta}")
+    if gaze_agree and np.mean(gaze_agree) < args.min_gaze_agreement:
+        failures.append(
+            f"gaze agreement {np.mean(gaze_agree):.3f} < {args.min_gaze_agreement}"
+        )
+    if cosines and min(cosines) < args.min_cosine:
+        failures.append(f"embedding cosine {min(cosines):.4f} < {args.min_cosine}")
+    results["failures"] = failures
+    report("accuracy_fast_cpu", results, args.output)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
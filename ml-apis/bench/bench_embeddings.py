@@ -0,0 +1,64 @@
+"""FaceNet embedding throughput (images/sec) versus batch size.
+
+    python bench/bench_embeddings.py --faces 256 --batch-sizes 1 8 16 32 64
+"""
+
+import argparse
+import time
+
+import numpy as np
+import torch
+
+from common import load_service, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--faces", type=int, default=256)
+    parser.add_argument(
+        "--batch-sizes", type=int, nargs="+", default=[1, 8, 16, 32, 64]
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    service = load_service()
+    fr = service.FaceRecognition()
+    rng = np.random.default_rng(0)
+    faces = rng.integers(0, 256, (args.faces, 160, 160, 3), dtype=np.uint8)
+
+    # Warm-up so lazy initialisation is not counted
+    fr.generate_embeddings_batch(faces[:2], batch_size=2)
+
+    results = []
+    for batch_size in args.batch_sizes:
+        best = float("inf")
+        for _ in range(args.repeats):
+            started = time.perf_counter()
+            fr.generate_embeddings_batch(faces, batch_size=batch_size)
+            best = min(best, time.perf_counter() - started)
+        results.append(
+            {
+                "batch_size": batch_size,
+                "seconds": round(best, 4),
+                "images_per_sec": round(args.faces / best, 1),
+            }
+        )
+    report(
+        "embeddings",
+        {
+            "device": fr.device,
+            "threads": torch.get_num_threads(),
+            "faces": args.faces,
+            "runs": results,
+        },
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Latency of the conv-heavy models under each CPU serving option.
+
+Compares, per model and batch size, eager fp32 (INFERENCE_PROFILE=default),
+INFERENCE_PROFILE=fast_cpu and INFERENCE_BACKEND=onnx, all on the same number
+of intra-op threads. Run accuracy_fast_cpu.py before adopting fast_cpu.
+
+    python bench/bench_fast_cpu.py --threads 4 --batch-sizes 1 8
+    python bench/bench_fast_cpu.py --random-weights   # no checkpoints needed
+
+Latency does not depend on the weights, so --random-weights builds the same
+architectures untrained when the checkpoints are not at hand.
+"""
+
+import argparse
+import copy
+import os
+import tempfile
+
+import numpy as np
+import torch
+
+from common import load_service, report, summarize, timer
+
+
+def conv_models(service, random_weights: bool) -> list:
+    """(name, fp32 model, input shape, output names) for the ResNet-backed models"""
+    if random_weights:
+        head_pose = service.PoseAwareResNet(pretrained_backbone=False)
+        gaze = service.GazeResNet18(pretrained_backbone=False)
+    else:
+        head_pose = service.load_head_pose_model()
+        gaze = service.load_gaze_model()
+    return [
+        ("head_pose", head_pose.cpu().eval(), (3, 256, 256), ["angles", "pose_logits"]),
+        ("gaze", gaze.cpu().eval(), (3, 224, 224), ["gaze"]),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--threads", type=int, default=os.cpu_count())
+    parser.add_argument("--random-weights", action="store_true")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    service = load_service()
+    rng = np.random.default_rng(0)
+    results = []
+    with tempfile.TemporaryDirectory() as export_dir:
+        for name, fp32, input_shape, output_names in conv_models(
+            service, args.random_weights
+        ):
+            backends = {
+                "fp32": fp32,
+                "fast_cpu": service.apply_inference_profile(
+                    copy.deepcopy(fp32), "fast_cpu"
+                ),
+            }
+            if service.ort is not None:
+                path = service.export_onnx(
+                    fp32,
+                    os.path.join(export_dir, f"{name}.onnx"),
+                    input_shape,
+                    output_names,
+                )
+                backends["onnx"] = service.OnnxModule(path, threads=args.threads)
+            for batch_size in args.batch_sizes:
+                sample = torch.from_numpy(
+                    rng.standard_normal((batch_size, *input_shape), dtype=np.float32)
+                )
+                run = {"model": name, "batch_size": batch_size}
+                for backend, model in backends.items():
+                    samples = []
+                    with torch.no_grad():
+                        model(sample)  # Warm-up
+                        for _ in range(args.iterations):
+                            with timer(samples):
+                                model(sample)
+                    run[backend] = summarize(samples)
+                for backend in backends.keys() - {"fp32"}:
+                    run[f"{backend}_speedup_p50"] = round(
+                        run["fp32"]["p50_ms"] / max(run[backend]["p50_ms"], 1e-9), 2
+                    )
+                results.append(run)
+    report(
+        "fast_cpu",
+        {
+            "threads": args.threads,
+            "random_weights": args.random_weights,
+            "runs": results,
+        },
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Gaze inference latency and allocations per frame, before and after the fused engine.
+
+"before" rebuilds the transform per eye and runs the model once per eye, as the
+service used to; "after" stacks both eyes of every frame into one batch.
+
+    python bench/bench_gaze.py --frames 1 4 8 --iterations 50
+"""
+
+import argparse
+import tracemalloc
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+from torchvision import transforms
+
+from common import load_service, report, summarize, timer
+
+
+def legacy_preprocess_eye(eye_img):
+    transform = transforms.Compose(
+        [
+            transforms.Resize((224, 224)),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+        ]
+    )
+    return transform(Image.fromarray(cv2.cvtColor(eye_img, cv2.COLOR_BGR2RGB)))
+
+
+def allocations(work) -> dict:
+    """Python-visible allocations (numpy included) made by one call of work"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    work()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    diff = after.compare_to(before, "filename")
+    return {
+        "blocks": sum(max(stat.count_diff, 0) for stat in diff),
+        "peak_kb": round(peak / 1024.0, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    service = load_service()
+    model = service.model_registry.get("gaze")
+    rng = np.random.default_rng(0)
+    # Eye crops roughly the size MediaPipe landmarks give on a 640x640 frame
+    eyes = [
+        rng.integers(0, 256, (int(h), int(w), 3), dtype=np.uint8)
+        for h, w in rng.integers(20, 60, (2 * max(args.frames), 2))
+    ]
+
+    def before(eye_crops):
+        for eye in eye_crops:
+            with torch.no_grad():
+                model(legacy_preprocess_eye(eye).unsqueeze(0).to(service.device))
+
+    def after(eye_crops):
+        service.gaze_engine.predict(eye_crops)
+
+    # Warm-up so lazy initialisation and buffer growth are not counted
+    before(eyes[:2])
+    after(eyes)
+
+    results = []
+    for frames in args.frames:
+        eye_crops = eyes[: 2 * frames]
+        run = {"frames": frames}
+        for name, path in (("before", before), ("after", after)):
+            samples = []
+            for _ in range(args.iterations):
+                with timer(samples):
+                    path(eye_crops)
+            # Per-frame latency is the batch latency spread over its frames
+            run[name] = {
+                "batch": summarize(samples),
+                "per_frame_p50_ms": round(
+                    float(np.percentile(samples, 50)) * 1000.0 / frames, 3
+                ),
+                "allocations": allocations(lambda: path(eye_crops)),
+            }
+        results.append(run)
+    report(
+        "gaze",
+        {
+            "device": str(service.device),
+            "threads": torch.get_num_threads(),
+            "runs": results,
+        },
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Head pose latency for 1/2/4/8 faces: one forward per face versus one batched pass.
+
+    python bench/bench_head_pose.py --faces 1 2 4 8 --iterations 30
+"""
+
+import argparse
+
+import numpy as np
+import torch
+from PIL import Image
+
+from common import load_service, report, summarize, timer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--faces", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    service = load_service()
+    model = service.model_registry.get("head_pose")
+    rng = np.random.default_rng(0)
+    # Face crops of the sizes MTCNN typically returns from a webcam frame
+    crops = [
+        rng.integers(0, 256, (int(h), int(w), 3), dtype=np.uint8)
+        for h, w in rng.integers(90, 260, (max(args.faces), 2))
+    ]
+
+    def per_face(face_crops):
+        # Previous path: PIL transform and a batch-of-one forward for each face
+        for crop in face_crops:
+            tensor = service.transform(Image.fromarray(crop)).unsqueeze(0)
+            with torch.no_grad():
+                model(tensor.to(service.device))
+
+    # Warm-up so lazy initialisation is not counted
+    service.estimate_head_poses(crops[:1])
+    per_face(crops[:1])
+
+    results = []
+    for count in args.faces:
+        face_crops = crops[:count]
+        preprocess, batched, sequential = [], [], []
+        for _ in range(args.iterations):
+            with timer(preprocess):
+                service.preprocess_face_crops(face_crops)
+            with timer(batched):
+                service.estimate_head_poses(face_crops)
+            with timer(sequential):
+                per_face(face_crops)
+        results.append(
+            {
+                "faces": count,
+                "preprocess": summarize(preprocess),
+                "batched": summarize(batched),
+                "per_face": summarize(sequential),
+            }
+        )
+    report(
+        "head_pose",
+        {
+            "device": str(service.device),
+            "threads": torch.get_num_threads(),
+            "runs": results,
+        },
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Frames/sec a running deployment sustains, to compare 1, 2, 4... workers.
+
+Each simulated session posts frames to /process_periodic back to back. With
+--affinity the target worker comes from /affinity, as a routing proxy would.
+Point LARAVEL_URL at a stub, since alerts are reported through the outbox.
+
+    python bench/bench_load.py --url http://localhost:8000 --frames path/to/frames \\
+        --sessions 32 --seconds 60
+"""
+
+import argparse
+import asyncio
+import base64
+import glob
+import os
+import time
+
+import httpx
+
+from common import report, summarize
+
+
+async def run_session(
+    client, base_url, affinity, student_id, frames, deadline, samples
+):
+    url = base_url
+    if affinity:
+        response = await client.get(
+            f"{base_url}/affinity", params={"student_id": student_id, "quiz_id": "load"}
+        )
+        url = response.json().get("worker") or base_url
+    errors = 0
+    n = 0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.post(
+            f"{url}/process_periodic",
+            json={
+                "student_id": student_id,
+                "quiz_id": "load",
+                "image_b64": frames[n % len(frames)],
+                "auth_token": "bench",
+                "answers": [],
+            },
+        )
+        if response.status_code == 200:
+            samples.append(time.perf_counter() - started)
+        else:
+            errors += 1
+            if response.status_code == 503:
+                await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+        n += 1
+    return errors
+
+
+async def main_async(args, frames):
+    samples = []
+    deadline = time.perf_counter() + args.seconds
+    limits = httpx.Limits(max_connections=args.sessions)
+    async with httpx.AsyncClient(timeout=30.0, limits=limits) as client:
+        errors = await asyncio.gather(
+            *(
+                run_session(
+                    client,
+                    args.url,
+                    args.affinity,
+                    f"load{i}",
+                    frames,
+                    deadline,
+                    samples,
+                )
+                for i in range(args.sessions)
+            )
+        )
+    return samples, sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--frames", required=True, help="directory of JPEG frames")
+    parser.add_argument("--sessions", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--affinity", action="store_true")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    frames = []
+    for path in sorted(glob.glob(os.path.join(args.frames, "*.jp*g"))):
+        with open(path, "rb") as f:
+            frames.append(base64.b64encode(f.read()).decode())
+    if not frames:
+        raise SystemExit(f"No frames found in {args.frames}")
+
+    samples, errors = asyncio.run(main_async(args, frames))
+    report(
+        "load",
+        {
+            "url": args.url,
+            "sessions": args.sessions,
+            "seconds": args.seconds,
+            "frames_per_sec": round(len(samples) / args.seconds, 2),
+            "errors": errors,
+            "latency": summarize(samples),
+        },
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
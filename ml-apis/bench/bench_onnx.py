@@ -0,0 +1,70 @@
+"""Torch versus ONNX Runtime latency and throughput per core for each exported model.
+
+Both backends are pinned to the same number of intra-op threads so the
+per-core numbers are comparable.
+
+    python bench/bench_onnx.py --threads 4 --batch-sizes 1 8 32
+"""
+
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import torch
+
+from common import load_service, onnx_models, report, summarize, timer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--threads", type=int, default=os.cpu_count())
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    service = load_service()
+    rng = np.random.default_rng(0)
+    results = []
+    with tempfile.TemporaryDirectory() as export_dir:
+        for name, load_torch, input_shape, output_names in onnx_models(service):
+            torch_model = load_torch().cpu().eval()
+            path = service.export_onnx(
+                torch_model,
+                os.path.join(export_dir, f"{name}.onnx"),
+                input_shape,
+                output_names,
+            )
+            backends = {
+                "torch": torch_model,
+                "onnx": service.OnnxModule(path, threads=args.threads),
+            }
+            for batch_size in args.batch_sizes:
+                sample = torch.from_numpy(
+                    rng.standard_normal((batch_size, *input_shape), dtype=np.float32)
+                )
+                run = {"model": name, "batch_size": batch_size}
+                for backend, model in backends.items():
+                    samples = []
+                    with torch.no_grad():
+                        model(sample)  # Warm-up
+                        for _ in range(args.iterations):
+                            with timer(samples):
+                                model(sample)
+                    per_second = batch_size / float(np.median(samples))
+                    run[backend] = {
+                        **summarize(samples),
+                        "items_per_sec": round(per_second, 1),
+                        "items_per_sec_per_core": round(per_second / args.threads, 2),
+                    }
+                run["speedup_p50"] = round(
+                    run["torch"]["p50_ms"] / run["onnx"]["p50_ms"], 2
+                )
+                results.append(run)
+    report("onnx", {"threads": args.threads, "runs": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Replay recorded webcam frames through every stage of the proctoring pipeline.
+
+Reports p50/p95/p99 latency and throughput per stage (decode, detect_faces,
+detect_objects, detect_gaze, detect_head_pose, embedding, FAISS search), end to
+end for process_image, RealTimeRecognizer.process_image and enrollment, plus
+peak RSS. Runs against the in-memory SQLite FaceDB and never calls Laravel.
+
+    python bench/bench_pipeline.py --frames path/to/frames --output before.json
+    python bench/compare.py before.json after.json
+"""
+
+import argparse
+import asyncio
+import base64
+import glob
+import os
+from collections import defaultdict
+
+import numpy as np
+import torch
+
+from common import load_service, report, summarize, timer
+
+
+def stage_stats(samples) -> dict:
+    stats = summarize(samples)
+    if samples:
+        stats["per_sec"] = round(len(samples) / sum(samples), 2)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", required=True, help="directory of JPEG/PNG frames")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument(
+        "--index-users",
+        type=int,
+        default=200,
+        help="synthetic users added to the FAISS index so search has realistic size",
+    )
+    parser.add_argument("--enroll-images", type=int, default=3)
+    parser.add_argument("--enroll-user-id", type=int, default=900100)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    paths = sorted(
+        p
+        for ext in ("jpg", "jpeg", "png")
+        for p in glob.glob(os.path.join(args.frames, f"*.{ext}"))
+    )
+    frames = []
+    for path in paths:
+        with open(path, "rb") as f:
+            frames.append(f.read())
+    if not frames:
+        raise SystemExit(f"No frames found in {args.frames}")
+
+    service = load_service()
+    loop = asyncio.new_event_loop()
+    fr = service.model_registry.get("face_recognition")
+    recognizer = service.recognizer
+    index = service.face_index
+
+    rng = np.random.default_rng(0)
+    synthetic_ids = [args.enroll_user_id + 1 + i for i in range(args.index_users)]
+    for uid in synthetic_ids:
+        vectors = rng.standard_normal((5, service.EMBEDDING_DIM)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        index.add(uid, f"bench-{uid}", vectors)
+
+    # Warm-up so model loading is not counted
+    service.model_registry.preload("all")
+    loop.run_until_complete(service.process_image(service.Frame.from_bytes(frames[0])))
+
+    stages = defaultdict(list)
+    for _ in range(args.repeats):
+        state = service.SessionState()
+        for data in frames:
+            with timer(stages["decode"]):
+                frame = service.Frame.from_bytes(data)
+            with timer(stages["detect_faces"]):
+                faces = service.detect_faces(frame)
+            with timer(stages["detect_objects"]):
+                service.detect_objects(frame)
+            with timer(stages["detect_gaze"]):
+                service.detect_gaze(frame, state)
+            if not faces:
+                continue
+            x1, y1, x2, y2 = faces[0]["bounding_box"]
+            with timer(stages["detect_head_pose"]):
+                loop.run_until_complete(
+                    service.detect_head_pose(frame.crop((x1, y1, x2, y2)), state)
+                )
+            aligned = fr.process_image(frame.bgr[y1:y2, x1:x2])
+            if aligned is None:
+                continue
+            with timer(stages["embedding"]):
+                embedding = fr.generate_embeddings_batch([aligned])[0]
+            with timer(stages["faiss_search"]):
+                index.search(embedding, 3)
+
+    # End to end; no session key, so repeats are not served as near-duplicates
+    for _ in range(args.repeats):
+        for data in frames:
+            with timer(stages["process_image"]):
+                loop.run_until_complete(
+                    service.process_image(service.Frame.from_bytes(data))
+                )
+            with timer(stages["recognize"]):
+                recognizer.process_image(service.Frame.from_bytes(data).bgr)
+
+    # Enrollment: decode, align and embed the /register images, then store them
+    db = service.face_db
+    uid = args.enroll_user_id
+    if db.backend == "sqlite":
+        with db.connection() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO users (id, name) VALUES (?, ?)",
+                (uid, "bench-enroll"),
+            )
+            conn.commit()
+    images_b64 = [
+        base64.b64encode(data).decode()
+        for data in (frames * args.enroll_images)[: args.enroll_images]
+    ]
+    try:
+        for _ in range(args.repeats):
+            with timer(stages["enrollment"]):
+                embeddings = service.embed_registration_images(fr, images_b64)
+                if embeddings:
+                    db.store_embeddings(uid, embeddings)
+                    index.add(uid, "bench-enroll", np.array(embeddings))
+            db.delete_embeddings(uid)
+            index.remove_user(uid)
+    finally:
+        for synthetic_id in synthetic_ids:
+            index.remove_user(synthetic_id)
+        loop.close()
+
+    report(
+        "pipeline",
+        {
+            "frames": len(frames),
+            "repeats": args.repeats,
+            "threads": torch.get_num_threads(),
+            "models": service.model_registry.profile(),
+            "stages": {name: stage_stats(samples) for name, samples in stages.items()},
+        },
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
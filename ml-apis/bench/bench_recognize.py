@@ -0,0 +1,184 @@
+"""Per-verification CPU time: legacy three-detector path versus the single-pass pipeline.
+
+    python bench/bench_recognize.py --images path/to/face/jpgs --repeats 5
+    python bench/bench_recognize.py --images path/to/face/jpgs --enroll synthetic
+    python bench/bench_recognize.py --images path/to/face/jpgs --user-id 42
+
+The legacy path is reproduced here for comparison: YOLO on the full frame, a
+reload of the user's embeddings from the database into a fresh FAISS index,
+CLAHE + MTCNN and one embedding call per crop, then a second YOLO pass over
+the full frame to fill "unknown" matches. The current path is
+RealTimeRecognizer.verify.
+
+Both sides verify against the same enrolled user. Without --user-id a bench
+user is enrolled from the --images faces (or from synthetic embeddings with
+--enroll synthetic) and removed afterwards; with --user-id that user must
+already be in the face index.
+"""
+
+import argparse
+import base64
+import glob
+import os
+import time
+
+import cv2
+import faiss
+import numpy as np
+
+from common import load_service, report, summarize
+
+
+def legacy_verify(recognizer, img, user_id):
+    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    results = recognizer.yolo(img_rgb)
+    # The baseline rebuilt its index from the database on every request
+    embeddings, labels, _ = recognizer.db.load_embeddings(user_id)
+    index = faiss.IndexFlatIP(embeddings.shape[1])
+    index.add(np.ascontiguousarray(embeddings, dtype=np.float32))
+    hits = []
+    for box in results[0].boxes.xyxy.cpu().numpy():
+        x1, y1, x2, y2 = map(int, box)
+        aligned = recognizer.fr.process_image(img_rgb[y1:y2, x1:x2])
+        if aligned is None:
+            continue
+        embedding = recognizer.fr.generate_embeddings(aligned)
+        embedding /= np.linalg.norm(embedding)
+        _, indices = index.search(embedding.reshape(1, -1).astype(np.float32), 3)
+        hits.append([labels[i] for i in indices[0] if i != -1])
+    recognizer.yolo(img_rgb)
+    return hits
+
+
+def enroll(service, recognizer, images, user_id, mode, rng):
+    """Store embeddings for a bench user in the database and the resident index"""
+    if mode == "synthetic":
+        embeddings = rng.standard_normal((5, recognizer.index.dim)).astype(np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    else:
+        images_b64 = [
+            base64.b64encode(cv2.imencode(".jpg", img)[1].tobytes()).decode()
+            for img in images
+        ]
+        embeddings = np.asarray(
+            service.embed_registration_images(recognizer.fr, images_b64)
+        )
+        if len(embeddings) == 0:
+            raise SystemExit("No face in --images could be enrolled")
+    db = recognizer.db
+    if db.backend == "sqlite":
+        with db.connection() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO users (id, name) VALUES (?, ?)",
+                (user_id, "bench-recognize"),
+            )
+            conn.commit()
+    db.store_embeddings(user_id, list(embeddings))
+    recognizer.index.add(user_id, "bench-recognize", embeddings)
+    return len(embeddings)
+
+
+def measure(fn, images, repeats):
+    wall, cpu = [], []
+    for _ in range(repeats):
+        for img in images:
+            started_wall, started_cpu = time.perf_counter(), time.process_time()
+            fn(img)
+            wall.append(time.perf_counter() - started_wall)
+            cpu.append(time.process_time() - started_cpu)
+    return {"wall": summarize(wall), "cpu": summarize(cpu)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", required=True, help="directory of face images")
+    parser.add_argument(
+        "--user-id",
+        type=int,
+        default=None,
+        help="verify against this already-enrolled user instead of a bench user",
+    )
+    parser.add_argument(
+        "--enroll",
+        choices=["images", "synthetic"],
+        default="images",
+        help="embeddings for the bench user when --user-id is not given",
+    )
+    parser.add_argument("--enroll-user-id", type=int, default=900200)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    paths = sorted(
+        p
+        for ext in ("jpg", "jpeg", "png")
+        for p in glob.glob(os.path.join(args.images, f"*.{ext}"))
+    )
+    images = [img for img in (cv2.imread(p) for p in paths) if img is not None]
+    if not images:
+        raise SystemExit(f"No images found in {args.images}")
+
+    service = load_service()
+    recognizer = service.recognizer
+
+    enrolled = None
+    if args.user_id is None:
+        user_id = args.enroll_user_id
+        enrolled = enroll(
+            service,
+            recognizer,
+            images,
+            user_id,
+            args.enroll,
+            np.random.default_rng(0),
+        )
+    else:
+        user_id = args.user_id
+        if not recognizer.index.has_user(user_id):
+            raise SystemExit(f"User {user_id} has no embeddings in the face index")
+
+    try:
+        with_keypoints = sum(
+            any(
+                kp is not None
+                for _, kp in service.face_detections(
+                    recognizer.yolo(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+                )
+            )
+            for img in images
+        )
+        verified = sum(recognizer.verify(img, user_id)[2]["verified"] for img in images)
+
+        legacy = measure(
+            lambda img: legacy_verify(recognizer, img, user_id),
+            images,
+            args.repeats,
+        )
+        single = measure(
+            lambda img: recognizer.verify(img, user_id), images, args.repeats
+        )
+    finally:
+        if enrolled is not None:
+            recognizer.db.delete_embeddings(user_id)
+            recognizer.index.remove_user(user_id)
+
+    report(
+        "recognize",
+        {
+            "images": len(images),
+            "images_with_keypoints": with_keypoints,
+            "user_id": user_id,
+            "enrolled_embeddings": enrolled,
+            "images_verified": int(verified),
+            "legacy": legacy,
+            "single_pass": single,
+            "cpu_speedup_p50": round(
+                legacy["cpu"]["p50_ms"] / max(single["cpu"]["p50_ms"], 1e-9), 2
+            ),
+        },
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
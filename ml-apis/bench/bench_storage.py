@@ -0,0 +1,110 @@
+"""Embedding storage formats: write/load time, stored bytes and accuracy drift.
+
+    python bench/bench_storage.py --users 50 --per-user 200
+
+Uses the configured database (the in-memory SQLite stand-in by default).
+Synthetic users are inserted with ids starting at --first-user-id and removed
+afterwards. Accuracy is reported as the cosine between decoded and original
+vectors and the top-1 agreement of nearest-neighbour search against float32.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from common import load_service, report
+
+
+def clustered_embeddings(rng, users, per_user, dim):
+    centers = rng.standard_normal((users, dim)).astype(np.float32)
+    vectors = np.repeat(centers, per_user, axis=0)
+    vectors += 0.6 * rng.standard_normal(vectors.shape).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--per-user", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--first-user-id", type=int, default=900000)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    service = load_service()
+    db = service.face_db
+    rng = np.random.default_rng(0)
+    dim = service.EMBEDDING_DIM
+    vectors = clustered_embeddings(rng, args.users, args.per_user, dim)
+    user_ids = [args.first_user_id + i for i in range(args.users)]
+    queries = clustered_embeddings(rng, args.users, 1, dim)[
+        rng.integers(0, args.users, args.queries)
+    ]
+    reference = np.argmax(queries @ vectors.T, axis=1)
+
+    if db.backend == "sqlite":
+        with db.connection() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO users (id, name) VALUES (?, ?)",
+                [(uid, f"bench-{uid}") for uid in user_ids],
+            )
+            conn.commit()
+
+    results = []
+    try:
+        for storage in service.EMBEDDING_ENCODINGS:
+            for uid in user_ids:
+                db.delete_embeddings(uid)
+
+            started = time.perf_counter()
+            for i, uid in enumerate(user_ids):
+                chunk = vectors[i * args.per_user : (i + 1) * args.per_user]
+                db.store_embeddings(uid, chunk, storage)
+            write_s = time.perf_counter() - started
+
+            def stored_bytes(cursor):
+                cursor.execute(
+                    db._sql(
+                        "SELECT SUM(LENGTH(embedding)) FROM face_embeddings "
+                        "WHERE user_id >= %s"
+                    ),
+                    (args.first_user_id,),
+                )
+                return int(cursor.fetchone()[0] or 0)
+
+            size = db._run(stored_bytes)
+
+            started = time.perf_counter()
+            loaded, _, loaded_ids = db.load_embeddings()
+            load_s = time.perf_counter() - started
+
+            mask = loaded_ids >= args.first_user_id
+            decoded = loaded[mask]
+            decoded /= np.linalg.norm(decoded, axis=1, keepdims=True)
+            cosine = np.sum(decoded * vectors, axis=1)
+            top1 = np.argmax(queries @ decoded.T, axis=1)
+            results.append(
+                {
+                    "storage": storage,
+                    "write_s": round(write_s, 4),
+                    "load_s": round(load_s, 4),
+                    "embedding_bytes": size,
+                    "min_cosine": round(float(cosine.min()), 6),
+                    "mean_cosine": round(float(cosine.mean()), 6),
+                    "top1_agreement": round(float(np.mean(top1 == reference)), 4),
+                }
+            )
+    finally:
+        for uid in user_ids:
+            db.delete_embeddings(uid)
+
+    report(
+        "storage",
+        {"rows": len(vectors), "backend": db.backend, "runs": results},
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
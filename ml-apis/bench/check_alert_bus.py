@@ -0,0 +1,106 @@
+"""Check that alerts reach a socket held by another worker, coalesced, via Redis pub/sub.
+
+Two RedisAlertBus instances stand in for two workers. A slow fake socket is
+attached on the second; a burst of alerts is published on the first. Every
+alert must arrive, merged into far fewer sends than were published. Uses
+fakeredis unless --redis-url is given.
+
+    python bench/check_alert_bus.py --alerts 200
+"""
+
+import argparse
+import asyncio
+import sys
+
+from common import load_service, report
+
+
+class SlowSocket:
+    """Stands in for a client WebSocket with a fixed send latency"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.messages = []
+
+    async def send_json(self, message):
+        await asyncio.sleep(self.delay)
+        self.messages.append(message)
+
+
+async def run(service, args):
+    if args.redis_url:
+        import redis.asyncio
+
+        clients = [redis.asyncio.Redis.from_url(args.redis_url) for _ in range(2)]
+    else:
+        import fakeredis
+
+        server = fakeredis.FakeServer()
+        clients = [fakeredis.aioredis.FakeRedis(server=server) for _ in range(2)]
+    channel = "eduguard:check:alerts"
+    publisher, holder = (service.RedisAlertBus(c, channel=channel) for c in clients)
+    await publisher.start()
+    await holder.start()
+    await asyncio.sleep(0.1)  # Let both subscriptions settle
+
+    socket = SlowSocket(args.send_delay)
+    holder.attach("student_quiz", socket)
+    for n in range(args.alerts):
+        await publisher.publish(
+            "student_quiz",
+            {
+                "type": "alert",
+                "message": ["Suspicious object detected"],
+                "score_increment": 1,
+                "auto_submitted": False,
+                "new_score": n + 1,
+            },
+        )
+        await asyncio.sleep(0)
+
+    deadline = asyncio.get_running_loop().time() + 5.0
+    while asyncio.get_running_loop().time() < deadline:
+        received = sum(m["score_increment"] for m in socket.messages)
+        if received >= args.alerts:
+            break
+        await asyncio.sleep(0.05)
+    stats = {"publisher": publisher.stats(), "holder": holder.stats()}
+    await publisher.stop()
+    await holder.stop()
+    return socket.messages, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--redis-url", default=None)
+    parser.add_argument("--alerts", type=int, default=200)
+    parser.add_argument("--send-delay", type=float, default=0.02)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    service = load_service()
+    messages, stats = asyncio.run(run(service, args))
+    received = sum(message["score_increment"] for message in messages)
+    passed = (
+        received == args.alerts
+        and bool(messages)
+        and messages[-1]["new_score"] == args.alerts
+        and len(messages) < args.alerts
+    )
+    report(
+        "alert_bus",
+        {
+            "redis": args.redis_url or "fakeredis",
+            "passed": passed,
+            "published": args.alerts,
+            "sends": len(messages),
+            "alerts_received": received,
+            **stats,
+        },
+        args.output,
+    )
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Check that enrolment changes on one worker reach the face index of another.
+
+Two RedisFaceIndexSync instances, each with its own FaceIndex over the shared
+database, stand in for two workers. A user registered on the first must become
+searchable on the second, a deletion on the first must remove them there, and
+a change published while the second was not subscribed must be picked up when
+it starts again. Uses fakeredis unless --redis-url is given.
+
+    python bench/check_face_index_sync.py
+"""
+
+import argparse
+import asyncio
+import sys
+
+import numpy as np
+
+from common import load_service, report
+
+
+async def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        if condition():
+            return True
+        await asyncio.sleep(0.02)
+    return condition()
+
+
+async def run(service, args):
+    if args.redis_url:
+        import redis.asyncio
+
+        def client():
+            return redis.asyncio.Redis.from_url(args.redis_url)
+
+    else:
+        import fakeredis
+
+        server = fakeredis.FakeServer()
+
+        def client():
+            return fakeredis.aioredis.FakeRedis(server=server)
+
+    db = service.face_db
+    channel = "eduguard:check:face_index"
+    indexes = [service.FaceIndex(), service.FaceIndex()]
+    writer, reader = (
+        service.RedisFaceIndexSync(index, db, client(), channel=channel)
+        for index in indexes
+    )
+    await writer.start()
+    await reader.start()
+    await asyncio.sleep(0.1)  # Let both subscriptions settle
+
+    rng = np.random.default_rng(0)
+    user_id = args.user_id
+    if db.backend == "sqlite":
+        with db.connection() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO users (id, name) VALUES (?, ?)",
+                (user_id, "check-face-index"),
+            )
+            conn.commit()
+
+    def enroll():
+        embeddings = rng.standard_normal((3, indexes[0].dim)).astype(np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        db.store_embeddings(user_id, list(embeddings))
+        indexes[0].add(user_id, "check-face-index", embeddings)
+        return embeddings
+
+    checks = {}
+    # Register on the writer, as /register does
+    embeddings = enroll()
+    await writer.publish(user_id)
+    checks["register_propagates"] = await wait_for(
+        lambda: reader.index.has_user(user_id)
+    )
+    hits = reader.index.search(embeddings[0], k=1)
+    checks["searchable"] = bool(hits) and hits[0][0] == user_id
+
+    # Delete on the writer, as DELETE /embeddings/{user_id} does
+    db.delete_embeddings(user_id)
+    indexes[0].remove_user(user_id)
+    await writer.publish(user_id)
+    checks["delete_propagates"] = await wait_for(
+        lambda: not reader.index.has_user(user_id)
+    )
+
+    # A change published while the reader is down is recovered on restart
+    await reader.stop()
+    reader.client = client()
+    enroll()
+    await writer.publish(user_id)
+    await reader.start()
+    checks["recovered_after_restart"] = await wait_for(
+        lambda: reader.index.has_user(user_id)
+    )
+
+    db.delete_embeddings(user_id)
+    stats = {"writer": writer.stats(), "reader": reader.stats()}
+    await writer.stop()
+    await reader.stop()
+    return checks, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--redis-url", default=None)
+    parser.add_argument("--user-id", type=int, default=900300)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    service = load_service()
+    checks, stats = asyncio.run(run(service, args))
+    passed = all(checks.values())
+    report(
+        "face_index_sync",
+        {
+            "redis": args.redis_url or "fakeredis",
+            "passed": passed,
+            "checks": checks,
+            **stats,
+        },
+        args.output,
+    )
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Check Laravel delivery against a local stub API: retries, rejections and keep-alive.
+
+A threaded HTTP/1.1 stub stands in for Laravel. Reports go through a
+ReportOutbox in a temporary file using a LaravelClient pointed at the stub:
+
+- a 503 twice, then 200, must be delivered on the third attempt
+- a response slower than LARAVEL_TIMEOUT must be retried and then delivered
+- a 422 must fail after one attempt, without a retry
+- a 401 (expired token) must fail after one attempt with a clear error
+- sequential requests must share one keep-alive connection
+
+Every retry must repeat the report's Idempotency-Key, and settled rows must
+not keep the bearer token.
+
+    python bench/check_laravel_client.py
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common import load_service, report
+
+
+class StubLaravel(BaseHTTPRequestHandler):
+    """Answers by path: /flaky fails twice, /slow stalls once, /reject 422s, /expired 401s"""
+
+    protocol_version = "HTTP/1.1"
+    slow_seconds = 1.0
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.server.lock:
+            self.server.requests.append(
+                (self.path, self.headers.get("Idempotency-Key"))
+            )
+            seen = sum(path == self.path for path, _ in self.server.requests)
+        if self.path == "/flaky" and seen <= 2:
+            self._respond(503, {"message": "unavailable"})
+        elif self.path == "/slow" and seen == 1:
+            time.sleep(self.slow_seconds)
+            self._respond(200, {"late": True})
+        elif self.path == "/reject":
+            self._respond(422, {"message": "invalid"})
+        elif self.path == "/expired":
+            self._respond(401, {"message": "Unauthenticated."})
+        else:
+            self._respond(200, {"ok": True})
+
+    def _respond(self, status: int, body):
+        data = json.dumps(body).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client timed out and hung up
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubLaravel)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def run(service, stub, outbox_path, keepalive_requests):
+    url = f"http://127.0.0.1:{stub.server_address[1]}"
+    client = service.LaravelClient(url)
+    # ReportOutbox delivers through the module-level client
+    service.laravel_client = client
+
+    # Keep-alive: sequential requests on one connection
+    before = stub.connections
+    for _ in range(keepalive_requests):
+        response = await client.post("/ok", {}, "token")
+        response.raise_for_status()
+    reuse_connections = stub.connections - before
+
+    outbox = service.ReportOutbox(path=outbox_path, workers=2)
+    outbox.start()
+    keys = {
+        path: await outbox.enqueue("check", path, {"path": path}, "token")
+        for path in ("/flaky", "/slow", "/reject", "/expired")
+    }
+    deadline = time.monotonic() + 15.0
+    while time.monotonic() < deadline and await outbox._db(outbox._backlog):
+        await asyncio.sleep(0.05)
+    stats = outbox.stats()
+    await outbox.stop()
+    await client.close()
+    return keys, reuse_connections, stats, client.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--keepalive-requests", type=int, default=20)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    # Short timeouts and backoff so the retries finish within seconds
+    os.environ.setdefault("LARAVEL_TIMEOUT", "0.3")
+    os.environ.setdefault("OUTBOX_BACKOFF_BASE", "0.05")
+    service = load_service()
+    StubLaravel.slow_seconds = service.LARAVEL_TIMEOUT * 3
+
+    stub = start_stub()
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox_path = os.path.join(tmp, "outbox.sqlite3")
+        keys, reuse_connections, outbox_stats, client_stats = asyncio.run(
+            run(service, stub, outbox_path, args.keepalive_requests)
+        )
+        conn = sqlite3.connect(outbox_path)
+        rows = {
+            key: (status, attempts)
+            for key, status, attempts in conn.execute(
+                "SELECT idempotency_key, status, attempts FROM outbox"
+            )
+        }
+        errors = dict(conn.execute("SELECT idempotency_key, last_error FROM outbox"))
+        tokens_kept = conn.execute(
+            "SELECT COUNT(*) FROM outbox WHERE status != 'pending' AND auth_token != ''"
+        ).fetchone()[0]
+        conn.close()
+    stub.shutdown()
+
+    outcomes = {path: rows.get(key) for path, key in keys.items()}
+    sent_keys = {
+        path: [key for sent_path, key in stub.requests if sent_path == path]
+        for path in keys
+    }
+    checks = {
+        "retried_5xx": outcomes["/flaky"] == ("delivered", 3),
+        "retried_timeout": outcomes["/slow"] == ("delivered", 2),
+        "no_retry_4xx": outcomes["/reject"] == ("failed", 1)
+        and len(sent_keys["/reject"]) == 1,
+        "expired_token_fails": outcomes["/expired"] == ("failed", 1)
+        and "expired" in (errors.get(keys["/expired"]) or ""),
+        "token_cleared": tokens_kept == 0,
+        "same_idempotency_key": all(
+            sent and set(sent) == {keys[path]} for path, sent in sent_keys.items()
+        ),
+        "connection_reused": reuse_connections == 1,
+    }
+    passed = all(checks.values())
+    report(
+        "laravel_client",
+        {
+            "passed": passed,
+            "checks": checks,
+            "outcomes": outcomes,
+            "keepalive_requests": args.keepalive_requests,
+            "keepalive_connections": reuse_connections,
+            "outbox": outbox_stats,
+            "client": client_stats,
+        },
+        args.output,
+    )
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
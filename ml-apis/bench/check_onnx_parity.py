@@ -0,0 +1,73 @@
+"""Check that the ONNX exports match the torch models within tolerance.
+
+Exports each model to a temporary directory, runs both on the same random batches
+and exits non-zero if any output differs by more than --atol + --rtol * |torch|.
+
+    python bench/check_onnx_parity.py --batch-sizes 1 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+import torch
+
+from common import load_service, onnx_models, report
+
+
+def as_outputs(result) -> list:
+    outputs = result if isinstance(result, tuple) else (result,)
+    return [output.detach().cpu().numpy() for output in outputs]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--atol", type=float, default=1e-4)
+    parser.add_argument("--rtol", type=float, default=1e-3)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    service = load_service()
+    rng = np.random.default_rng(0)
+    results = []
+    passed = True
+    with tempfile.TemporaryDirectory() as export_dir:
+        for name, load_torch, input_shape, output_names in onnx_models(service):
+            torch_model = load_torch().cpu().eval()
+            path = service.export_onnx(
+                torch_model,
+                os.path.join(export_dir, f"{name}.onnx"),
+                input_shape,
+                output_names,
+            )
+            onnx_model = service.OnnxModule(path)
+            for batch_size in args.batch_sizes:
+                sample = torch.from_numpy(
+                    rng.standard_normal((batch_size, *input_shape), dtype=np.float32)
+                )
+                with torch.no_grad():
+                    expected = as_outputs(torch_model(sample))
+                actual = as_outputs(onnx_model(sample))
+                for output_name, want, got in zip(output_names, expected, actual):
+                    ok = want.shape == got.shape and np.allclose(
+                        got, want, atol=args.atol, rtol=args.rtol
+                    )
+                    passed &= ok
+                    results.append(
+                        {
+                            "model": name,
+                            "output": output_name,
+                            "batch_size": batch_size,
+                            "max_abs_diff": float(np.abs(got - want).max()),
+                            "ok": bool(ok),
+                        }
+                    )
+    report("onnx_parity", {"passed": passed, "checks": results}, args.output)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
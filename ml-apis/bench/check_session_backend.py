@@ -0,0 +1,81 @@
+"""Check that a session moving between workers keeps its temporal rules, via Redis.
+
+Two RedisSessionBackend instances stand in for two workers sharing one Redis.
+Frames alternate between them; the third consecutive non-frontal pose must
+still raise the score. Uses fakeredis unless --redis-url is given.
+
+    python bench/check_session_backend.py
+    python bench/check_session_backend.py --redis-url redis://localhost:6379/15
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from common import load_service, report, summarize, timer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--redis-url", default=None)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    service = load_service()
+    if args.redis_url:
+        import redis
+
+        client = redis.Redis.from_url(args.redis_url)
+    else:
+        import fakeredis
+
+        client = fakeredis.FakeRedis()
+    prefix = "eduguard:check:"
+    workers = [service.RedisSessionBackend(client, prefix=prefix) for _ in range(2)]
+
+    def frame(yaw):
+        return {
+            "faces": [{"bounding_box": [0, 0, 10, 10], "confidence": 0.9}],
+            "raw_head_poses": [{"pose": "left", "yaw": yaw, "pitch": 0.0, "roll": 0.0}],
+            "suspicious_objects": [],
+            "raw_gaze": {
+                "status": "success",
+                "raw_gaze": np.array([0.0, 0.0, 1.0], dtype=np.float32),
+            },
+            "stages": {},
+        }
+
+    increments = []
+    samples = []
+    try:
+        for n in range(args.frames):
+            # Alternate workers, as a session without affinity would
+            service.session_store = workers[n % 2]
+            with timer(samples):
+                result = service.score_frame(frame(60.0), "check", str(n // 3))
+            increments.append(result["score_increment"])
+    finally:
+        for key in client.scan_iter(match=prefix + "*"):
+            client.delete(key)
+
+    # Each quiz id gets three frames; only the third crosses the rule
+    weight = service.CHEATING_WEIGHTS["non_frontal_pose"]
+    expected = [weight if n % 3 == 2 else 0 for n in range(args.frames)]
+    passed = increments == expected
+    report(
+        "session_backend",
+        {
+            "redis": args.redis_url or "fakeredis",
+            "passed": passed,
+            "score_frame_with_backend": summarize(samples),
+            "backend": workers[0].stats(),
+        },
+        args.output,
+    )
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
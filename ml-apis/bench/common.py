@@ -0,0 +1,88 @@
+"""Shared helpers for the ML API benchmarks.
+
+Run the scripts from the ml-apis directory, e.g. `python bench/bench_embeddings.py`.
+"""
+
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+ML_APIS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_service():
+    """Import ML_APIs against the in-memory SQLite stand-in unless a DB is configured"""
+    os.environ.setdefault("DB_CONNECTION", "sqlite")
+    os.environ.setdefault("DB_DATABASE", ":memory:")
+    if ML_APIS_DIR not in sys.path:
+        sys.path.insert(0, ML_APIS_DIR)
+    import ML_APIs
+
+    return ML_APIs
+
+
+@contextmanager
+def timer(samples: list):
+    """Append the wall time of the block, in seconds, to samples"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        samples.append(time.perf_counter() - started)
+
+
+def summarize(samples) -> dict:
+    """Latency percentiles in milliseconds"""
+    ms = np.asarray(samples, dtype=np.float64) * 1000.0
+    if ms.size == 0:
+        return {"count": 0}
+    return {
+        "count": int(ms.size),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def report(name: str, results, output: str = None):
+    """Print results and optionally write them as JSON"""
+    payload = {"benchmark": name, "peak_rss_mb": round(peak_rss_mb(), 1)}
+    payload["results"] = results
+    text = json.dumps(payload, indent=2)
+    print(text)
+    if output:
+        with open(output, "w") as f:
+            f.write(text)
+
+
+def onnx_models(service) -> list:
+    """(name, torch loader, input shape, output names) for each model the ONNX backend serves"""
+    from facenet_pytorch import InceptionResnetV1
+
+    return [
+        (
+            "head_pose",
+            service.load_head_pose_model,
+            (3, 256, 256),
+            ["angles", "pose_logits"],
+        ),
+        ("gaze", service.load_gaze_model, (3, 224, 224), ["gaze"]),
+        (
+            "facenet",
+            lambda: InceptionResnetV1(pretrained="vggface2").eval(),
+            (3, 160, 160),
+            ["embedding"],
+        ),
+    ]
@@ -0,0 +1,44 @@
+"""Diff the latency figures of two benchmark JSON outputs, e.g. across commits.
+
+    python bench/compare.py before.json after.json
+"""
+
+import argparse
+import json
+
+
+def latencies(node, path=()):
+    """Yield (path, value) for every *_ms figure in a benchmark result"""
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key.endswith("_ms") and isinstance(value, (int, float)):
+                yield "/".join(path + (key,)), value
+            else:
+                yield from latencies(value, path + (key,))
+    elif isinstance(node, list):
+        for i, value in enumerate(node):
+            yield from latencies(value, path + (str(i),))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = dict(latencies(json.load(f)))
+    with open(args.after) as f:
+        after = dict(latencies(json.load(f)))
+
+    width = max((len(key) for key in before), default=0)
+    for key, old in before.items():
+        if key not in after:
+            continue
+        new = after[key]
+        change = (new - old) / old * 100.0 if old else 0.0
+        print(f"{key:<{width}}  {old:>10.3f}  {new:>10.3f}  {change:>+7.1f}%")
+
+
+if __name__ == "__main__":
+    main()